@@ -0,0 +1,439 @@
+"""
+Dịch vụ HTTP phân tích đề thi để tích hợp với LMS (chỉ dùng thư viện chuẩn)
+
+Ví dụ:
+    python analysis_service.py --port 8765 --workers 4
+    curl --data-binary @de_thi.xlsx "http://127.0.0.1:8765/analyze?exam_type=trac-nghiem&report=docx"
+    curl --data-binary @de_thi.xlsx "http://127.0.0.1:8765/analyze?exam_type=trac-nghiem&course=MATH101&term=2025-HK1"
+    curl --data-binary @diem.csv -H "Content-Type: text/csv" \\
+        "http://127.0.0.1:8765/report?exam_type=tu-luan&kind=xlsx" -o ket_qua.xlsx
+
+Các endpoint:
+    GET  /health   trạng thái, số tác vụ đang chờ
+    POST /analyze  nội dung file .xlsx / .csv -> JSON (bảng P/D, bảng cơ cấu, kết luận,
+                   tiêu chí phân biệt; report=docx,xlsx để kèm báo cáo dạng base64;
+                   course, term để lưu từng câu vào ngân hàng câu hỏi)
+    POST /report   nội dung file -> file báo cáo (kind=docx hoặc xlsx)
+"""
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from io import BytesIO
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+from exam_analysis import EXAM_TYPES, analyze_sheets, build_word_report, build_excel_report
+from columnar_cache import ColumnarCache, open_disk_cache
+from item_bank import ItemBank
+from report_jobs import submit_report
+from result_cache import shared_results, cached_result
+from rubric import Rubric, default_rubric, load_rubric
+from workbook_loader import default_disk_cache, file_digest, load_workbook_sheets, workbook_cache
+
+logger = logging.getLogger("exam_quality.service")
+
+# Số lần lặp bootstrap tối đa cho mỗi request (như giao diện: 1000 lần); lớn hơn trả 400
+# để một request không giữ luồng tính toán quá lâu
+MAX_BOOTSTRAP = 1000
+
+# Tên loại đề không dấu, tiện dùng trong URL
+EXAM_TYPE_ALIASES = {
+    "trac-nghiem": "Trắc nghiệm",
+    "tu-luan": "Tự luận",
+    "hon-hop": "Hỗn hợp",
+}
+
+REPORT_TYPES = {
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "bao_cao.docx"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "ket_qua.xlsx"),
+}
+
+_MISSING = object()
+
+
+class RequestError(Exception):
+    """Lỗi trả về cho client với mã trạng thái HTTP tương ứng"""
+
+    def __init__(self, status: int, message: str, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = list(headers)
+
+
+class AnalysisService:
+    """
+    Máy chủ HTTP bất đồng bộ: vòng lặp asyncio nhận / trả request, phần tính toán
+    chạy trên một nhóm luồng có giới hạn
+
+    - Hàng đợi có giới hạn: tối đa `max_pending` tác vụ tính toán (phân tích, tạo báo
+      cáo) được nhận cùng lúc; vượt quá thì trả 503 kèm Retry-After thay vì xếp hàng
+      vô hạn.
+    - Không tính lại: workbook đã đọc dùng bộ nhớ đệm của workbook_loader (cả trên
+      đĩa), kết quả phân tích và báo cáo dùng bộ nhớ đệm dùng chung theo (mã băm file,
+      loại đề, tham số); các request trùng nhau đang chạy cùng lúc chờ chung một tác
+      vụ, request trùng đến sau trả kết quả ngay, không chiếm chỗ trong hàng đợi.
+
+    Dùng luồng (không dùng tiến trình) để mọi request chia sẻ cùng bộ nhớ đệm trong
+    tiến trình; phần nặng (numpy) nhả GIL nên vẫn tận dụng được nhiều lõi.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = 16, max_body: int = 64 * 1024 * 1024,
+                 disk_cache: ColumnarCache = default_disk_cache, request_timeout: float = 30.0,
+                 bank_path: str = None, rubric: Rubric = None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.max_body = max_body
+        self.disk_cache = disk_cache
+        self.request_timeout = request_timeout
+        self.bank_path = bank_path
+        self.rubric = rubric or default_rubric()
+        self._item_bank = None
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+        self._pending = 0
+        self._inflight = {}
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        """Chạy máy chủ cho đến khi bị huỷ"""
+        server = await asyncio.start_server(self.handle, host, port)
+        addresses = ", ".join(str(sock.getsockname()[:2]) for sock in server.sockets)
+        logger.info("Đang phục vụ tại %s (%d luồng, tối đa %d tác vụ chờ)", addresses, self.workers, self.max_pending)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Xử lý một kết nối: đọc một request, trả một response rồi đóng kết nối"""
+        start = time.perf_counter()
+        method, path, status = "-", "-", 500
+        try:
+            try:
+                method, target, headers = await asyncio.wait_for(_read_head(reader), self.request_timeout)
+                url = urlsplit(target)
+                path = url.path
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                body = await asyncio.wait_for(self._read_body(reader, method, headers), self.request_timeout)
+                status, content_type, payload, extra = await self.dispatch(method, path, params, headers, body)
+            except RequestError as e:
+                status, content_type, extra = e.status, "application/json; charset=utf-8", e.headers
+                payload = _json_bytes({"error": str(e)})
+            except asyncio.TimeoutError:
+                status, content_type, extra = 408, "application/json; charset=utf-8", []
+                payload = _json_bytes({"error": "Hết thời gian chờ request"})
+            except Exception as e:
+                logger.exception("Lỗi khi xử lý request")
+                status, content_type, extra = 500, "application/json; charset=utf-8", []
+                payload = _json_bytes({"error": f"{type(e).__name__}: {e}"})
+            await _send(writer, status, content_type, payload, extra)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            logger.info("%s %s %d %.0f ms", method, path, status, (time.perf_counter() - start) * 1000)
+
+    async def dispatch(self, method: str, path: str, params: dict, headers: dict, body: bytes):
+        """Định tuyến request; trả về (mã trạng thái, Content-Type, nội dung, header thêm)"""
+        if path == "/health":
+            if method != "GET":
+                raise RequestError(405, "Chỉ hỗ trợ GET", [("Allow", "GET")])
+            return 200, "application/json; charset=utf-8", _json_bytes(self.health()), []
+        if path not in ("/analyze", "/report"):
+            raise RequestError(404, f"Không có endpoint {path}")
+        if method != "POST":
+            raise RequestError(405, "Chỉ hỗ trợ POST", [("Allow", "POST")])
+        if not body:
+            raise RequestError(400, "Thiếu nội dung file trong thân request")
+
+        options = _parse_options(params)
+        file_format = _detect_format(params, headers, body)
+        digest = await asyncio.to_thread(file_digest, body)
+        eval_key = (digest, options["exam_type"], options["n_bootstrap"], self.rubric.key, options["tolerance"],
+                    options["check_discrimination"])
+
+        analysis, cached = await self.compute(
+            ("analysis",) + eval_key,
+            lambda: analyze_sheets(list(self.load_sheets(body, file_format, digest).values()), **options,
+                                   rubric=self.rubric)
+        )
+
+        if path == "/report":
+            kind = params.get("kind", "docx")
+            if kind not in REPORT_TYPES:
+                raise RequestError(400, f"kind phải là một trong: {', '.join(REPORT_TYPES)}")
+            data = await self.report(kind, eval_key, options["exam_type"], analysis, body, file_format, digest)
+            mime, file_name = REPORT_TYPES[kind]
+            return 200, mime, data, [("Content-Disposition", f'attachment; filename="{file_name}"')]
+
+        response = _analysis_payload(analysis)
+        response.update({"file_hash": digest, "exam_type": options["exam_type"], "cached": cached})
+        course, term = params.get("course"), params.get("term")
+        if course and term:
+            exam_id, _ = await self.compute(
+                ("bank",) + eval_key + (course, term),
+                lambda: self.item_bank.record_exam(analysis["result_df"], options["exam_type"], course, term,
+                                                   digest, params.get("name"), analysis["conclusion"])
+            )
+            response["item_bank"] = {"course": course, "term": term, "exam_id": exam_id}
+        kinds = [k for k in params.get("report", "").split(",") if k]
+        unknown = [k for k in kinds if k not in REPORT_TYPES]
+        if unknown:
+            raise RequestError(400, f"Loại báo cáo không hợp lệ: {', '.join(unknown)}")
+        if kinds:
+            response["reports"] = {
+                kind: base64.b64encode(
+                    await self.report(kind, eval_key, options["exam_type"], analysis, body, file_format, digest)
+                ).decode("ascii")
+                for kind in kinds
+            }
+        return 200, "application/json; charset=utf-8", _json_bytes(response), []
+
+    @property
+    def item_bank(self) -> ItemBank:
+        """Ngân hàng câu hỏi, chỉ mở khi có request đầu tiên cần lưu"""
+        if self._item_bank is None:
+            self._item_bank = ItemBank(self.bank_path)
+        return self._item_bank
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "cached_results": len(shared_results),
+            "rubric": self.rubric.name,
+        }
+
+    def load_sheets(self, data: bytes, file_format: str, digest: str) -> dict:
+        """Đọc các sheet của file tải lên (.xlsx qua workbook_loader, .csv là một sheet)"""
+        if file_format == "csv":
+            return workbook_cache.get_or_compute(
+                digest, lambda: {"CSV": pd.read_csv(BytesIO(data), encoding="utf-8-sig")}
+            )
+        return load_workbook_sheets(data, self.disk_cache)[1]
+
+    async def compute(self, key, compute):
+        """
+        Lấy kết quả theo khoá từ bộ nhớ đệm dùng chung hoặc tính trên nhóm luồng
+
+        Returns:
+        --------
+        tuple
+            (kết quả, True nếu có sẵn trong bộ nhớ đệm)
+        """
+        value = shared_results.get(key, _MISSING)
+        if value is not _MISSING:
+            return value, True
+        task = self._inflight.get(key)
+        if task is None:
+            self._admit()
+            task = asyncio.ensure_future(self._run(cached_result, key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # shield: client ngắt kết nối không huỷ tác vụ mà request trùng khác đang chờ
+        return await _translate_errors(asyncio.shield(task)), False
+
+    async def report(self, kind: str, eval_key, exam_type: str, analysis: dict, data: bytes,
+                     file_format: str, digest: str) -> bytes:
+        """Tạo (hoặc lấy lại) báo cáo Word / Excel qua report_jobs, mỗi khoá chỉ tạo một lần"""
+        if kind == "docx":
+            def render():
+                return build_word_report(exam_type, analysis)
+        else:
+            def render():
+                sheet_frames = list(self.load_sheets(data, file_format, digest).values())
+                return build_excel_report(exam_type, analysis, sheet_frames)
+
+        job = submit_report((kind,) + eval_key, render)
+        if job.done():
+            return await _translate_errors(asyncio.wrap_future(job))
+        self._admit()
+        try:
+            return await _translate_errors(asyncio.shield(asyncio.wrap_future(job)))
+        finally:
+            self._pending -= 1
+
+    def _admit(self):
+        """Nhận thêm một tác vụ tính toán hoặc từ chối khi hàng đợi đã đầy (back-pressure)"""
+        if self._pending >= self.max_pending:
+            raise RequestError(503, "Máy chủ đang bận, vui lòng thử lại sau", [("Retry-After", "1")])
+        self._pending += 1
+
+    def _forget(self, key, task: asyncio.Future):
+        """Bỏ tác vụ đã xong khỏi danh sách đang chạy (lỗi đã được báo cho các request đang chờ)"""
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, func, *args):
+        """Chạy hàm trên nhóm luồng tính toán và trả lại chỗ trong hàng đợi khi xong"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+        finally:
+            self._pending -= 1
+
+    async def _read_body(self, reader: asyncio.StreamReader, method: str, headers: dict) -> bytes:
+        """Đọc thân request theo Content-Length, giới hạn kích thước"""
+        if method != "POST":
+            return b""
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise RequestError(411, "Không hỗ trợ Transfer-Encoding: chunked, cần Content-Length")
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            raise RequestError(411, "Thiếu Content-Length")
+        if length < 0:
+            raise RequestError(400, "Content-Length không hợp lệ")
+        if length > self.max_body:
+            raise RequestError(413, f"File vượt quá giới hạn {self.max_body // (1024 * 1024)} MB")
+        return await reader.readexactly(length)
+
+
+async def _read_head(reader: asyncio.StreamReader):
+    """Đọc dòng request và header; trả về (method, target, {header viết thường: giá trị})"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise RequestError(431, "Header quá lớn")
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise RequestError(400, "Dòng request không hợp lệ")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return parts[0].upper(), parts[1], headers
+
+
+async def _send(writer: asyncio.StreamWriter, status: int, content_type: str, body: bytes, headers=()):
+    """Ghi response HTTP/1.1 và đóng kết nối"""
+    lines = [
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _translate_errors(awaitable):
+    """Lỗi dữ liệu đầu vào (thiếu cột, sai cấu trúc sheet...) thành 422 thay vì 500"""
+    try:
+        return await awaitable
+    except (ValueError, KeyError, IndexError) as e:
+        raise RequestError(422, f"Không phân tích được file: {type(e).__name__}: {e}")
+    except Exception as e:
+        logger.exception("Lỗi khi xử lý request")
+        raise RequestError(500, f"{type(e).__name__}: {e}")
+
+
+def _parse_options(params: dict) -> dict:
+    """Tham số phân tích từ query string, cùng ý nghĩa với batch_evaluate"""
+    exam_type = params.get("exam_type")
+    exam_type = EXAM_TYPE_ALIASES.get(exam_type, exam_type)
+    if exam_type not in EXAM_TYPES:
+        choices = ", ".join(list(EXAM_TYPE_ALIASES) + EXAM_TYPES)
+        raise RequestError(400, f"exam_type phải là một trong: {choices}")
+    try:
+        tolerance = float(params["tolerance"]) if "tolerance" in params else None
+        n_bootstrap = int(params.get("bootstrap", 0))
+    except ValueError:
+        raise RequestError(400, "tolerance phải là số thực, bootstrap phải là số nguyên")
+    if not 0 <= n_bootstrap <= MAX_BOOTSTRAP:
+        raise RequestError(400, f"bootstrap phải từ 0 đến {MAX_BOOTSTRAP}")
+    check_discrimination = params.get("check_discrimination", "1").lower() not in ("0", "false", "no")
+    return {
+        "exam_type": exam_type,
+        "tolerance": tolerance,
+        "check_discrimination": check_discrimination,
+        "n_bootstrap": n_bootstrap,
+    }
+
+
+def _detect_format(params: dict, headers: dict, body: bytes) -> str:
+    """Định dạng file: tham số format, rồi Content-Type, cuối cùng là chữ ký ZIP của .xlsx"""
+    file_format = params.get("format")
+    if file_format is None:
+        content_type = headers.get("content-type", "")
+        if "csv" in content_type:
+            file_format = "csv"
+        elif "spreadsheetml" in content_type or body[:4] == b"PK\x03\x04":
+            file_format = "xlsx"
+        else:
+            file_format = "csv"
+    if file_format not in ("xlsx", "csv"):
+        raise RequestError(400, "format phải là xlsx hoặc csv")
+    return file_format
+
+
+def _analysis_payload(analysis: dict) -> dict:
+    """Chuyển kết quả của analyze_sheets thành dict JSON (NaN -> null)"""
+    payload = {
+        "result": _records(analysis["result_df"]),
+        "summary": _records(analysis["summary_df"]),
+        "conclusion": analysis["conclusion"],
+        "disc_info": json.loads(pd.Series(analysis["disc_info"], dtype=object).to_json(force_ascii=False))
+        if analysis["disc_info"] else None,
+    }
+    if analysis.get("distractor_df") is not None:
+        payload["distractors"] = _records(analysis["distractor_df"])
+    return payload
+
+
+def _records(df: pd.DataFrame) -> list:
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+def _json_bytes(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP phân tích đề thi (cho LMS)")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe (mặc định: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Cổng (mặc định: 8765)")
+    parser.add_argument("--workers", type=int, default=None, help="Số luồng tính toán (mặc định: min(4, số lõi))")
+    parser.add_argument("--max-pending", type=int, default=16,
+                        help="Số tác vụ tính toán tối đa được nhận cùng lúc; vượt quá trả 503")
+    parser.add_argument("--max-body-mb", type=int, default=64, help="Kích thước file tối đa (MB)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Bật bộ nhớ đệm dữ liệu đã đọc trên đĩa tại thư mục này (mặc định: $EXAM_CACHE_DIR; "
+                             "không đặt thì không ghi dữ liệu SV ra đĩa)")
+    parser.add_argument("--no-cache", action="store_true", help="Không dùng bộ nhớ đệm trên đĩa kể cả khi đặt $EXAM_CACHE_DIR")
+    parser.add_argument("--item-bank", default=None,
+                        help="File SQLite ngân hàng câu hỏi cho request có course và term "
+                             "(mặc định: $EXAM_ITEM_BANK hoặc ~/.local/share/exam_quality/item_bank.sqlite3)")
+    parser.add_argument("--rubric", default=None,
+                        help="File JSON bộ tiêu chí đánh giá dùng cho mọi request (mặc định: $EXAM_RUBRIC)")
+    args = parser.parse_args(argv)
+    try:
+        rubric = load_rubric(args.rubric) if args.rubric else default_rubric()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        parser.error(f"Không đọc được bộ tiêu chí {args.rubric or '$EXAM_RUBRIC'}: {e}")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    disk_cache = None if args.no_cache else open_disk_cache(args.cache_dir)
+    service = AnalysisService(args.workers, args.max_pending, args.max_body_mb * 1024 * 1024, disk_cache,
+                              bank_path=args.item_bank, rubric=rubric)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,14 @@
+import json
+import sqlite3
 import streamlit as st
-import pandas as pd
-from io import BytesIO
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 
-# Import các hàm xử lý từ các file riêng biệt
-from processor_multiple_choice import calculate_question_stats
-from processor_essay import calculate_essay_stats
-from processor_common import evaluate_exam_difficulty_mix
+# Ở đầu file chỉ import các module nhẹ để trang tải file hiện ra ngay khi khởi động.
+# pandas / numpy (các bộ xử lý), scipy (IRT, so sánh lớp), python-docx và openpyxl (báo cáo)
+# được import trong nhánh cần đến (xem benchmarks/startup_benchmark.py)
+from report_jobs import submit_report, report_seconds
+
+# Như irt.IRT_MODELS (không import irt ở đây vì module này nạp scipy)
+IRT_MODELS = ["Rasch (1PL)", "2PL"]
 
 st.set_page_config(
     page_title="Exam Quality Evaluation System", 
@@ -16,6 +16,171 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Số dòng xem trước của sheet điểm đọc tuần tự (ScoreMatrix, file lớn)
+PREVIEW_ROWS = 1000
+
+def to_display_frame(df):
+    """Bản sao để hiển thị: chuyển cột object về string để tránh lỗi serialization"""
+    from score_matrix import ScoreMatrix
+    if isinstance(df, ScoreMatrix):
+        # Sheet điểm đọc tuần tự: chỉ dựng DataFrame cho PREVIEW_ROWS dòng đầu
+        st.caption(f"Xem trước {min(PREVIEW_ROWS, df.n_students)}/{df.n_students} SV (file lớn được đọc tuần tự)")
+        return df.head(PREVIEW_ROWS).to_dataframe()
+    display_df = df.copy()
+    for col in display_df.columns:
+        if display_df[col].dtype == 'object':
+            display_df[col] = display_df[col].astype(str)
+    return display_df
+
+def report_download_button(job, label, file_name, mime):
+    """Nút tải báo cáo tạo ở luồng nền: bật khi file đã sẵn sàng, nếu chưa thì chờ và tự làm mới"""
+    if job.done():
+        if job.exception() is not None:
+            st.error(f"❌ Không tạo được file {file_name}: {job.exception()}")
+        else:
+            st.download_button(label=label, data=job.result(), file_name=file_name, mime=mime)
+        return
+
+    @st.fragment(run_every=1.0)
+    def pending_report():
+        if job.done():
+            # Chạy lại toàn trang để thay bằng nút tải xuống và dừng việc kiểm tra định kỳ
+            st.rerun()
+        st.button(f"⏳ Đang tạo {file_name}...", disabled=True, key=f"pending_{file_name}")
+
+    pending_report()
+
+def processing_badge(status):
+    """Thẻ trạng thái xử lý (cập nhật tổng thời gian khi chạy xong)"""
+    return f"""
+            <div style='
+                background: linear-gradient(135deg, rgba(251, 146, 60, 0.2) 0%, rgba(250, 204, 21, 0.2) 100%);
+                border-radius: 15px;
+                padding: 15px;
+                text-align: center;
+                border: 1px solid rgba(251, 146, 60, 0.4);
+            '>
+                <p style='color: #f59e0b; font-weight: 700; margin: 0;'>📊 PROCESSING</p>
+                <p style='color: #fde047; margin: 5px 0 0 0;'>{status}</p>
+            </div>
+            """
+
+def load_rubric_upload(rubric_file):
+    """Bộ tiêu chí từ file JSON tải lên; không có file hoặc file lỗi thì dùng bộ mặc định"""
+    from rubric import default_rubric, rubric_from_dict
+    if rubric_file is None:
+        return default_rubric()
+    try:
+        return rubric_from_dict(json.loads(rubric_file.getvalue().decode("utf-8")))
+    except (ValueError, KeyError, TypeError) as e:
+        st.error(f"❌ File tiêu chí không hợp lệ, dùng bộ mặc định: {e}")
+        return default_rubric()
+
+def render_section_comparison(profiler, sheets, exam_type, file_hash, tolerance, check_discrimination, rubric):
+    """Chế độ so sánh nhiều lớp: mỗi sheet có cột STT là bảng điểm của một lớp"""
+    from section_comparison import compare_sections
+    from processor_common import evaluate_exam_difficulty_mix
+    from score_matrix import ScoreMatrix
+    score_sheets = [name for name, df in sheets.items() if isinstance(df, ScoreMatrix) or "STT" in df.columns]
+    other_sheets = [name for name in sheets if name not in score_sheets]
+
+    st.subheader("🏫 So sánh các lớp")
+    selected = st.multiselect("Các sheet lớp", score_sheets, default=score_sheets)
+    max_sheet = None
+    if exam_type == "Tự luận" and other_sheets:
+        max_sheet = st.selectbox("Sheet điểm tối đa", other_sheets)
+    max_scores_df = sheets[max_sheet] if max_sheet is not None else None
+
+    if len(selected) < 2:
+        st.warning("⚠️ Cần chọn ít nhất 2 sheet lớp để so sánh.")
+        return
+
+    result = profiler.cached(
+        "Thống kê và so sánh các lớp",
+        ("sections", file_hash, exam_type, tuple(selected), max_sheet, rubric.key),
+        lambda: compare_sections({name: sheets[name] for name in selected}, exam_type, max_scores_df, rubric=rubric)
+    )
+
+    st.subheader("📋 Kết quả toàn khoá (gộp các lớp):")
+    st.dataframe(result["combined"], use_container_width=True)
+
+    summary_df, conclusion, disc_info = profiler.cached(
+        "Đánh giá cơ cấu độ khó",
+        ("sections-evaluation", file_hash, exam_type, tuple(selected), max_sheet, rubric.key,
+         tolerance, check_discrimination),
+        lambda: evaluate_exam_difficulty_mix(
+            result["combined"],
+            tolerance=tolerance,
+            check_discrimination=check_discrimination,
+            rubric=rubric
+        )
+    )
+    st.write("### 🔎 Cơ cấu độ khó so với mục tiêu (toàn khoá)")
+    st.dataframe(summary_df, use_container_width=True)
+    st.markdown(f"### ✅ Kết luận: **{conclusion}**")
+
+    comparison = result["comparison"]
+    flagged = comparison["Khác biệt giữa các lớp"] != ""
+    st.write("### 🔍 So sánh P, D giữa các lớp")
+    st.caption(f"{int(flagged.sum())}/{len(comparison)} câu có P hoặc D khác biệt có ý nghĩa giữa các lớp "
+               "(α = 0.05, hiệu chỉnh Holm)")
+    st.dataframe(
+        comparison.style.apply(
+            lambda row: ["background-color: rgba(239, 68, 68, 0.25)" if flagged[row.name] else ""] * len(row),
+            axis=1
+        ),
+        use_container_width=True
+    )
+
+    for tab, name in zip(st.tabs(selected), selected):
+        with tab:
+            st.dataframe(result["sections"][name], use_container_width=True)
+
+def record_in_item_bank(profiler, table, exam_type, file_hash, eval_key, exam_name, conclusion, course, term):
+    """Lưu bảng kết quả vào ngân hàng câu hỏi (một lần cho mỗi bộ tham số) và hiển thị lịch sử các câu"""
+    from item_bank import ItemBank
+    question_col = "Câu hỏi" if "Câu hỏi" in table.columns else "Câu"
+    try:
+        bank = ItemBank()
+        profiler.cached(
+            "Lưu ngân hàng câu hỏi",
+            ("bank",) + eval_key + (course, term),
+            lambda: bank.record_exam(table, exam_type, course, term, file_hash, exam_name, conclusion)
+        )
+        with profiler.stage("Tra lịch sử câu hỏi"):
+            history = bank.item_history(course, table[question_col].astype(str))
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"⚠️ Không lưu được vào ngân hàng câu hỏi: {e}")
+        return
+
+    with st.expander(f"📚 Lịch sử câu hỏi trong ngân hàng ({course})"):
+        st.caption(f"Đã lưu {len(table)} câu cho học kỳ {term} vào {bank.path}")
+        order = table[question_col].astype(str)
+        for value, label in (("Độ khó (P)", "Độ khó (P) theo học kỳ"), ("Độ phân biệt (D)", "Độ phân biệt (D) theo học kỳ")):
+            st.write(f"**{label}**")
+            st.dataframe(
+                history.pivot_table(index="Câu hỏi", columns="Học kỳ", values=value, aggfunc="last").reindex(order),
+                use_container_width=True
+            )
+
+def show_diagnostics(profiler, report_keys):
+    """Bảng chẩn đoán hiệu năng của lần chạy: thời gian / bộ nhớ từng bước, xuất JSON"""
+    # Báo cáo chạy ở luồng nền: chỉ có thời gian khi đã tạo xong
+    for name, key in report_keys.items():
+        profiler.record(name, report_seconds(key), background=True)
+    profiler.log()
+
+    with st.expander("🩺 Chẩn đoán hiệu năng"):
+        st.caption(f"Tổng thời gian xử lý trực tiếp: {profiler.total_ms:.1f} ms"
+                   + ("" if profiler.track_memory else " · bật 'Đo bộ nhớ từng bước' để xem bộ nhớ đỉnh"))
+        st.dataframe(profiler.to_frame(), use_container_width=True)
+        st.download_button(
+            label="⬇️ Tải số liệu chẩn đoán (.json)",
+            data=profiler.to_json(),
+            file_name="chan_doan_hieu_nang.json",
+            mime="application/json"
+        )
+
 # Custom CSS cho giao diện công nghệ màu tím
 st.markdown("""
 <style>
@@ -345,6 +510,46 @@ with st.container():
             help="Choose the examination format for appropriate calculation method"
         )
 
+        show_ci = st.checkbox(
+            "📏 Khoảng tin cậy bootstrap cho P và D",
+            help="Thêm khoảng tin cậy 95% cho từng câu (1000 lần lặp, kết quả lặp lại được)"
+        )
+
+        irt_model = st.selectbox(
+            "📈 Mô hình IRT (trắc nghiệm)",
+            ["Không"] + IRT_MODELS,
+            help="Ước lượng độ khó b, độ phân biệt a của từng câu và năng lực θ của SV (MML-EM)"
+        )
+
+        section_mode = st.checkbox(
+            "🏫 So sánh nhiều lớp (mỗi sheet một lớp)",
+            help="Trắc nghiệm / tự luận: phân tích song song từng sheet lớp, gộp toàn khoá và tìm câu khác biệt giữa các lớp"
+        )
+
+        rubric_file = st.file_uploader(
+            "📐 Bộ tiêu chí đánh giá (.json, tuỳ chọn)",
+            type=["json"],
+            help="Ngưỡng phân loại P, D và chuẩn cơ cấu đề của khoa; bỏ trống để dùng bộ mặc định"
+        )
+        rubric = None
+        if rubric_file is not None:
+            rubric = load_rubric_upload(rubric_file)
+            st.caption(f"Đang dùng bộ tiêu chí: {rubric.name}")
+
+        save_to_bank = st.checkbox(
+            "🗄️ Lưu vào ngân hàng câu hỏi",
+            help="Lưu P, D và số liệu nhóm của từng câu theo học phần / học kỳ để tra lịch sử qua các năm"
+        )
+        bank_course = bank_term = ""
+        if save_to_bank:
+            bank_course = st.text_input("Mã học phần", placeholder="VD: MATH101").strip()
+            bank_term = st.text_input("Học kỳ / năm học", placeholder="VD: 2025-2026 HK1").strip()
+
+        track_memory = st.checkbox(
+            "🩺 Đo bộ nhớ từng bước",
+            help="Ghi bộ nhớ đỉnh của từng bước trong bảng chẩn đoán (xử lý chậm hơn khi bật)"
+        )
+
 # Upload section với style tím gradient
 st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
 
@@ -373,7 +578,16 @@ with st.container():
         )
 
 if uploaded_file:
+    profiler = None
     try:
+        # Phần dùng chung cho mọi loại đề; module riêng của từng nhánh được import trong nhánh đó
+        from instrumentation import StageProfiler
+        from workbook_loader import load_workbook_sheets
+
+        if rubric is None:
+            rubric = load_rubric_upload(None)
+        profiler = StageProfiler(f"{uploaded_file.name} | {exam_type}", track_memory=track_memory)
+
         # Status badges với design mới
         st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
         
@@ -408,18 +622,8 @@ if uploaded_file:
             """, unsafe_allow_html=True)
         
         with col3:
-            st.markdown("""
-            <div style='
-                background: linear-gradient(135deg, rgba(251, 146, 60, 0.2) 0%, rgba(250, 204, 21, 0.2) 100%);
-                border-radius: 15px;
-                padding: 15px;
-                text-align: center;
-                border: 1px solid rgba(251, 146, 60, 0.4);
-            '>
-                <p style='color: #f59e0b; font-weight: 700; margin: 0;'>📊 PROCESSING</p>
-                <p style='color: #fde047; margin: 5px 0 0 0;'>Active</p>
-            </div>
-            """, unsafe_allow_html=True)
+            status_badge = st.empty()
+            status_badge.markdown(processing_badge("Active"), unsafe_allow_html=True)
         
         with col4:
             import datetime
@@ -439,28 +643,25 @@ if uploaded_file:
         
         st.markdown("<hr style='margin: 2rem 0;'>", unsafe_allow_html=True)
         
+        # Đọc workbook đúng một lần, dùng chung cho hiển thị, xử lý và báo cáo
+        with profiler.stage("Đọc file tải lên"):
+            file_bytes = uploaded_file.getvalue()
+        with profiler.stage("Phân tích sheet"):
+            file_hash, sheets = load_workbook_sheets(file_bytes)
+        sheet_names = list(sheets.keys())
+        sheet_frames = list(sheets.values())
+
         # Hiển thị dữ liệu theo loại đề thi
         if exam_type == "Trắc nghiệm":
             # Đọc và hiển thị dữ liệu trắc nghiệm
-            df_input = pd.read_excel(uploaded_file)
-            # Chuyển đổi object về string để tránh lỗi serialization
-            for col in df_input.columns:
-                if df_input[col].dtype == 'object':
-                    df_input[col] = df_input[col].astype(str)
+            df_input = sheet_frames[0]
             
             st.subheader("📊 Dữ liệu đã tải lên:")
-            st.dataframe(df_input, use_container_width=True)
+            st.dataframe(to_display_frame(df_input), use_container_width=True)
             
         elif exam_type == "Tự luận":
-            # Đọc tất cả sheets cho tự luận
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_names = excel_file.sheet_names
-            
-            df_input = pd.read_excel(uploaded_file, sheet_name=0)
-            # Chuyển đổi object về string để tránh lỗi serialization
-            for col in df_input.columns:
-                if df_input[col].dtype == 'object':
-                    df_input[col] = df_input[col].astype(str)
+            # Sheet 1: điểm sinh viên
+            df_input = sheet_frames[0]
             
             st.subheader("📊 Dữ liệu đã tải lên:")
             if len(sheet_names) >= 2:
@@ -468,22 +669,19 @@ if uploaded_file:
                 col1, col2 = st.columns(2)
                 with col1:
                     st.write(f"**Sheet 1: Điểm sinh viên** ({sheet_names[0]})")
-                    st.dataframe(df_input, use_container_width=True, height=300)
+                    st.dataframe(to_display_frame(df_input), use_container_width=True, height=300)
                     
                 with col2:
-                    df_max = pd.read_excel(uploaded_file, sheet_name=1)
+                    df_max = sheet_frames[1]
                     st.write(f"**Sheet 2: Điểm tối đa** ({sheet_names[1]})")
-                    st.dataframe(df_max, use_container_width=True, height=300)
+                    st.dataframe(to_display_frame(df_max), use_container_width=True, height=300)
             else:
                 # Chỉ có 1 sheet
-                st.dataframe(df_input, use_container_width=True)
+                st.dataframe(to_display_frame(df_input), use_container_width=True)
                 st.warning("⚠️ Không có sheet điểm tối đa. Sẽ sử dụng điểm cao nhất thực tế.")
                 
         elif exam_type == "Hỗn hợp":
-            # Đọc và hiển thị dữ liệu hỗn hợp
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_names = excel_file.sheet_names
-            
+            # Hiển thị dữ liệu hỗn hợp
             if len(sheet_names) < 2:
                 st.error("❌ File Excel phải có ít nhất 2 sheet: (1) Trắc nghiệm, (2) Tự luận")
             else:
@@ -492,166 +690,142 @@ if uploaded_file:
                 # Hiển thị 2 sheet chính
                 col1, col2 = st.columns(2)
                 
-                df_mcq = pd.read_excel(uploaded_file, sheet_name=0)
-                df_essay = pd.read_excel(uploaded_file, sheet_name=1)
+                df_mcq = sheet_frames[0]
+                df_essay = sheet_frames[1]
                 
                 with col1:
                     st.write(f"**Sheet 1: Trắc nghiệm** ({sheet_names[0]})")
-                    st.dataframe(df_mcq, use_container_width=True, height=300)
+                    st.dataframe(to_display_frame(df_mcq), use_container_width=True, height=300)
                 
                 with col2:
                     st.write(f"**Sheet 2: Tự luận** ({sheet_names[1]})")
-                    st.dataframe(df_essay, use_container_width=True, height=300)
+                    st.dataframe(to_display_frame(df_essay), use_container_width=True, height=300)
                 
                 # Sheet 3 nếu có
                 if len(sheet_names) >= 3:
                     with st.expander("📋 Sheet 3: Điểm tối đa (nếu có)"):
-                        df_max = pd.read_excel(uploaded_file, sheet_name=2)
+                        df_max = sheet_frames[2]
                         st.info(f"Sheet name: {sheet_names[2]}")
-                        st.dataframe(df_max, use_container_width=True)
+                        st.dataframe(to_display_frame(df_max), use_container_width=True)
                 else:
                     st.warning("⚠️ Không có sheet điểm tối đa. Sẽ sử dụng điểm cao nhất thực tế cho tự luận.")
 
+        # Tham số đánh giá (cũng là một phần của khoá bộ nhớ đệm kết quả)
+        tolerance = rubric.tolerance
+        check_discrimination = True  # có thể bật/tắt
+        n_bootstrap = 1000 if show_ci else 0
+        eval_key = (file_hash, exam_type, n_bootstrap, rubric.key, tolerance, check_discrimination)
+
         # Xử lý theo hình thức đề thi
-        if exam_type == "Trắc nghiệm":
-            # Tính toán độ khó từng câu cho trắc nghiệm
-            result_df = calculate_question_stats(df_input)
+        section_view = section_mode and exam_type != "Hỗn hợp"
+        if not section_view:
+            # Cùng quy trình phân tích với batch_evaluate và dịch vụ HTTP (exam_analysis.analyze_sheets);
+            # báo cáo Word / Excel được dựng từ chính kết quả này ở luồng nền
+            from exam_analysis import analyze_sheets, build_word_report, build_excel_report
+
+            analysis = profiler.cached(
+                "Phân tích đề thi",
+                ("analysis",) + eval_key,
+                lambda: analyze_sheets(sheet_frames, exam_type, tolerance, check_discrimination, n_bootstrap,
+                                       rubric=rubric)
+            )
+            result_df = analysis["result_df"]
+            summary_df, conclusion, disc_info = analysis["summary_df"], analysis["conclusion"], analysis["disc_info"]
+
+            word_job = submit_report(("docx",) + eval_key, lambda: build_word_report(exam_type, analysis))
+            excel_job = submit_report(("xlsx",) + eval_key,
+                                      lambda: build_excel_report(exam_type, analysis, sheet_frames))
 
+        if section_view:
+            render_section_comparison(profiler, sheets, exam_type, file_hash, tolerance, check_discrimination, rubric)
+
+        elif exam_type == "Trắc nghiệm":
             st.subheader("📋 Kết quả tính độ khó từng câu (Trắc nghiệm):")
             st.dataframe(result_df, use_container_width=True)
 
+            # ---- Tham số IRT (tuỳ chọn) ----
+            if irt_model != "Không":
+                from irt import calculate_irt_stats, attach_irt
+
+                irt_result = profiler.cached(
+                    "Ước lượng IRT",
+                    ("irt", file_hash, irt_model),
+                    lambda: calculate_irt_stats(analysis["score_sheet"], irt_model)
+                )
+                st.subheader(f"📈 Tham số IRT ({irt_model}):")
+                st.dataframe(attach_irt(result_df, irt_result), use_container_width=True)
+                with st.expander("🧭 Năng lực SV và chẩn đoán hội tụ IRT"):
+                    diagnostics = dict(irt_result.diagnostics)
+                    history = diagnostics.pop("Lịch sử log-likelihood")
+                    if not diagnostics["Hội tụ"]:
+                        st.warning("⚠️ Thuật toán EM chưa hội tụ sau số vòng lặp tối đa.")
+                    st.json(diagnostics)
+                    st.line_chart({"Log-likelihood": history})
+                    st.dataframe(irt_result.abilities, use_container_width=True)
+
             # ---- 🔹 ĐÁNH GIÁ ĐỀ THI (thêm mới) ----
             st.subheader("📊 Đánh giá tổng quan đề thi:")
 
-            summary_df, conclusion, disc_info = evaluate_exam_difficulty_mix(
-                result_df,
-                tolerance=0.05,
-                check_discrimination=True  # có thể bật/tắt
-            )
-
             st.write("### 🔎 Cơ cấu độ khó so với mục tiêu")
             st.dataframe(summary_df, use_container_width=True)
 
             st.markdown(f"### ✅ Kết luận: **{conclusion}**")
 
             if disc_info:
-                st.write("### 📐 Thống kê độ phân biệt")
+                st.write("### 📐 Thống kê độ phân biệt và độ tin cậy")
                 st.json(disc_info)
 
+            if bank_course and bank_term:
+                record_in_item_bank(profiler, result_df, exam_type, file_hash, eval_key, uploaded_file.name,
+                                    conclusion, bank_course, bank_term)
 
-            # ---- Xuất file Word ----
-            def convert_to_word(result_df, summary_df, conclusion, disc_info):
-                doc = Document()
-
-                # Tiêu đề
-                title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ ĐỘ KHÓ ĐỀ THI TRẮC NGHIỆM', 0)
-                title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-                # Kết quả từng câu
-                doc.add_heading('1. Kết quả tính độ khó từng câu', level=1)
-
-                # Thêm bảng kết quả
-                table = doc.add_table(rows=1, cols=len(result_df.columns))
-                table.style = 'Table Grid'
-
-                # Header
-                header_cells = table.rows[0].cells
-                for i, col in enumerate(result_df.columns):
-                    header_cells[i].text = str(col)
-
-                # Data
-                for _, row in result_df.iterrows():
-                    row_cells = table.add_row().cells
-                    for i, val in enumerate(row):
-                        row_cells[i].text = str(val)
-
-                doc.add_page_break()
+            # Sheet ghi phương án A/B/C/D + đáp án: analyze_sheets đã chấm và phân tích phương án nhiễu
+            if analysis["distractor_df"] is not None:
+                st.write("### 🎯 Phân tích phương án nhiễu")
+                st.caption("Độ phân biệt phương án = (nhóm cao - nhóm thấp) / số SV mỗi nhóm: "
+                           "đáp án đúng nên dương, phương án nhiễu tốt nên âm")
+                st.dataframe(analysis["distractor_df"], use_container_width=True)
 
-                # Đánh giá tổng quan
-                doc.add_heading('2. Đánh giá tổng quan đề thi', level=1)
 
-                # Cơ cấu độ khó
-                doc.add_heading('2.1. Cơ cấu độ khó so với mục tiêu', level=2)
-
-                # Thêm bảng summary
-                summary_table = doc.add_table(rows=1, cols=len(summary_df.columns))
-                summary_table.style = 'Table Grid'
-
-                # Header
-                header_cells = summary_table.rows[0].cells
-                for i, col in enumerate(summary_df.columns):
-                    header_cells[i].text = str(col)
-
-                # Data
-                for _, row in summary_df.iterrows():
-                    row_cells = summary_table.add_row().cells
-                    for i, val in enumerate(row):
-                        row_cells[i].text = str(val)
-
-                doc.add_paragraph()
-
-                # Thống kê độ phân biệt
-                if disc_info:
-                    doc.add_heading('2.2. Thống kê độ phân biệt', level=2)
-                    for key, value in disc_info.items():
-                        doc.add_paragraph(f'{key}: {value}')
-
-                doc.add_paragraph()
-
-                # Kết luận
-                doc.add_heading('3. Kết luận', level=1)
-                conclusion_para = doc.add_paragraph(conclusion)
-                conclusion_para.runs[0].bold = True
-
-                # Lưu vào BytesIO
-                output = BytesIO()
-                doc.save(output)
-                output.seek(0)
-                return output.getvalue()
-
-
-            word_data = convert_to_word(result_df, summary_df, conclusion, disc_info)
-            st.download_button(
+            # ---- Xuất file Word ----
+            # Báo cáo được tạo ở luồng nền, nút tải xuống bật khi file sẵn sàng
+            report_download_button(
+                word_job,
                 label="⬇️ Tải báo cáo Word (.docx)",
-                data=word_data,
                 file_name="bao_cao_do_kho_trac_nghiem.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
+
+            # ---- Xuất file Excel ----
+            report_download_button(
+                excel_job,
+                label="⬇️ Tải kết quả Excel (.xlsx)",
+                file_name="ket_qua_trac_nghiem.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
         elif exam_type == "Hỗn hợp":
-            # Phần hiển thị đã được xử lý ở trên, bây giờ chỉ cần xử lý
+            # Phần hiển thị đã được xử lý ở trên, bây giờ chỉ cần hiển thị kết quả
             try:
-                if len(sheet_names) >= 2:
-                    # Lấy df_max nếu có
-                    df_max = None
-                    if len(sheet_names) >= 3:
-                        df_max = pd.read_excel(uploaded_file, sheet_name=2)
-                        
-                    # Tính toán
-                    from mixed_exam_evaluation import calculate_mix_stats
-
-                    all_results = calculate_mix_stats(df_mcq, df_essay, df_max)
+                all_results = result_df
 
                 st.subheader("📋 Kết quả chi tiết từng câu hỏi (Hỗn hợp):")
                 st.dataframe(all_results, use_container_width=True)
 
-                # Đánh giá tổng quan sử dụng evaluate_exam_difficulty_mix
+                # Đánh giá tổng quan (evaluate_exam_difficulty_mix, như trắc nghiệm / tự luận)
                 st.subheader("📊 Đánh giá tổng quan đề hỗn hợp:")
 
-                # Sử dụng hàm evaluate_exam_difficulty_mix cho consistency
-                summary_df, conclusion, disc_info = evaluate_exam_difficulty_mix(
-                    all_results,
-                    tolerance=0.05,
-                    check_discrimination=True
-                )
-
                 st.write("### 🔎 Cơ cấu độ khó so với mục tiêu")
                 st.dataframe(summary_df, use_container_width=True)
 
                 st.markdown(f"### ✅ Kết luận: **{conclusion}**")
 
                 if disc_info:
-                    st.write("### 📐 Thống kê độ phân biệt")
+                    st.write("### 📐 Thống kê độ phân biệt và độ tin cậy")
                     st.json(disc_info)
+
+                if bank_course and bank_term:
+                    record_in_item_bank(profiler, all_results, exam_type, file_hash, eval_key, uploaded_file.name,
+                                        conclusion, bank_course, bank_term)
                 
                 # Hiển thị thống kê riêng cho từng loại
                 with st.expander("📊 Thống kê chi tiết theo loại câu hỏi"):
@@ -677,99 +851,21 @@ if uploaded_file:
 
 
                 # ---- Xuất file Word ----
-                def convert_to_word(all_results, summary_df, conclusion, disc_info):
-                    doc = Document()
-
-                    # Tiêu đề
-                    title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ ĐỀ HỖN HỢP', 0)
-                    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-                    # Kết quả từng câu
-                    doc.add_heading('1. Kết quả từng câu hỏi', level=1)
-                    table = doc.add_table(rows=1, cols=len(all_results.columns))
-                    table.style = 'Table Grid'
-                    header_cells = table.rows[0].cells
-                    for i, col in enumerate(all_results.columns):
-                        header_cells[i].text = str(col)
-                    for _, row in all_results.iterrows():
-                        row_cells = table.add_row().cells
-                        for i, val in enumerate(row):
-                            row_cells[i].text = str(val)
-
-                    doc.add_page_break()
-
-                    # Đánh giá tổng quan
-                    doc.add_heading('2. Đánh giá tổng quan đề thi', level=1)
-                    
-                    # Cơ cấu độ khó
-                    doc.add_heading('2.1. Cơ cấu độ khó so với mục tiêu', level=2)
-                    
-                    # Thêm bảng summary
-                    summary_table = doc.add_table(rows=1, cols=len(summary_df.columns))
-                    summary_table.style = 'Table Grid'
-                    
-                    # Header
-                    header_cells = summary_table.rows[0].cells
-                    for i, col in enumerate(summary_df.columns):
-                        header_cells[i].text = str(col)
-                    
-                    # Data
-                    for _, row in summary_df.iterrows():
-                        row_cells = summary_table.add_row().cells
-                        for i, val in enumerate(row):
-                            row_cells[i].text = str(val)
-                    
-                    doc.add_paragraph()
-                    
-                    # Thống kê độ phân biệt
-                    if disc_info:
-                        doc.add_heading('2.2. Thống kê độ phân biệt', level=2)
-                        for key, value in disc_info.items():
-                            doc.add_paragraph(f'{key}: {value}')
-                    
-                    doc.add_paragraph()
-                    
-                    # Thống kê theo loại câu
-                    doc.add_heading('2.3. Thống kê theo loại câu hỏi', level=2)
-                    
-                    mc_rows = all_results[all_results['Loại câu'] == 'Trắc nghiệm']
-                    essay_rows = all_results[all_results['Loại câu'] == 'Tự luận']
-                    
-                    doc.add_paragraph('Trắc nghiệm:')
-                    if not mc_rows.empty and 'Độ khó (P)' in mc_rows.columns:
-                        doc.add_paragraph(f'• Số câu: {len(mc_rows)}', style='List Bullet')
-                        doc.add_paragraph(f'• Độ khó TB: {mc_rows["Độ khó (P)"].mean():.2f}', style='List Bullet')
-                        if 'Độ phân biệt (D)' in mc_rows.columns:
-                            doc.add_paragraph(f'• Độ phân biệt TB: {mc_rows["Độ phân biệt (D)"].mean():.3f}', style='List Bullet')
-                    
-                    doc.add_paragraph('Tự luận:')
-                    if not essay_rows.empty and 'Độ khó (P)' in essay_rows.columns:
-                        doc.add_paragraph(f'• Số câu: {len(essay_rows)}', style='List Bullet')
-                        doc.add_paragraph(f'• Độ khó TB: {essay_rows["Độ khó (P)"].mean():.2f}', style='List Bullet')
-                        if 'Độ phân biệt (D)' in essay_rows.columns:
-                            doc.add_paragraph(f'• Độ phân biệt TB: {essay_rows["Độ phân biệt (D)"].mean():.3f}', style='List Bullet')
-                    
-                    doc.add_paragraph()
-                    
-                    # Kết luận
-                    doc.add_heading('3. Kết luận', level=1)
-                    conclusion_para = doc.add_paragraph(conclusion)
-                    conclusion_para.runs[0].bold = True
-
-                    # Lưu file
-                    output = BytesIO()
-                    doc.save(output)
-                    output.seek(0)
-                    return output.getvalue()
-
-
-                word_data = convert_to_word(all_results, summary_df, conclusion, disc_info)
-                st.download_button(
-                        label="⬇️ Tải báo cáo Word (.docx)",
-                        data=word_data,
-                        file_name="bao_cao_de_hon_hop.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
+                # Báo cáo được tạo ở luồng nền, nút tải xuống bật khi file sẵn sàng
+                report_download_button(
+                    word_job,
+                    label="⬇️ Tải báo cáo Word (.docx)",
+                    file_name="bao_cao_de_hon_hop.docx",
+                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )
+
+                # ---- Xuất file Excel ----
+                report_download_button(
+                    excel_job,
+                    label="⬇️ Tải kết quả Excel (.xlsx)",
+                    file_name="ket_qua_de_hon_hop.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
 
             except Exception as e:
                 st.error(f"❌ Lỗi khi xử lý đề hỗn hợp: {e}")
@@ -777,29 +873,20 @@ if uploaded_file:
         else:  # Tự luận
             st.subheader("📋 Xử lý đề thi tự luận")
 
-            # Đọc sheet 2 nếu có (chứa điểm tối đa)
-            max_scores_df = None
+            # Sheet 2 nếu có (chứa điểm tối đa), analyze_sheets đã dùng khi tính P, D
+            max_scores_df = analysis["max_scores_df"]
             try:
-                # Đọc tất cả sheets
-                excel_file = pd.ExcelFile(uploaded_file)
-                sheet_names = excel_file.sheet_names
-
-                if len(sheet_names) >= 2:
-                    # Đọc sheet 2 (index 1)
-                    max_scores_df = pd.read_excel(uploaded_file, sheet_name=sheet_names[1])
+                if max_scores_df is not None:
                     st.info(f"📊 Đã tìm thấy sheet điểm tối đa: {sheet_names[1]}")
 
                     # Hiển thị điểm tối đa
                     with st.expander("📋 Xem điểm tối đa từng câu"):
-                        st.dataframe(max_scores_df, use_container_width=True)
+                        st.dataframe(to_display_frame(max_scores_df), use_container_width=True)
                 else:
                     st.warning("⚠️ Không tìm thấy sheet thứ 2 chứa điểm tối đa. Sẽ sử dụng điểm cao nhất thực tế.")
             except Exception as e:
                 st.warning(f"⚠️ Không thể đọc sheet 2: {e}")
 
-            # Tính toán độ khó từng câu cho tự luận
-            result_df = calculate_essay_stats(df_input, max_scores_df)
-
             st.subheader("📋 Kết quả tính độ khó từng câu (Tự luận):")
             st.dataframe(result_df, use_container_width=True)
 
@@ -812,146 +899,55 @@ if uploaded_file:
 
                 **Độ phân biệt (D)**:
                 - Công thức: `D = (Điểm TB nhóm cao - Điểm TB nhóm thấp) / Điểm tối đa`
-                - D ≥ 0.4: Rất tốt
-                - 0.3 ≤ D < 0.4: Tốt  
-                - 0.2 ≤ D < 0.3: Trung bình
-                - D < 0.2: Kém
-                """)
+                """ + "\n".join(f"                - {line}" for line in rubric.discrimination.describe("D")))
 
             # ---- 🔹 ĐÁNH GIÁ ĐỀ THI ----
             st.subheader("📊 Đánh giá tổng quan đề thi:")
 
-            summary_df, conclusion, disc_info = evaluate_exam_difficulty_mix(
-                result_df,
-                tolerance=0.05,
-                check_discrimination=True
-            )
-
             st.write("### 🔎 Cơ cấu độ khó so với mục tiêu")
             st.dataframe(summary_df, use_container_width=True)
 
             st.markdown(f"### ✅ Kết luận: **{conclusion}**")
 
             if disc_info:
-                st.write("### 📐 Thống kê độ phân biệt")
+                st.write("### 📐 Thống kê độ phân biệt và độ tin cậy")
                 st.json(disc_info)
 
+            if bank_course and bank_term:
+                record_in_item_bank(profiler, result_df, exam_type, file_hash, eval_key, uploaded_file.name,
+                                    conclusion, bank_course, bank_term)
 
-            # ---- Xuất file Word ----
-            def convert_to_word(result_df, summary_df, conclusion, disc_info, max_scores_df=None):
-                doc = Document()
-
-                # Tiêu đề
-                title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ ĐỘ KHÓ ĐỀ THI TỰ LUẬN', 0)
-                title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-                # Kết quả từng câu
-                doc.add_heading('1. Kết quả tính độ khó từng câu', level=1)
-
-                # Thêm bảng kết quả
-                table = doc.add_table(rows=1, cols=len(result_df.columns))
-                table.style = 'Table Grid'
-
-                # Header
-                header_cells = table.rows[0].cells
-                for i, col in enumerate(result_df.columns):
-                    header_cells[i].text = str(col)
-
-                # Data
-                for _, row in result_df.iterrows():
-                    row_cells = table.add_row().cells
-                    for i, val in enumerate(row):
-                        row_cells[i].text = str(val)
-
-                # Điểm tối đa nếu có
-                if max_scores_df is not None:
-                    doc.add_paragraph()
-                    doc.add_heading('1.1. Điểm tối đa từng câu', level=2)
-                    max_table = doc.add_table(rows=1, cols=len(max_scores_df.columns))
-                    max_table.style = 'Table Grid'
-
-                    # Header
-                    header_cells = max_table.rows[0].cells
-                    for i, col in enumerate(max_scores_df.columns):
-                        header_cells[i].text = str(col)
-
-                    # Data
-                    for _, row in max_scores_df.iterrows():
-                        row_cells = max_table.add_row().cells
-                        for i, val in enumerate(row):
-                            row_cells[i].text = str(val)
-
-                doc.add_page_break()
-
-                # Đánh giá tổng quan
-                doc.add_heading('2. Đánh giá tổng quan đề thi', level=1)
-
-                # Cơ cấu độ khó
-                doc.add_heading('2.1. Cơ cấu độ khó so với mục tiêu', level=2)
-
-                # Thêm bảng summary
-                summary_table = doc.add_table(rows=1, cols=len(summary_df.columns))
-                summary_table.style = 'Table Grid'
-
-                # Header
-                header_cells = summary_table.rows[0].cells
-                for i, col in enumerate(summary_df.columns):
-                    header_cells[i].text = str(col)
 
-                # Data
-                for _, row in summary_df.iterrows():
-                    row_cells = summary_table.add_row().cells
-                    for i, val in enumerate(row):
-                        row_cells[i].text = str(val)
-
-                doc.add_paragraph()
-
-                # Thống kê độ phân biệt
-                if disc_info:
-                    doc.add_heading('2.2. Thống kê độ phân biệt', level=2)
-                    for key, value in disc_info.items():
-                        doc.add_paragraph(f'{key}: {value}')
-
-                doc.add_paragraph()
-
-                # Giải thích cách tính
-                doc.add_heading('2.3. Giải thích cách tính', level=2)
-                doc.add_paragraph('Độ khó (P):')
-                doc.add_paragraph('• Công thức: P = (Điểm TB của tất cả SV / Điểm tối đa) × 100', style='List Bullet')
-                doc.add_paragraph('• Điểm tối đa lấy từ sheet 2 hoặc điểm cao nhất thực tế', style='List Bullet')
-
-                doc.add_paragraph('Độ phân biệt (D):')
-                doc.add_paragraph('• Công thức: D = (Điểm TB nhóm cao - Điểm TB nhóm thấp) / Điểm tối đa',
-                                  style='List Bullet')
-                doc.add_paragraph('• D ≥ 0.4: Rất tốt', style='List Bullet')
-                doc.add_paragraph('• 0.3 ≤ D < 0.4: Tốt', style='List Bullet')
-                doc.add_paragraph('• 0.2 ≤ D < 0.3: Trung bình', style='List Bullet')
-                doc.add_paragraph('• D < 0.2: Kém', style='List Bullet')
-
-                doc.add_paragraph()
-
-                # Kết luận
-                doc.add_heading('3. Kết luận', level=1)
-                conclusion_para = doc.add_paragraph(conclusion)
-                conclusion_para.runs[0].bold = True
-
-                # Lưu vào BytesIO
-                output = BytesIO()
-                doc.save(output)
-                output.seek(0)
-                return output.getvalue()
-
-
-            word_data = convert_to_word(result_df, summary_df, conclusion, disc_info, max_scores_df)
-            st.download_button(
+            # ---- Xuất file Word ----
+            # Báo cáo được tạo ở luồng nền, nút tải xuống bật khi file sẵn sàng
+            report_download_button(
+                word_job,
                 label="⬇️ Tải báo cáo Word (.docx)",
-                data=word_data,
                 file_name="bao_cao_do_kho_tu_luan.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
 
+            # ---- Xuất file Excel ----
+            report_download_button(
+                excel_job,
+                label="⬇️ Tải kết quả Excel (.xlsx)",
+                file_name="ket_qua_do_kho_tu_luan.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+
+        # ---- Chẩn đoán hiệu năng ----
+        status_badge.markdown(processing_badge(f"Done · {profiler.total_ms:.0f} ms"), unsafe_allow_html=True)
+        show_diagnostics(profiler, {} if section_view else {
+            "Tạo báo cáo Word": ("docx",) + eval_key,
+            "Tạo file Excel": ("xlsx",) + eval_key,
+        })
+
     except Exception as e:
         st.error(f"❌ Đã xảy ra lỗi: {e}")
+    finally:
+        # tracemalloc dùng chung cả tiến trình: trả lại ngay khi lần chạy này xong
+        if profiler is not None:
+            profiler.close()
 else:
     st.markdown("""
     <div style='
@@ -0,0 +1,159 @@
+"""
+Đánh giá hàng loạt nhiều file đề thi (.xlsx) không cần giao diện
+
+Ví dụ:
+    python batch_evaluate.py "de_thi/*.xlsx" --exam-type "Trắc nghiệm" --output-dir bao_cao
+    python batch_evaluate.py de_thi/ --exam-type "Tự luận" --workers 8
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from exam_analysis import EXAM_TYPES, analyze_sheets, build_word_report, build_excel_report
+from columnar_cache import open_disk_cache
+from item_bank import ItemBank
+from rubric import default_rubric, load_rubric
+from workbook_loader import load_workbook_sheets
+
+
+def collect_files(inputs) -> list:
+    """Liệt kê các file .xlsx từ danh sách thư mục / mẫu glob / đường dẫn"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, "*.xlsx")))
+        else:
+            files.extend(glob.glob(item))
+    # Bỏ file tạm của Excel (~$...) và các file trùng lặp, giữ thứ tự ổn định
+    return sorted({f for f in files if not os.path.basename(f).startswith("~$")})
+
+
+def evaluate_file(path: str, exam_type: str, output_dir: str = None,
+                  tolerance: float = None, check_discrimination: bool = True, n_bootstrap: int = 0,
+                  excel: bool = False, cache_dir: str = None, use_cache: bool = True,
+                  course: str = None, term: str = None, bank_path: str = None, rubric=None,
+                  streaming: bool = None) -> dict:
+    """Phân tích một file và (tuỳ chọn) ghi báo cáo Word / Excel; trả về một dòng tổng hợp"""
+    row = {"Tệp": os.path.basename(path), "Loại đề": exam_type}
+    try:
+        with open(path, "rb") as f:
+            disk_cache = open_disk_cache(cache_dir) if use_cache else None
+            digest, sheets = load_workbook_sheets(f.read(), disk_cache, streaming)
+        sheet_frames = list(sheets.values())
+
+        analysis = analyze_sheets(sheet_frames, exam_type, tolerance, check_discrimination, n_bootstrap,
+                                  rubric=rubric)
+
+        result_df = analysis["result_df"]
+        summary_df = analysis["summary_df"].set_index("Nhóm")
+        disc_col = next((col for col in result_df.columns if "Độ phân biệt" in col), None)
+        row.update({
+            "Số câu": len(result_df),
+            "Số SV": int(result_df["Tổng số SV"].iloc[0]) if "Tổng số SV" in result_df.columns and len(result_df) else None,
+            "Độ khó TB": round(result_df["Độ khó (P)"].mean(), 2),
+            "Độ phân biệt TB": round(result_df[disc_col].mean(), 3) if disc_col else None,
+        })
+        row.update({f"Số câu {group}": int(n) for group, n in summary_df["Số câu"].items()})
+        row["Kết luận"] = analysis["conclusion"]
+
+        if course and term:
+            ItemBank(bank_path).record_exam(result_df, exam_type, course, term, digest,
+                                            os.path.basename(path), analysis["conclusion"])
+            row["Ngân hàng câu hỏi"] = f"{course} / {term}"
+
+        if output_dir:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            report_path = os.path.join(output_dir, f"{stem}_bao_cao.docx")
+            with open(report_path, "wb") as f:
+                f.write(build_word_report(exam_type, analysis))
+            row["Báo cáo"] = report_path
+            if excel:
+                excel_path = os.path.join(output_dir, f"{stem}_ket_qua.xlsx")
+                with open(excel_path, "wb") as f:
+                    f.write(build_excel_report(exam_type, analysis, sheet_frames))
+                row["Kết quả Excel"] = excel_path
+    except Exception as e:
+        row["Lỗi"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Đánh giá hàng loạt đề thi từ các file Excel")
+    parser.add_argument("inputs", nargs="+", help="Thư mục, mẫu glob hoặc đường dẫn file .xlsx")
+    parser.add_argument("--exam-type", required=True, choices=EXAM_TYPES, help="Hình thức đề thi")
+    parser.add_argument("--output-dir", default="bao_cao", help="Thư mục ghi báo cáo (mặc định: bao_cao)")
+    parser.add_argument("--summary", default=None,
+                        help="File CSV tổng hợp (mặc định: <output-dir>/tong_hop.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="Số tiến trình (mặc định: số lõi CPU)")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Sai số cho phép của cơ cấu độ khó (mặc định theo bộ tiêu chí)")
+    parser.add_argument("--rubric", default=None,
+                        help="File JSON bộ tiêu chí đánh giá (ngưỡng P, D, cơ cấu mục tiêu; mặc định: $EXAM_RUBRIC)")
+    parser.add_argument("--no-discrimination", action="store_true", help="Không kiểm tra tiêu chí độ phân biệt")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                        help="Thêm khoảng tin cậy bootstrap cho P và D với N lần lặp")
+    parser.add_argument("--excel", action="store_true", help="Ghi thêm kết quả Excel (.xlsx) cho từng file")
+    parser.add_argument("--no-reports", action="store_true", help="Chỉ ghi bảng tổng hợp, không tạo file Word")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Bật bộ nhớ đệm dữ liệu đã đọc trên đĩa tại thư mục này (mặc định: $EXAM_CACHE_DIR; "
+                             "không đặt thì không ghi dữ liệu SV ra đĩa)")
+    parser.add_argument("--no-cache", action="store_true", help="Không dùng bộ nhớ đệm trên đĩa kể cả khi đặt $EXAM_CACHE_DIR")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Luôn đọc tuần tự (read-only) sheet điểm thành ma trận điểm gọn, không chỉ với file "
+                             "lớn từ $EXAM_STREAMING_MB (mặc định 8 MB)")
+    parser.add_argument("--course", default=None, help="Mã học phần: lưu kết quả từng câu vào ngân hàng câu hỏi")
+    parser.add_argument("--term", default=None, help="Học kỳ / năm học khi lưu vào ngân hàng câu hỏi")
+    parser.add_argument("--item-bank", default=None,
+                        help="File SQLite ngân hàng câu hỏi (mặc định: $EXAM_ITEM_BANK hoặc "
+                             "~/.local/share/exam_quality/item_bank.sqlite3)")
+    args = parser.parse_args(argv)
+    if bool(args.course) != bool(args.term):
+        parser.error("--course và --term phải được dùng cùng nhau")
+    try:
+        rubric = load_rubric(args.rubric) if args.rubric else default_rubric()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        parser.error(f"Không đọc được bộ tiêu chí {args.rubric or '$EXAM_RUBRIC'}: {e}")
+
+    files = collect_files(args.inputs)
+    if not files:
+        print("Không tìm thấy file .xlsx nào", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    report_dir = None if args.no_reports else args.output_dir
+    check_discrimination = not args.no_discrimination
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(evaluate_file, path, args.exam_type, report_dir, args.tolerance, check_discrimination,
+                        args.bootstrap, args.excel, args.cache_dir, not args.no_cache,
+                        args.course, args.term, args.item_bank, rubric, args.streaming or None)
+            for path in files
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            rows.append(row)
+            status = row.get("Lỗi") or row.get("Kết luận")
+            print(f"[{done}/{len(files)}] {row['Tệp']}: {status}")
+    elapsed = time.perf_counter() - start
+
+    summary = pd.DataFrame(rows).sort_values("Tệp").reset_index(drop=True)
+    summary_path = args.summary or os.path.join(args.output_dir, "tong_hop.csv")
+    summary.to_csv(summary_path, index=False, encoding="utf-8-sig")
+
+    failed = int(summary["Lỗi"].notna().sum()) if "Lỗi" in summary.columns else 0
+    print(f"Đã xử lý {len(files)} file ({failed} lỗi) trong {elapsed:.2f}s "
+          f"- {len(files) / elapsed:.2f} file/s")
+    print(f"Bảng tổng hợp: {summary_path}")
+    return 0 if failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Đo thời gian các bước: đọc file, thống kê, đánh giá, xuất báo cáo
+
+Kết quả được ghi ra JSON để so sánh giữa các lần chạy / phiên bản.
+
+Ví dụ:
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --students 1000 10000 100000 --items 50 200 500 -o bench.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from synthetic_exam import EXAM_TYPES, generate_workbook, write_workbook
+from exam_analysis import analyze_sheets, build_word_report, build_excel_report
+from processor_common import evaluate_exam_difficulty_mix
+from columnar_cache import ColumnarCache
+from score_matrix import read_score_matrix
+from workbook_loader import _parse_all_sheets, file_digest
+
+DEFAULT_STUDENTS = [1_000, 10_000, 100_000]
+DEFAULT_ITEMS = [50, 200, 500]
+
+
+def time_call(func, repeats: int) -> dict:
+    """Chạy `func` `repeats` lần, trả về thời gian nhỏ nhất / trung vị (giây)"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"seconds_min": min(timings), "seconds_median": statistics.median(timings), "repeats": repeats}
+
+
+def bench_case(exam_type: str, n_students: int, n_items: int, repeats: int, seed: int,
+               max_parse_cells: int, work_dir: str) -> list:
+    """Đo mọi bước cho một cấu hình (loại đề, số SV, số câu)"""
+    sheets = generate_workbook(exam_type, n_students, n_items, seed)
+    sheet_frames = list(sheets.values())
+    stages = {}
+
+    # Đọc file: openpyxl/pandas, đọc tuần tự ma trận điểm, nạp lại từ bộ nhớ đệm theo cột
+    if n_students * n_items <= max_parse_cells:
+        path = os.path.join(work_dir, f"{n_students}x{n_items}.xlsx")
+        write_workbook(path, sheets)
+        with open(path, "rb") as f:
+            data = f.read()
+        stages["parse_excel"] = lambda: _parse_all_sheets(data)
+        stages["parse_streaming"] = lambda: read_score_matrix(io.BytesIO(data), 0)
+        cache = ColumnarCache(os.path.join(work_dir, "cache"))
+        digest = file_digest(data)
+        cache.save(digest, sheets)
+        stages["parse_cached"] = lambda: cache.load(digest)
+
+    analysis = analyze_sheets(sheet_frames, exam_type)
+    result_df = analysis["result_df"]
+
+    stages["stats"] = lambda: analyze_sheets(sheet_frames, exam_type)
+    stages["evaluate"] = lambda: evaluate_exam_difficulty_mix(result_df)
+    stages["report_word"] = lambda: build_word_report(exam_type, analysis)
+    stages["report_excel"] = lambda: build_excel_report(exam_type, analysis, sheet_frames)
+
+    rows = []
+    for stage, func in stages.items():
+        row = {"exam_type": exam_type, "students": n_students, "items": n_items, "stage": stage}
+        row.update(time_call(func, repeats))
+        rows.append(row)
+        print(f"{exam_type:12} {n_students:>7} x {n_items:<4} {stage:16} {row['seconds_min'] * 1000:10.1f} ms",
+              file=sys.stderr)
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Đo hiệu năng trên dữ liệu tổng hợp")
+    parser.add_argument("--exam-types", nargs="+", choices=EXAM_TYPES, default=EXAM_TYPES, help="Các loại đề cần đo")
+    parser.add_argument("--students", nargs="+", type=int, default=DEFAULT_STUDENTS, help="Các số SV")
+    parser.add_argument("--items", nargs="+", type=int, default=DEFAULT_ITEMS, help="Các số câu")
+    parser.add_argument("--repeats", type=int, default=3, help="Số lần lặp mỗi bước")
+    parser.add_argument("--seed", type=int, default=0, help="Hạt giống sinh dữ liệu")
+    parser.add_argument("--max-parse-cells", type=int, default=2_000_000,
+                        help="Bỏ qua bước đọc file .xlsx khi số ô (SV x câu) vượt quá ngưỡng này")
+    parser.add_argument("--quick", action="store_true", help="Chỉ đo cấu hình nhỏ (1000 SV x 50 câu, 1 lần)")
+    parser.add_argument("-o", "--output", default=None, help="File JSON kết quả (mặc định: in ra màn hình)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.students, args.items, args.repeats = [1_000], [50], 1
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for exam_type in args.exam_types:
+            for n_students in args.students:
+                for n_items in args.items:
+                    results.extend(bench_case(exam_type, n_students, n_items, args.repeats, args.seed,
+                                              args.max_parse_cells, work_dir))
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "config": {"repeats": args.repeats, "seed": args.seed, "max_parse_cells": args.max_parse_cells},
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Đã ghi {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+"""
+Đo thời gian khởi động app.py: lần chạy đầu trong tiến trình mới (trang tải file) và các lần chạy lại
+
+Streamlit chạy lại toàn bộ script sau mỗi thao tác, còn mỗi container mới phải import từ đầu.
+Mỗi lần đo là một tiến trình Python mới: import streamlit, chạy app.py một lần (khởi động lạnh,
+chưa có file), rồi chạy lại nhiều lần (chạy lại khi đã nạp module). Trang tải file không được
+nạp các thư viện nặng (pandas, numpy, scipy, python-docx, openpyxl, pyarrow); chúng chỉ được
+import trong nhánh xử lý tương ứng, thời gian import của từng nhánh cũng được đo riêng.
+
+Thoát với mã 1 nếu vượt mục tiêu thời gian hoặc trang tải file nạp thư viện nặng.
+
+Ví dụ:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --repeats 10 --max-cold-ms 200 -o startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+HEAVY_MODULES = ["pandas", "numpy", "scipy", "docx", "openpyxl", "pyarrow"]
+
+# Module được import khi xử lý file, theo nhánh của app.py
+BRANCH_MODULES = {
+    "Trắc nghiệm": ["instrumentation", "workbook_loader", "score_matrix", "processor_common",
+                    "processor_multiple_choice", "distractor_analysis"],
+    "Tự luận": ["instrumentation", "workbook_loader", "score_matrix", "processor_common", "processor_essay"],
+    "Hỗn hợp": ["instrumentation", "workbook_loader", "score_matrix", "processor_common", "mixed_exam_evaluation"],
+    "IRT": ["irt"],
+    "So sánh lớp": ["section_comparison"],
+    "Báo cáo Word / Excel": ["report_word", "report_excel"],
+}
+
+# Chạy trong tiến trình con: in một dòng JSON kết quả
+_STARTUP_PROBE = """
+import json, runpy, sys, time
+start = time.perf_counter()
+import streamlit
+imported = time.perf_counter()
+runpy.run_path({app!r}, run_name="__main__")
+cold = time.perf_counter()
+reruns = []
+for _ in range({reruns}):
+    begin = time.perf_counter()
+    runpy.run_path({app!r}, run_name="__main__")
+    reruns.append(time.perf_counter() - begin)
+print(json.dumps({{
+    "import_streamlit": imported - start,
+    "cold_run": cold - imported,
+    "rerun": reruns,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+_IMPORT_PROBE = """
+import json, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps({{"import": time.perf_counter() - start}}))
+"""
+
+
+def run_probe(code: str) -> dict:
+    """Chạy đoạn mã trong một tiến trình Python mới (thư mục gốc của repo), trả về dòng JSON cuối"""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # Chạy app.py ngoài `streamlit run` sinh cảnh báo "missing ScriptRunContext" ra stderr: bỏ qua
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Tiến trình đo bị lỗi:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(values) -> dict:
+    return {"ms_min": min(values) * 1000, "ms_median": statistics.median(values) * 1000, "samples": len(values)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Đo thời gian khởi động lạnh / chạy lại của app.py")
+    parser.add_argument("--repeats", type=int, default=5, help="Số tiến trình mới cho mỗi phép đo (mặc định: 5)")
+    parser.add_argument("--reruns", type=int, default=5, help="Số lần chạy lại trong mỗi tiến trình (mặc định: 5)")
+    parser.add_argument("--max-cold-ms", type=float, default=250.0,
+                        help="Mục tiêu: trung vị lần chạy đầu của app.py, không tính import streamlit (ms)")
+    parser.add_argument("--max-rerun-ms", type=float, default=50.0,
+                        help="Mục tiêu: trung vị một lần chạy lại (ms)")
+    parser.add_argument("--no-branches", action="store_true", help="Không đo thời gian import của từng nhánh")
+    parser.add_argument("-o", "--output", default=None, help="File JSON kết quả (mặc định: in ra màn hình)")
+    args = parser.parse_args(argv)
+
+    probes = [run_probe(_STARTUP_PROBE.format(app=APP, reruns=args.reruns, heavy=HEAVY_MODULES))
+              for _ in range(args.repeats)]
+    results = {
+        "import_streamlit": summarize([p["import_streamlit"] for p in probes]),
+        "cold_run": summarize([p["cold_run"] for p in probes]),
+        "rerun": summarize([t for p in probes for t in p["rerun"]]),
+    }
+    heavy = sorted({m for p in probes for m in p["heavy_modules"]})
+    for stage, row in results.items():
+        print(f"{stage:28} {row['ms_median']:10.1f} ms (min {row['ms_min']:.1f})", file=sys.stderr)
+
+    branches = {}
+    if not args.no_branches:
+        for branch, modules in BRANCH_MODULES.items():
+            timings = [run_probe(_IMPORT_PROBE.format(modules=modules))["import"] for _ in range(args.repeats)]
+            branches[branch] = summarize(timings)
+            print(f"import {branch:21} {branches[branch]['ms_median']:10.1f} ms", file=sys.stderr)
+
+    failures = []
+    if results["cold_run"]["ms_median"] > args.max_cold_ms:
+        failures.append(f"Lần chạy đầu {results['cold_run']['ms_median']:.1f} ms > {args.max_cold_ms:g} ms")
+    if results["rerun"]["ms_median"] > args.max_rerun_ms:
+        failures.append(f"Chạy lại {results['rerun']['ms_median']:.1f} ms > {args.max_rerun_ms:g} ms")
+    if heavy:
+        failures.append(f"Trang tải file nạp thư viện nặng: {', '.join(heavy)}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {"repeats": args.repeats, "reruns": args.reruns,
+                   "max_cold_ms": args.max_cold_ms, "max_rerun_ms": args.max_rerun_ms},
+        "results": results,
+        "heavy_modules_on_upload_page": heavy,
+        "branch_imports": branches,
+        "failures": failures,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Đã ghi {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""
+Sinh dữ liệu bài thi tổng hợp (có hạt giống) để đo hiệu năng
+
+Ví dụ:
+    python benchmarks/synthetic_exam.py --exam-type "Hỗn hợp" --students 10000 --items 200 -o de_mau.xlsx
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+EXAM_TYPES = ["Trắc nghiệm", "Tự luận", "Hỗn hợp"]
+
+# Các mức điểm tối đa có thể của một câu tự luận
+_ESSAY_MAX_SCORES = np.array([1.0, 1.5, 2.0, 2.5, 3.0])
+
+
+def generate_multiple_choice(n_students: int, n_items: int, seed: int = 0,
+                             missing: float = 0.0) -> pd.DataFrame:
+    """
+    Sheet điểm trắc nghiệm 0/1 theo mô hình logistic (năng lực SV - độ khó câu)
+
+    Parameters:
+    -----------
+    n_students, n_items : int
+        Số SV và số câu
+    seed : int
+        Hạt giống ngẫu nhiên
+    missing : float
+        Tỷ lệ ô bỏ trống
+
+    Returns:
+    --------
+    pd.DataFrame
+        STT, Họ tên, Câu 1..Câu n_items
+    """
+    rng = np.random.default_rng(seed)
+    ability = rng.normal(size=n_students)
+    difficulty = rng.normal(scale=1.2, size=n_items)
+    prob = 1 / (1 + np.exp(-(ability[:, None] - difficulty)))
+    scores = (rng.random((n_students, n_items)) < prob).astype(np.float64)
+    if missing > 0:
+        scores[rng.random(scores.shape) < missing] = np.nan
+    return _score_sheet(scores, [f"Câu {i + 1}" for i in range(n_items)])
+
+
+def generate_essay(n_students: int, n_items: int, seed: int = 0, prefix: str = "Câu"):
+    """
+    Sheet điểm tự luận (bước 0.25) và sheet điểm tối đa tương ứng
+
+    Returns:
+    --------
+    tuple[pd.DataFrame, pd.DataFrame]
+        Sheet điểm (STT, Họ tên, các câu) và sheet điểm tối đa (một dòng)
+    """
+    rng = np.random.default_rng(seed)
+    max_scores = rng.choice(_ESSAY_MAX_SCORES, size=n_items)
+    ability = rng.beta(2.5, 2.0, size=n_students)
+    raw = ability[:, None] * max_scores + rng.normal(0, 0.35, (n_students, n_items)) * max_scores
+    scores = np.round(np.clip(raw, 0, max_scores) * 4) / 4
+
+    question_cols = [f"{prefix} {i + 1}" for i in range(n_items)]
+    return _score_sheet(scores, question_cols), pd.DataFrame([max_scores], columns=question_cols)
+
+
+def generate_workbook(exam_type: str, n_students: int, n_items: int, seed: int = 0) -> dict:
+    """
+    Các sheet của một workbook theo đúng bố cục mà ứng dụng yêu cầu
+
+    - Trắc nghiệm: một sheet điểm
+    - Tự luận: sheet điểm, sheet điểm tối đa
+    - Hỗn hợp: sheet trắc nghiệm, sheet tự luận, sheet điểm tối đa (một nửa số câu mỗi phần)
+
+    Returns:
+    --------
+    dict
+        {tên sheet: DataFrame} theo thứ tự sheet
+    """
+    if exam_type == "Trắc nghiệm":
+        return {"Trắc nghiệm": generate_multiple_choice(n_students, n_items, seed)}
+    if exam_type == "Tự luận":
+        scores, max_scores = generate_essay(n_students, n_items, seed)
+        return {"Tự luận": scores, "Điểm tối đa": max_scores}
+    if exam_type == "Hỗn hợp":
+        n_mc = n_items // 2
+        mc = generate_multiple_choice(n_students, n_mc, seed)
+        essay, max_scores = generate_essay(n_students, n_items - n_mc, seed + 1, prefix="Câu TL")
+        return {"Trắc nghiệm": mc, "Tự luận": essay, "Điểm tối đa": max_scores}
+    raise ValueError(f"Loại đề không hợp lệ: {exam_type}")
+
+
+def write_workbook(path, sheets: dict):
+    """Ghi các sheet ra file .xlsx bằng chế độ write-only của openpyxl"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(title=name)
+        ws.append(list(df.columns))
+        for row in df.itertuples(index=False):
+            ws.append([None if isinstance(v, float) and np.isnan(v) else v for v in row])
+    wb.save(path)
+
+
+def _score_sheet(scores: np.ndarray, question_cols) -> pd.DataFrame:
+    """Ghép STT, họ tên và ma trận điểm thành sheet điểm"""
+    n_students = scores.shape[0]
+    df = pd.DataFrame(scores, columns=question_cols)
+    df.insert(0, "STT", np.arange(1, n_students + 1))
+    df.insert(1, "Họ tên", [f"Sinh viên {i + 1}" for i in range(n_students)])
+    return df
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sinh file Excel bài thi tổng hợp")
+    parser.add_argument("--exam-type", choices=EXAM_TYPES, default="Trắc nghiệm", help="Hình thức đề thi")
+    parser.add_argument("--students", type=int, default=1000, help="Số sinh viên")
+    parser.add_argument("--items", type=int, default=50, help="Số câu hỏi")
+    parser.add_argument("--seed", type=int, default=0, help="Hạt giống ngẫu nhiên")
+    parser.add_argument("-o", "--output", required=True, help="File .xlsx cần ghi")
+    args = parser.parse_args(argv)
+
+    write_workbook(args.output, generate_workbook(args.exam_type, args.students, args.items, args.seed))
+    print(f"Đã ghi {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+import math
+import warnings
+import numpy as np
+
+# Số phần tử tối đa của ma trận trọng số (lần lặp x SV) trong một khối
+_MAX_BATCH_CELLS = 4_000_000
+
+
+def bootstrap_item_intervals(values: np.ndarray, total_scores: np.ndarray, valid: np.ndarray = None,
+                             n_bootstrap: int = 1000, confidence: float = 0.95,
+                             random_state=0, ratio: float = 0.27) -> dict:
+    """
+    Khoảng tin cậy bootstrap (phân vị) cho P và D của mọi câu hỏi cùng lúc
+
+    Mỗi lần lặp là một mẫu lặp lại có hoàn lại của SV, biểu diễn bằng vector số lần
+    xuất hiện của từng SV. Các lần lặp được xử lý theo khối: ma trận số lần xuất hiện
+    (lần lặp x SV) nhân với ma trận điểm (SV x câu) cho tất cả câu hỏi cùng lúc, nhóm
+    cao / thấp 27% của từng lần lặp được lấy bằng tổng tích luỹ trên thứ tự tổng điểm.
+
+    Parameters:
+    -----------
+    values : np.ndarray
+        Điểm đã chuẩn hoá (SV x câu): 0/1 cho trắc nghiệm, điểm / điểm tối đa cho tự luận
+    total_scores : np.ndarray
+        Tổng điểm của từng SV (dùng để chia nhóm)
+    valid : np.ndarray, optional
+        Mặt nạ ô có điểm (SV x câu). Nếu có, trung bình chỉ tính trên các ô có điểm;
+        nếu không, mọi ô được tính (ô trống đã được quy về 0)
+    n_bootstrap : int
+        Số lần lặp
+    confidence : float
+        Mức tin cậy của khoảng
+    random_state : int | np.random.Generator | None
+        Hạt giống của bộ sinh số ngẫu nhiên, để kết quả lặp lại được
+    ratio : float
+        Tỷ lệ SV của mỗi nhóm cao / thấp
+
+    Returns:
+    --------
+    dict
+        "P_low", "P_high" (theo %), "D_low", "D_high": mảng theo câu hỏi
+    """
+    if n_bootstrap < 1:
+        raise ValueError("Số lần lặp bootstrap phải lớn hơn 0")
+
+    rng = np.random.default_rng(random_state)
+    values = np.asarray(values, dtype=np.float64)
+    n, k = values.shape
+    group_size = math.floor(n * ratio)
+
+    # Sắp SV theo tổng điểm giảm dần một lần cho mọi lần lặp
+    order = np.argsort(-np.asarray(total_scores, dtype=np.float64), kind="stable")
+    values_sorted = values[order]
+    valid_sorted = None if valid is None else np.asarray(valid, dtype=np.float64)[order]
+
+    batch_size = max(1, min(n_bootstrap, _MAX_BATCH_CELLS // max(n, 1)))
+    P_samples = np.empty((n_bootstrap, k))
+    D_samples = np.empty((n_bootstrap, k))
+
+    for start in range(0, n_bootstrap, batch_size):
+        stop = min(start + batch_size, n_bootstrap)
+        # Số lần xuất hiện của từng SV (đã theo thứ tự tổng điểm) trong mỗi lần lặp
+        weights = rng.multinomial(n, np.full(n, 1.0 / n), size=stop - start).astype(np.float64)
+
+        high = _take_head(weights, group_size)
+        low = _take_head(weights[:, ::-1], group_size)[:, ::-1]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if valid_sorted is None:
+                P_samples[start:stop] = weights @ values_sorted / n
+                D_samples[start:stop] = (high @ values_sorted - low @ values_sorted) / group_size
+            else:
+                P_samples[start:stop] = (weights @ values_sorted) / (weights @ valid_sorted)
+                D_samples[start:stop] = ((high @ values_sorted) / (high @ valid_sorted)
+                                         - (low @ values_sorted) / (low @ valid_sorted))
+
+    alpha = (1 - confidence) / 2
+    quantiles = [alpha * 100, (1 - alpha) * 100]
+    with warnings.catch_warnings():
+        # Câu không có dữ liệu (toàn NaN) cho khoảng NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        P_low, P_high = np.nanpercentile(P_samples * 100, quantiles, axis=0)
+        D_low, D_high = np.nanpercentile(D_samples, quantiles, axis=0)
+
+    return {
+        "P_low": np.round(P_low, 2),
+        "P_high": np.round(P_high, 2),
+        "D_low": np.round(D_low, 2),
+        "D_high": np.round(D_high, 2),
+    }
+
+
+def attach_intervals(result_df, intervals: dict, after_P: str, after_D: str):
+    """Chèn các cột khoảng tin cậy ngay sau cột P và cột D của bảng kết quả"""
+    result_df.insert(result_df.columns.get_loc(after_P) + 1, "P (CI dưới)", intervals["P_low"])
+    result_df.insert(result_df.columns.get_loc("P (CI dưới)") + 1, "P (CI trên)", intervals["P_high"])
+    result_df.insert(result_df.columns.get_loc(after_D) + 1, "D (CI dưới)", intervals["D_low"])
+    result_df.insert(result_df.columns.get_loc("D (CI dưới)") + 1, "D (CI trên)", intervals["D_high"])
+    return result_df
+
+
+def _take_head(weights: np.ndarray, group_size: int) -> np.ndarray:
+    """Trọng số của `group_size` SV đầu tiên theo thứ tự cột, cho từng lần lặp (hàng)"""
+    taken_before = np.cumsum(weights, axis=1) - weights
+    return np.clip(group_size - taken_before, 0, weights)
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+# Phiên bản định dạng; tăng khi thay đổi cách lưu để bỏ qua các bản lưu cũ
+_FORMAT_VERSION = 1
+_MANIFEST = "manifest.json"
+
+# Giới hạn mặc định của bộ nhớ đệm trên đĩa
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 64
+
+
+def default_cache_dir():
+    """
+    Thư mục bộ nhớ đệm trên đĩa, chỉ khi được bật bằng biến môi trường EXAM_CACHE_DIR
+
+    Workbook chứa họ tên và điểm của SV nên mặc định không ghi gì ra đĩa (None).
+    """
+    return os.environ.get("EXAM_CACHE_DIR") or None
+
+
+def open_disk_cache(root: str = None):
+    """
+    ColumnarCache tại `root` (mặc định EXAM_CACHE_DIR), None nếu không có thư mục nào được chỉ định
+
+    Giới hạn dung lượng lấy từ biến môi trường EXAM_CACHE_MAX_MB (mặc định 512 MB).
+    """
+    root = root or default_cache_dir()
+    if root is None:
+        return None
+    max_mb = os.environ.get("EXAM_CACHE_MAX_MB")
+    return ColumnarCache(root, max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES)
+
+
+class ColumnarCache:
+    """
+    Bộ nhớ đệm trên đĩa của workbook đã phân tích, lưu theo cột và theo mã băm nội dung
+
+    Mỗi workbook là một thư mục <root>/<mã băm>/ gồm manifest.json (thứ tự sheet, tên và
+    kiểu cột) và một file .npy cho mỗi cột số (điểm, điểm tối đa...). Cột số được nạp
+    lại bằng memory mapping nên không phải đọc lại workbook bằng openpyxl; cột dạng
+    chữ (STT, họ tên...) được lưu trực tiếp trong manifest.
+
+    Việc ghi là best-effort: lỗi ghi (ổ đĩa chỉ đọc, hết chỗ...) được bỏ qua, bản lưu
+    hỏng hoặc khác phiên bản được coi như chưa có.
+
+    Dữ liệu có họ tên / điểm của SV: thư mục và file chỉ chủ sở hữu đọc được (0700 / 0600).
+    Tổng dung lượng không quá `max_bytes` và số workbook không quá `max_entries`; khi vượt,
+    các bản lưu lâu nhất chưa được dùng (theo thời điểm nạp / ghi gần nhất) bị xoá.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if not root:
+            raise ValueError("Cần thư mục cho bộ nhớ đệm trên đĩa")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._evict_lock = threading.Lock()
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest)
+
+    def load(self, digest: str):
+        """
+        Nạp workbook đã lưu theo mã băm
+
+        Returns:
+        --------
+        dict | None
+            {tên sheet: DataFrame} theo đúng thứ tự sheet, hoặc None nếu chưa có bản lưu
+        """
+        folder = self.path_for(digest)
+        try:
+            with open(os.path.join(folder, _MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != _FORMAT_VERSION:
+                return None
+            sheets = {sheet["name"]: _load_frame(folder, sheet) for sheet in manifest["sheets"]}
+            # Thời điểm sửa manifest là thời điểm dùng gần nhất (atime thường bị tắt: noatime)
+            os.utime(os.path.join(folder, _MANIFEST))
+            return sheets
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, digest: str, sheets: dict) -> bool:
+        """
+        Lưu các sheet của workbook; trả về True nếu ghi thành công
+
+        Dữ liệu được ghi vào thư mục tạm rồi đổi tên một lần, nên tiến trình khác
+        không bao giờ đọc phải bản lưu dở dang.
+        """
+        folder = self.path_for(digest)
+        if os.path.exists(os.path.join(folder, _MANIFEST)):
+            return True
+        tmp_folder = None
+        try:
+            os.makedirs(self.root, mode=0o700, exist_ok=True)
+            # mkdtemp tạo thư mục 0700
+            tmp_folder = tempfile.mkdtemp(prefix=f".{digest[:16]}-", dir=self.root)
+            manifest = {
+                "version": _FORMAT_VERSION,
+                "sheets": [_save_frame(tmp_folder, i, name, df) for i, (name, df) in enumerate(sheets.items())],
+            }
+            with _open_private(os.path.join(tmp_folder, _MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_folder, folder)
+        except OSError:
+            # Tiến trình khác đã lưu trước (thư mục đích đã có) hoặc không ghi được
+            if tmp_folder is not None:
+                shutil.rmtree(tmp_folder, ignore_errors=True)
+            return os.path.exists(os.path.join(folder, _MANIFEST))
+        self.evict(keep=digest)
+        return True
+
+    def evict(self, keep: str = None):
+        """Xoá các bản lưu dùng lâu nhất cho đến khi nằm trong giới hạn dung lượng / số workbook"""
+        with self._evict_lock:
+            entries = []
+            try:
+                with os.scandir(self.root) as it:
+                    for entry in it:
+                        if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                            continue
+                        try:
+                            used = os.stat(os.path.join(entry.path, _MANIFEST)).st_mtime
+                        except OSError:
+                            continue
+                        entries.append((used, entry.name, _folder_size(entry.path)))
+            except OSError:
+                return
+            total = sum(size for _, _, size in entries)
+            count = len(entries)
+            for used, name, size in sorted(entries):
+                if total <= self.max_bytes and count <= self.max_entries:
+                    break
+                if name == keep:
+                    continue
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                total -= size
+                count -= 1
+
+
+def _open_private(path: str, mode: str, **kwargs):
+    """Mở file mới để ghi, chỉ chủ sở hữu đọc / ghi được (0600)"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    return os.fdopen(fd, mode, **kwargs)
+
+
+def _folder_size(folder: str) -> int:
+    """Tổng kích thước các file trong thư mục của một bản lưu"""
+    total = 0
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def _save_frame(folder: str, sheet_idx: int, name, df: pd.DataFrame) -> dict:
+    """Ghi các cột của một sheet, trả về phần mô tả sheet trong manifest"""
+    columns = []
+    for col_idx, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        entry = {"name": _json_value(col)}
+        if values.dtype.kind in "biufM":
+            entry["file"] = f"s{sheet_idx}_c{col_idx}.npy"
+            with _open_private(os.path.join(folder, entry["file"]), "wb") as f:
+                np.save(f, values, allow_pickle=False)
+        else:
+            entry["values"] = [_json_value(v) for v in values]
+        columns.append(entry)
+    return {"name": name, "rows": len(df), "columns": columns}
+
+
+def _load_frame(folder: str, sheet: dict) -> pd.DataFrame:
+    """Dựng lại DataFrame của một sheet; cột số dùng chung bộ nhớ với file .npy"""
+    data = {}
+    for col_idx, entry in enumerate(sheet["columns"]):
+        if "file" in entry:
+            values = np.load(os.path.join(folder, entry["file"]), mmap_mode="r", allow_pickle=False)
+            values = values.view(np.ndarray)
+        else:
+            values = np.array([np.nan if v is None else v for v in entry["values"]], dtype=object)
+        data[col_idx] = values
+    df = pd.DataFrame(data, copy=False)
+    df.columns = [entry["name"] for entry in sheet["columns"]]
+    return df
+
+
+def _json_value(value):
+    """Chuyển giá trị ô / tên cột về kiểu JSON; ô trống thành None"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
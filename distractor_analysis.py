@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+from score_matrix import iter_row_blocks
+from processor_common import select_high_low_groups
+from rubric import default_rubric
+
+# Giá trị cột STT của dòng đáp án (so sánh không phân biệt hoa thường)
+ANSWER_KEY_LABELS = {"đáp án", "dap an", "đáp án đúng", "key", "answer key"}
+
+# Nhãn phương án cho ô bỏ trống
+BLANK_OPTION = "Bỏ trống"
+
+# Tỷ lệ chọn tối thiểu để một phương án nhiễu được coi là có tác dụng
+MIN_DISTRACTOR_SHARE = 0.05
+
+
+def is_option_sheet(df: pd.DataFrame) -> bool:
+    """Sheet trắc nghiệm ghi phương án đã chọn (A/B/C/D...) thay vì điểm 0/1"""
+    if not isinstance(df, pd.DataFrame):
+        return False  # ScoreMatrix: sheet đã được đọc thành điểm số
+    question_cols = [col for col in df.columns if str(col).startswith("Câu")]
+    if not question_cols:
+        return False
+    values = df[question_cols].to_numpy(dtype=object).ravel()
+    return any(isinstance(v, str) and v.strip().isalpha() for v in values)
+
+
+def find_answer_key(df: pd.DataFrame, key_df: pd.DataFrame = None) -> pd.Series:
+    """
+    Lấy đáp án đúng của từng câu
+
+    Ưu tiên dòng có STT là "Đáp án" trong chính sheet làm bài; nếu không có thì lấy
+    dòng đầu tiên của `key_df` (sheet đáp án riêng).
+    """
+    question_cols = [col for col in df.columns if str(col).startswith("Câu")]
+    if "STT" in df.columns:
+        labels = df["STT"].astype(str).str.strip().str.lower()
+        key_rows = df.loc[labels.isin(ANSWER_KEY_LABELS), question_cols]
+        if len(key_rows):
+            return key_rows.iloc[0]
+    if key_df is not None and len(key_df):
+        return key_df.reindex(columns=question_cols).iloc[0]
+    raise ValueError("Không tìm thấy đáp án: cần một dòng có STT là 'Đáp án' hoặc sheet đáp án riêng")
+
+
+def encode_options(df: pd.DataFrame, key_df: pd.DataFrame = None):
+    """
+    Mã hoá phương án đã chọn thành số nguyên
+
+    Returns:
+    --------
+    tuple
+        (question_cols, options, codes, key_codes, stt): `options` là danh sách phương án
+        (A, B, C...), `codes` là ma trận (SV x câu) chỉ số phương án (-1 = bỏ trống),
+        `key_codes` là chỉ số đáp án đúng của từng câu (-1 = không có đáp án)
+    """
+    question_cols = [col for col in df.columns if str(col).startswith("Câu")]
+    key = _normalize(find_answer_key(df, key_df).to_frame().T)[0]
+
+    # Chỉ giữ các dòng SV có STT hợp lệ (dòng đáp án tự động bị loại)
+    if "STT" in df.columns:
+        valid_rows = df["STT"].apply(lambda x: str(x).isdigit()).to_numpy(dtype=bool)
+        stt = df["STT"].to_numpy()[valid_rows]
+    else:
+        valid_rows = np.ones(len(df), dtype=bool)
+        stt = np.arange(1, len(df) + 1)
+    responses = _normalize(df.loc[valid_rows, question_cols])
+
+    # Mã hoá bằng một lần np.unique trên toàn bộ ma trận, không tra từng ô
+    uniq, inverse = np.unique(responses, return_inverse=True)
+    options = sorted((set(uniq) | set(key)) - {""})
+    lookup = {option: i for i, option in enumerate(options)}
+    uniq_codes = np.array([lookup.get(value, -1) for value in uniq], dtype=np.int16)
+    codes = uniq_codes[inverse].reshape(responses.shape)
+    key_codes = np.array([lookup.get(value, -1) for value in key], dtype=np.int16)
+    return question_cols, options, codes, key_codes, stt
+
+
+def score_option_responses(df: pd.DataFrame, key_df: pd.DataFrame = None) -> pd.DataFrame:
+    """Chấm sheet phương án theo đáp án, trả về sheet điểm 0/1 (STT + các cột câu hỏi)"""
+    question_cols, _, codes, key_codes, stt = encode_options(df, key_df)
+    scored = pd.DataFrame((codes == key_codes) & (codes >= 0), columns=question_cols).astype(np.float64)
+    scored.insert(0, "STT", stt)
+    return scored
+
+
+def analyze_distractors(df: pd.DataFrame, key_df: pd.DataFrame = None, ratio: float = 0.27,
+                        rubric=None) -> pd.DataFrame:
+    """
+    Phân tích phương án nhiễu: số SV chọn từng phương án theo nhóm cao / giữa / thấp
+
+    Toàn bộ bảng đếm được tính bằng một phép nhân ma trận: ma trận nhóm (3 x SV) nhân
+    ma trận one-hot (SV x (câu x phương án)), duyệt theo khối dòng để giới hạn bộ nhớ.
+    Độ phân biệt của phương án = (số SV nhóm cao chọn - số SV nhóm thấp chọn) / số SV
+    mỗi nhóm: đáp án đúng nên dương (đạt ngưỡng D tốt của bộ tiêu chí), phương án nhiễu
+    tốt nên âm.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Sheet phương án đã chọn (STT, các cột "Câu ..."), có thể chứa dòng "Đáp án"
+    key_df : pd.DataFrame, optional
+        Sheet đáp án riêng (dòng đầu tiên), dùng khi sheet làm bài không có dòng đáp án
+    ratio : float
+        Tỷ lệ SV của mỗi nhóm cao / thấp
+    rubric : Rubric, optional
+        Bộ tiêu chí, lấy ngưỡng D tốt cho đáp án đúng (mặc định default_rubric())
+
+    Returns:
+    --------
+    pd.DataFrame
+        Mỗi dòng là một phương án của một câu
+    """
+    rubric = rubric or default_rubric()
+    question_cols, options, codes, key_codes, _ = encode_options(df, key_df)
+    n_students, n_items = codes.shape
+    has_blank = bool((codes < 0).any())
+    labels = options + ([BLANK_OPTION] if has_blank else [])
+    n_options = len(labels)
+
+    # Nhóm theo tổng điểm sau khi chấm
+    correct = (codes == key_codes) & (codes >= 0)
+    high_idx, low_idx = select_high_low_groups(correct.sum(axis=1), ratio)
+    group_size = min(len(high_idx), len(low_idx))
+    membership = np.zeros((3, n_students))
+    membership[1] = 1.0                     # nhóm giữa: phần còn lại
+    membership[:, high_idx] = [[1.0], [0.0], [0.0]]
+    membership[:, low_idx] = [[0.0], [0.0], [1.0]]
+
+    # Bỏ trống được mã hoá thành phương án cuối cùng
+    option_index = np.where(codes >= 0, codes, n_options - 1).astype(np.intp)
+    counts = np.zeros((3, n_items * n_options))
+    start = 0
+    for block in iter_row_blocks(option_index):
+        one_hot = np.zeros((block.shape[0], n_items, n_options))
+        np.put_along_axis(one_hot, block[:, :, None], 1.0, axis=2)
+        counts += membership[:, start:start + block.shape[0]] @ one_hot.reshape(block.shape[0], -1)
+        start += block.shape[0]
+    high, middle, low = counts.reshape(3, n_items, n_options).astype(np.int64)
+    total = high + middle + low
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = total / n_students
+        option_D = (high - low) / group_size if group_size > 0 else np.full(total.shape, np.nan)
+
+    is_key = np.arange(n_options)[None, :] == key_codes[:, None]
+    is_blank = np.zeros(n_options, dtype=bool)
+    is_blank[len(options):] = True
+    is_blank = np.broadcast_to(is_blank, total.shape)
+
+    verdict = np.select(
+        [is_blank, is_key & (option_D >= rubric.good_D), is_key, share < MIN_DISTRACTOR_SHARE, option_D < 0],
+        ["—", "Đáp án tốt", "Đáp án cần xem lại", "Ít được chọn", "Nhiễu tốt"],
+        default="Nhiễu thu hút nhóm cao"
+    )
+
+    return pd.DataFrame({
+        "Câu hỏi": np.repeat(question_cols, n_options),
+        "Phương án": np.tile(labels, n_items),
+        "Đáp án đúng": np.where(is_key, "✔", "").ravel(),
+        "Nhóm cao": high.ravel(),
+        "Nhóm giữa": middle.ravel(),
+        "Nhóm thấp": low.ravel(),
+        "Tổng": total.ravel(),
+        "Tỷ lệ chọn (%)": np.round(share * 100, 2).ravel(),
+        "Độ phân biệt phương án": np.round(option_D, 2).ravel(),
+        "Đánh giá": verdict.ravel(),
+    })
+
+
+def _normalize(frame: pd.DataFrame) -> np.ndarray:
+    """Chuẩn hoá phương án theo từng cột: bỏ khoảng trắng, viết hoa; ô trống thành chuỗi rỗng"""
+    columns = [frame.iloc[:, i].astype(object).fillna("").astype(str).str.strip().str.upper().to_numpy(dtype=str)
+               for i in range(frame.shape[1])]
+    return np.stack(columns, axis=1) if columns else np.empty((len(frame), 0), dtype=str)
@@ -0,0 +1,114 @@
+from processor_multiple_choice import calculate_question_stats
+from processor_essay import calculate_essay_stats
+from processor_common import evaluate_exam_difficulty_mix, calculate_student_groups
+from distractor_analysis import is_option_sheet, analyze_distractors, score_option_responses
+from rubric import default_rubric
+from score_matrix import ScoreMatrix, as_score_matrix
+
+EXAM_TYPES = ["Trắc nghiệm", "Tự luận", "Hỗn hợp"]
+
+
+def analyze_sheets(sheet_frames, exam_type: str, tolerance: float = None,
+                   check_discrimination: bool = True, n_bootstrap: int = 0, rubric=None) -> dict:
+    """
+    Phân tích một workbook đã đọc: quy trình dùng chung cho giao diện Streamlit, batch_evaluate
+    và dịch vụ HTTP
+
+    Parameters:
+    -----------
+    sheet_frames : list[pd.DataFrame | ScoreMatrix]
+        Các sheet của workbook theo thứ tự (sheet điểm của file lớn là ScoreMatrix, xem
+        workbook_loader.load_workbook_sheets)
+    exam_type : str
+        "Trắc nghiệm", "Tự luận" hoặc "Hỗn hợp"
+    tolerance : float, optional
+        Sai số cho phép của cơ cấu độ khó (mặc định theo bộ tiêu chí)
+    check_discrimination : bool
+        Có kiểm tra tiêu chí độ phân biệt hay không
+    n_bootstrap : int
+        Số lần lặp bootstrap cho khoảng tin cậy của P và D (0 = không tính)
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại và chuẩn cơ cấu đề (mặc định default_rubric())
+
+    Returns:
+    --------
+    dict
+        result_df, summary_df, conclusion, disc_info, rubric, max_scores_df (nếu có), score_sheet
+        (ScoreMatrix dạng gọn của sheet điểm, đã chấm nếu là sheet ghi phương án A/B/C/D; với đề
+        hỗn hợp là sheet trắc nghiệm) và distractor_df (sheet ghi phương án)
+    """
+    rubric = rubric or default_rubric()
+    max_scores_df = None
+    score_sheet = sheet_frames[0]
+    distractor_df = None
+    if exam_type == "Trắc nghiệm":
+        if is_option_sheet(score_sheet):
+            # Sheet phương án + đáp án (dòng "Đáp án" hoặc sheet 2): chấm rồi phân tích như bình thường
+            key_df = sheet_frames[1] if len(sheet_frames) >= 2 else None
+            distractor_df = analyze_distractors(score_sheet, key_df, rubric=rubric)
+            score_sheet = score_option_responses(score_sheet, key_df)
+        # Lọc STT / ép kiểu một lần, dùng lại cho IRT và bảng nhóm SV
+        score_sheet = as_score_matrix(score_sheet, binary=True)
+        result_df = calculate_question_stats(score_sheet, n_bootstrap=n_bootstrap, rubric=rubric)
+    elif exam_type == "Tự luận":
+        if len(sheet_frames) >= 2:
+            max_scores_df = _as_frame(sheet_frames[1])
+        score_sheet = as_score_matrix(score_sheet)
+        result_df = calculate_essay_stats(score_sheet, max_scores_df, n_bootstrap=n_bootstrap, rubric=rubric)
+    elif exam_type == "Hỗn hợp":
+        if len(sheet_frames) < 2:
+            raise ValueError("File Excel phải có ít nhất 2 sheet: (1) Trắc nghiệm, (2) Tự luận")
+        if len(sheet_frames) >= 3:
+            max_scores_df = _as_frame(sheet_frames[2])
+        from mixed_exam_evaluation import calculate_mix_stats
+        result_df = calculate_mix_stats(sheet_frames[0], sheet_frames[1], max_scores_df, n_bootstrap=n_bootstrap,
+                                        rubric=rubric)
+    else:
+        raise ValueError(f"Loại đề không hợp lệ: {exam_type}")
+
+    summary_df, conclusion, disc_info = evaluate_exam_difficulty_mix(
+        result_df,
+        tolerance=tolerance,
+        check_discrimination=check_discrimination,
+        rubric=rubric
+    )
+    return {
+        "result_df": result_df,
+        "summary_df": summary_df,
+        "conclusion": conclusion,
+        "disc_info": disc_info,
+        "max_scores_df": max_scores_df,
+        "score_sheet": score_sheet,
+        "distractor_df": distractor_df,
+        "rubric": rubric,
+    }
+
+
+def _as_frame(sheet):
+    """Sheet điểm tối đa dạng DataFrame (để hiển thị / ghi báo cáo) kể cả khi được đọc tuần tự"""
+    return sheet.to_dataframe() if isinstance(sheet, ScoreMatrix) else sheet
+
+
+def build_word_report(exam_type: str, analysis: dict) -> bytes:
+    """Tạo báo cáo Word tương ứng với loại đề từ kết quả của analyze_sheets"""
+    from report_word import convert_mc_to_word, convert_essay_to_word, convert_mix_to_word
+
+    args = (analysis["result_df"], analysis["summary_df"], analysis["conclusion"], analysis["disc_info"])
+    if exam_type == "Trắc nghiệm":
+        return convert_mc_to_word(*args, analysis.get("distractor_df"))
+    if exam_type == "Tự luận":
+        return convert_essay_to_word(*args, analysis["max_scores_df"], analysis.get("rubric"))
+    return convert_mix_to_word(*args)
+
+
+def build_excel_report(exam_type: str, analysis: dict, sheet_frames) -> bytes:
+    """Xuất kết quả của analyze_sheets ra Excel, kèm tổng điểm / thứ hạng / nhóm của SV"""
+    from report_excel import convert_to_excel
+
+    if exam_type == "Hỗn hợp":
+        from mixed_exam_evaluation import calculate_mix_student_groups
+        students_df = calculate_mix_student_groups(sheet_frames[0], sheet_frames[1])
+    else:
+        students_df = calculate_student_groups(analysis.get("score_sheet", sheet_frames[0]))
+    return convert_to_excel(analysis["result_df"], analysis["summary_df"], analysis["conclusion"],
+                            analysis["disc_info"], students_df, analysis.get("rubric"))
@@ -0,0 +1,264 @@
+"""
+Tự động ghép đề từ ngân hàng câu hỏi theo cơ cấu độ khó và tiêu chí độ phân biệt
+
+Ví dụ:
+    python exam_assembly.py --course MATH101 --items 40 --forms 3 --max-overlap 5 -o de_ghep.xlsx
+    python exam_assembly.py --pool ket_qua.xlsx --items 30 -o de_ghep.xlsx
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import csr_matrix, vstack
+
+from exam_analysis import EXAM_TYPES
+from processor_common import evaluate_exam_difficulty_mix
+from rubric import default_rubric, load_rubric
+
+
+def assemble_exam(pool: pd.DataFrame, n_items: int,
+                  target_mix=None, tolerance: float = None,
+                  min_good_D_share: float = None, max_negative_D_share: float = None,
+                  n_forms: int = 1, max_overlap: int = 0, difficulty_gap: float = None,
+                  time_limit: float = 30.0, rubric=None) -> dict:
+    """
+    Chọn các câu từ ngân hàng thành đề đạt chuẩn của evaluate_exam_difficulty_mix
+
+    Mỗi đề là một bài toán quy hoạch nguyên 0/1 (scipy.optimize.milp, HiGHS): biến x_i = 1
+    nếu chọn câu i, cực đại tổng D (tức D trung bình, vì số câu cố định) với ràng buộc
+    - đúng `n_items` câu,
+    - số câu mỗi nhóm độ khó (Dễ / Trung bình / Khó, gộp "Rất khó") nằm trong khoảng
+      `target_mix` ± `tolerance`, tính đúng như evaluate_exam_difficulty_mix (kể cả làm tròn tỷ lệ),
+    - tỷ lệ câu D >= rubric.good_D không dưới `min_good_D_share`, tỷ lệ câu D < 0 không quá
+      `max_negative_D_share`.
+    Các đề song song được ghép lần lượt: đề sau có thêm ràng buộc số câu trùng với mỗi đề
+    trước không quá `max_overlap`, và (tuỳ chọn) độ khó TB lệch không quá `difficulty_gap`
+    so với đề đầu tiên.
+
+    Ràng buộc chỉ phụ thuộc vào ô (nhóm độ khó x loại D: >= good_D, < 0, còn lại) của câu,
+    nên trong mỗi ô chỉ cần giữ `n_items` câu có D cao nhất chưa dùng ở đề trước (cùng
+    các câu của đề trước): đổi một câu bất kỳ lấy câu D cao hơn cùng ô không làm vi phạm
+    ràng buộc nào. Bài toán vì vậy chỉ còn vài trăm biến dù ngân hàng có hàng chục nghìn
+    câu. Khi có `difficulty_gap` (ràng buộc theo P), mỗi ô giữ nhiều câu hơn để còn chỗ
+    cân độ khó.
+
+    Parameters:
+    -----------
+    pool : pd.DataFrame
+        Ngân hàng câu hỏi: cột "Độ khó (P)" và cột độ phân biệt ("Độ phân biệt (D)" hoặc
+        "Độ phân biệt"); câu thiếu P hoặc D bị bỏ qua, "Mức độ" được phân loại lại theo `rubric`
+    n_items : int
+        Số câu của mỗi đề
+    target_mix : dict, optional
+        Tỷ lệ mục tiêu của từng nhóm độ khó (mặc định rubric.target_mix)
+    tolerance : float, optional
+        Sai số cho phép của cơ cấu độ khó (mặc định rubric.tolerance)
+    min_good_D_share, max_negative_D_share : float, optional
+        Tiêu chí độ phân biệt (mặc định theo rubric, như evaluate_exam_difficulty_mix)
+    n_forms : int
+        Số đề song song cần ghép
+    max_overlap : int
+        Số câu trùng tối đa giữa hai đề bất kỳ
+    difficulty_gap : float, optional
+        Chênh lệch tối đa của độ khó TB (điểm %) giữa mỗi đề và đề đầu tiên
+    time_limit : float
+        Thời gian giải tối đa (giây) cho mỗi đề
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại và chuẩn cơ cấu đề (mặc định default_rubric())
+
+    Returns:
+    --------
+    dict
+        "forms" (danh sách DataFrame các câu của từng đề), "summary" (bảng so sánh các
+        đề, kèm kết luận của evaluate_exam_difficulty_mix) và "overlap" (số câu trùng
+        giữa từng cặp đề)
+    """
+    rubric = rubric or default_rubric()
+    target_mix = rubric.target_mix if target_mix is None else target_mix
+    tolerance = rubric.tolerance if tolerance is None else tolerance
+    min_good_D_share = rubric.min_good_D_share if min_good_D_share is None else min_good_D_share
+    max_negative_D_share = rubric.max_negative_D_share if max_negative_D_share is None else max_negative_D_share
+    items = _prepare_pool(pool, rubric)
+    n_pool = len(items)
+    if n_items <= 0 or n_items > n_pool:
+        raise ValueError(f"Số câu mỗi đề phải từ 1 đến {n_pool} (số câu hợp lệ trong ngân hàng)")
+
+    P = items["Độ khó (P)"].to_numpy(dtype=float)
+    D = items["Độ phân biệt (D)"].to_numpy(dtype=float)
+    group = rubric.mix_group(items["Mức độ"])
+    good = D >= rubric.good_D
+    # Ô của câu: nhóm độ khó x loại D
+    cell = pd.factorize(pd.Series(group).astype(str) + np.select([good, D < 0], ["|tốt", "|âm"], "|kém"))[0]
+    per_cell = n_items * (4 if difficulty_gap is not None else 1)
+
+    # Các ràng buộc chung của mọi đề: (hàng hệ số, cận dưới, cận trên)
+    rows, lower, upper = [np.ones(n_pool)], [n_items], [n_items]
+    counts = np.arange(n_items + 1)
+    shares = np.round(counts / n_items, 4)
+    for name, target in target_mix.items():
+        allowed = counts[(shares >= target - tolerance) & (shares <= target + tolerance)]
+        if allowed.size == 0:
+            raise ValueError(f"Không có số câu '{name}' nào đạt {target} ± {tolerance} với đề {n_items} câu")
+        rows.append((group == name).astype(float))
+        lower.append(allowed.min())
+        upper.append(allowed.max())
+    rows.append(good.astype(float))
+    lower.append(counts[counts / n_items >= min_good_D_share].min(initial=n_items + 1))
+    upper.append(n_items)
+    rows.append((D < 0).astype(float))
+    lower.append(0)
+    upper.append(counts[counts / n_items <= max_negative_D_share].max(initial=0))
+
+    forms, chosen_sets = [], []
+    used = np.zeros(n_pool, dtype=bool)
+    for form in range(n_forms):
+        candidates = _candidates(D, cell, used, per_cell)
+        form_rows = [row[candidates] for row in rows]
+        form_lower, form_upper = list(lower), list(upper)
+        for previous in chosen_sets:
+            form_rows.append(np.isin(candidates, previous).astype(float))
+            form_lower.append(0)
+            form_upper.append(max_overlap)
+        if difficulty_gap is not None and forms:
+            first_mean = P[chosen_sets[0]].mean()
+            form_rows.append(P[candidates] / n_items)
+            form_lower.append(first_mean - difficulty_gap)
+            form_upper.append(first_mean + difficulty_gap)
+
+        constraint = LinearConstraint(vstack([csr_matrix(r) for r in form_rows]), form_lower, form_upper)
+        result = milp(
+            -D[candidates], constraints=constraint, integrality=np.ones(len(candidates)), bounds=Bounds(0, 1),
+            options={"time_limit": time_limit}
+        )
+        if result.x is None:
+            raise ValueError(
+                f"Không ghép được đề {form + 1}: ngân hàng không đủ câu thoả cơ cấu độ khó / độ phân biệt"
+                + (f" với tối đa {max_overlap} câu trùng" if form else "")
+            )
+        selected = np.sort(candidates[result.x > 0.5])
+        used[selected] = True
+        chosen_sets.append(selected)
+        form_df = items.iloc[selected].copy()
+        form_df.insert(0, "Đề", form + 1)
+        forms.append(form_df.reset_index(drop=True))
+
+    summary = pd.DataFrame([
+        _form_summary(i + 1, form_df, target_mix, tolerance, min_good_D_share, max_negative_D_share, rubric)
+        for i, form_df in enumerate(forms)
+    ])
+    labels = [f"Đề {i + 1}" for i in range(n_forms)]
+    overlap = pd.DataFrame(
+        [[len(np.intersect1d(a, b)) for b in chosen_sets] for a in chosen_sets],
+        index=labels, columns=labels
+    )
+    return {"forms": forms, "summary": summary, "overlap": overlap}
+
+
+def pool_from_bank(bank, course: str = None, exam_type: str = "Trắc nghiệm") -> pd.DataFrame:
+    """
+    Ngân hàng câu hỏi cho ghép đề: số liệu của lần phân tích gần nhất của mỗi câu
+
+    Câu cùng mã nhưng khác loại đề (ví dụ "Câu 1" trắc nghiệm và "Câu 1" tự luận) là hai
+    câu khác nhau; `exam_type` chỉ lấy câu của một loại đề (None: mọi loại) vì D của câu
+    tự luận (theo điểm TB) không so được với D của câu trắc nghiệm.
+    """
+    history = bank.item_history(course, exam_type=exam_type)
+    # item_history sắp theo học phần, mã câu, học kỳ, thời điểm lưu: dòng cuối là mới nhất
+    return history.groupby(["Học phần", "Loại đề", "Câu hỏi"], sort=False).tail(1).reset_index(drop=True)
+
+
+def _candidates(D: np.ndarray, cell: np.ndarray, used: np.ndarray, per_cell: int) -> np.ndarray:
+    """Các câu đã dùng ở đề trước và `per_cell` câu chưa dùng có D cao nhất của mỗi ô"""
+    keep = [np.flatnonzero(used)]
+    for c in np.unique(cell):
+        idx = np.flatnonzero((cell == c) & ~used)
+        keep.append(idx[np.argsort(-D[idx], kind="stable")[:per_cell]])
+    return np.sort(np.concatenate(keep))
+
+
+def _prepare_pool(pool: pd.DataFrame, rubric) -> pd.DataFrame:
+    """Chuẩn hoá tên cột độ phân biệt, phân loại Mức độ theo bộ tiêu chí, bỏ câu thiếu P / D"""
+    items = pool.copy()
+    if "Độ phân biệt (D)" not in items.columns:
+        disc_col = next((col for col in items.columns if str(col).startswith("Độ phân biệt")
+                         and "Mức" not in str(col)), None)
+        if disc_col is None or "Độ khó (P)" not in items.columns:
+            raise ValueError("Ngân hàng câu hỏi cần cột 'Độ khó (P)' và 'Độ phân biệt (D)'")
+        items = items.rename(columns={disc_col: "Độ phân biệt (D)"})
+    items = items[items["Độ khó (P)"].notna() & items["Độ phân biệt (D)"].notna()].copy()
+    # Ngân hàng có thể được lưu với bộ tiêu chí khác: luôn phân loại lại theo bộ đang dùng
+    items["Mức độ"] = rubric.difficulty(items["Độ khó (P)"])
+    return items.reset_index(drop=True)
+
+
+def _form_summary(form: int, form_df: pd.DataFrame, target_mix, tolerance,
+                  min_good_D_share, max_negative_D_share, rubric) -> dict:
+    """Một dòng của bảng so sánh các đề, kết luận bằng chính evaluate_exam_difficulty_mix"""
+    summary_df, conclusion, disc_info = evaluate_exam_difficulty_mix(
+        form_df, target_mix=target_mix, tolerance=tolerance, check_discrimination=True,
+        min_good_D_share=min_good_D_share, max_negative_D_share=max_negative_D_share, rubric=rubric
+    )
+    good_key = f"Tỷ lệ D >= {rubric.good_D:g}"
+    row = {"Đề": form, "Số câu": len(form_df)}
+    row.update({f"Số câu {name}": int(n) for name, n in zip(summary_df["Nhóm"], summary_df["Số câu"])})
+    row.update({
+        "Độ khó TB": round(form_df["Độ khó (P)"].mean(), 2),
+        "Độ phân biệt TB": round(form_df["Độ phân biệt (D)"].mean(), 3),
+        good_key: disc_info[good_key],
+        "Tỷ lệ D < 0": disc_info["Tỷ lệ D < 0"],
+        "Kết luận": conclusion,
+    })
+    return row
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ghép đề tự động từ ngân hàng câu hỏi")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--course", help="Lấy câu hỏi của học phần này trong ngân hàng câu hỏi")
+    source.add_argument("--pool", help="File Excel bảng kết quả từng câu (sheet đầu tiên) làm ngân hàng")
+    parser.add_argument("--item-bank", default=None, help="File SQLite ngân hàng câu hỏi (mặc định như batch_evaluate)")
+    parser.add_argument("--exam-type", choices=EXAM_TYPES, default="Trắc nghiệm",
+                        help="Chỉ lấy câu của các đề loại này trong ngân hàng (mặc định: Trắc nghiệm)")
+    parser.add_argument("--items", type=int, required=True, help="Số câu mỗi đề")
+    parser.add_argument("--forms", type=int, default=1, help="Số đề song song (mặc định: 1)")
+    parser.add_argument("--max-overlap", type=int, default=0, help="Số câu trùng tối đa giữa hai đề")
+    parser.add_argument("--difficulty-gap", type=float, default=None,
+                        help="Chênh lệch tối đa độ khó TB (điểm %%) giữa các đề")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Sai số cho phép của cơ cấu độ khó (mặc định theo bộ tiêu chí)")
+    parser.add_argument("--rubric", default=None, help="File JSON bộ tiêu chí đánh giá (mặc định: EXAM_RUBRIC)")
+    parser.add_argument("-o", "--output", default="de_ghep.xlsx", help="File Excel kết quả (mặc định: de_ghep.xlsx)")
+    args = parser.parse_args(argv)
+
+    if args.pool:
+        pool = pd.read_excel(args.pool)
+    else:
+        from item_bank import ItemBank
+        pool = pool_from_bank(ItemBank(args.item_bank), args.course, args.exam_type)
+
+    start = time.perf_counter()
+    try:
+        result = assemble_exam(pool, args.items, tolerance=args.tolerance, n_forms=args.forms,
+                               max_overlap=args.max_overlap, difficulty_gap=args.difficulty_gap,
+                               rubric=load_rubric(args.rubric) if args.rubric else None)
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - start
+
+    with pd.ExcelWriter(args.output, engine="openpyxl") as writer:
+        result["summary"].to_excel(writer, sheet_name="Tổng hợp", index=False)
+        result["overlap"].to_excel(writer, sheet_name="Số câu trùng")
+        for i, form_df in enumerate(result["forms"], start=1):
+            form_df.to_excel(writer, sheet_name=f"Đề {i}", index=False)
+
+    print(result["summary"].to_string(index=False))
+    print(f"Đã ghép {args.forms} đề từ {len(pool)} câu trong {elapsed:.2f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
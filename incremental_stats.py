@@ -0,0 +1,223 @@
+import math
+import numpy as np
+import pandas as pd
+from score_matrix import as_score_matrix
+from processor_multiple_choice import _question_table
+from processor_essay import _essay_table, _read_max_scores
+from reliability import attach_reliability_analysis, reliability_from_moments
+
+
+class ItemStatsAccumulator:
+    """
+    Bộ tích luỹ thống kê đủ (sufficient statistics) theo câu hỏi, cập nhật theo từng đợt
+
+    Dữ liệu được gom theo từng mức tổng điểm: với mỗi mức lưu số SV, và theo từng câu
+    lưu số ô có điểm, tổng điểm, tổng bình phương, số SV trả lời đúng (điểm > 0). Ngoài ra
+    lưu điểm cao nhất và thấp nhất của từng câu, và ma trận tích chéo giữa các câu (của
+    điểm và của đúng / sai) cho độ tin cậy KR-20 / alpha. Từ các đại lượng này có thể:
+    - cập nhật thêm SV mới hoặc gộp với bộ tích luỹ khác với chi phí O(đợt mới),
+    - chốt lại thành bảng P/D giống `calculate_question_stats` / `calculate_essay_stats`,
+    - tính số lượng / trung bình / phương sai theo câu của cả lớp và từng nhóm cao / thấp.
+
+    Nhóm cao / thấp 27% được xác định chính xác trên phân phối tổng điểm nên không phụ
+    thuộc thứ tự gộp. Nếu ở ranh giới nhóm có nhiều SV cùng tổng điểm, mức điểm đó được
+    tính theo tỷ lệ (giá trị kỳ vọng khi chọn ngẫu nhiên SV đồng hạng), nên số SV đúng
+    trong nhóm có thể không nguyên (hiển thị làm tròn 2 chữ số).
+    """
+
+    def __init__(self, question_cols=None):
+        self.question_cols = list(question_cols) if question_cols is not None else None
+        k = len(self.question_cols) if self.question_cols is not None else 0
+        # Theo mức tổng điểm (đã sắp tăng dần)
+        self.totals = np.empty(0)
+        self.students = np.empty(0, dtype=np.int64)
+        self.counts = np.empty((0, k), dtype=np.int64)
+        self.sums = np.empty((0, k))
+        self.sumsq = np.empty((0, k))
+        self.correct = np.empty((0, k), dtype=np.int64)
+        # Theo câu hỏi
+        self.max_score = np.full(k, np.nan)
+        self.min_score = np.full(k, np.nan)
+        # Tích chéo giữa các câu: sum(x xᵀ) của điểm và của đúng / sai (ô trống là 0)
+        self.cross = np.zeros((k, k))
+        self.cross_correct = np.zeros((k, k))
+
+    @property
+    def n_students(self) -> int:
+        return int(self.students.sum())
+
+    def update(self, df) -> "ItemStatsAccumulator":
+        """
+        Thêm một đợt SV (DataFrame sheet điểm hoặc ScoreMatrix)
+
+        Returns:
+        --------
+        ItemStatsAccumulator
+            Chính bộ tích luỹ này (cho phép gọi nối tiếp)
+        """
+        matrix = as_score_matrix(df)
+        self._check_questions(matrix.question_cols)
+        scores = matrix.dense()
+        if scores.shape[0] == 0:
+            return self
+
+        valid = ~np.isnan(scores)
+        filled = np.where(valid, scores, 0.0)
+
+        # Gom các SV cùng tổng điểm bằng một lần sắp xếp theo mức điểm
+        totals, level = np.unique(filled.sum(axis=1), return_inverse=True)
+        order = np.argsort(level, kind="stable")
+        students = np.bincount(level, minlength=len(totals))
+        starts = np.concatenate(([0], np.cumsum(students)[:-1]))
+
+        batch = ItemStatsAccumulator(matrix.question_cols)
+        batch.totals = totals
+        batch.students = students.astype(np.int64)
+        batch.counts = np.add.reduceat(valid[order].astype(np.int64), starts, axis=0)
+        batch.sums = np.add.reduceat(filled[order], starts, axis=0)
+        batch.sumsq = np.add.reduceat((filled ** 2)[order], starts, axis=0)
+        correct = (filled > 0).astype(np.float64)
+        batch.correct = np.add.reduceat(correct[order].astype(np.int64), starts, axis=0)
+        batch.cross = filled.T @ filled
+        batch.cross_correct = correct.T @ correct
+        batch.max_score = np.fmax.reduce(scores, axis=0)
+        batch.min_score = np.fmin.reduce(scores, axis=0)
+        return self.merge(batch)
+
+    def merge(self, other: "ItemStatsAccumulator") -> "ItemStatsAccumulator":
+        """
+        Gộp một bộ tích luỹ khác (ví dụ của phòng thi khác) vào bộ tích luỹ này
+
+        Returns:
+        --------
+        ItemStatsAccumulator
+            Chính bộ tích luỹ này (cho phép gọi nối tiếp)
+        """
+        if other.question_cols is None:
+            return self
+        self._check_questions(other.question_cols)
+
+        totals, level = np.unique(np.concatenate([self.totals, other.totals]), return_inverse=True)
+        own_level, other_level = level[:len(self.totals)], level[len(self.totals):]
+
+        def combine(own, theirs):
+            merged = np.zeros((len(totals),) + own.shape[1:], dtype=own.dtype)
+            np.add.at(merged, own_level, own)
+            np.add.at(merged, other_level, theirs)
+            return merged
+
+        self.students = combine(self.students, other.students)
+        self.counts = combine(self.counts, other.counts)
+        self.sums = combine(self.sums, other.sums)
+        self.sumsq = combine(self.sumsq, other.sumsq)
+        self.correct = combine(self.correct, other.correct)
+        self.totals = totals
+
+        self.cross = self.cross + other.cross
+        self.cross_correct = self.cross_correct + other.cross_correct
+        self.max_score = np.fmax(self.max_score, other.max_score)
+        self.min_score = np.fmin(self.min_score, other.min_score)
+        return self
+
+    def to_question_stats(self, rubric=None) -> pd.DataFrame:
+        """Chốt kết quả thành bảng độ khó / độ phân biệt trắc nghiệm (phân loại theo `rubric`)"""
+        self._check_ready()
+        high_weights, low_weights, group_size = self._group_weights()
+        gc = high_weights @ self.correct
+        gt = low_weights @ self.correct
+        integral = np.array_equal(gc, np.round(gc)) and np.array_equal(gt, np.round(gt))
+        if integral:
+            # Không có đồng hạng ở ranh giới nhóm: số SV là số nguyên
+            gc, gt = gc.astype(np.int64), gt.astype(np.int64)
+        n_correct = self.correct.sum(axis=0)
+        result = _question_table(self.question_cols, self.n_students, n_correct, gc, gt, group_size, rubric)
+        if not integral:
+            # D tính từ số kỳ vọng chưa làm tròn; số SV hiển thị làm tròn 2 chữ số như các cột khác
+            for col in ("Số SV đúng - Nhóm cao", "Số SV đúng - Nhóm thấp"):
+                result[col] = result[col].round(2)
+        analysis = reliability_from_moments(self.n_students, n_correct.astype(np.float64), self.cross_correct)
+        return attach_reliability_analysis(result, analysis, "KR-20", rubric)
+
+    def to_essay_stats(self, max_scores_df: pd.DataFrame = None, rubric=None) -> pd.DataFrame:
+        """Chốt kết quả thành bảng độ khó / độ phân biệt tự luận (phân loại theo `rubric`)"""
+        self._check_ready()
+        high_weights, low_weights, _ = self._group_weights()
+        counts = self.counts.sum(axis=0)
+        sums = self.sums.sum(axis=0)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_score = sums / counts
+            variance = (self.sumsq.sum(axis=0) - sums * mean_score) / (counts - 1)
+            std_score = np.where(counts > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+            mean_high = (high_weights @ self.sums) / (high_weights @ self.counts)
+            mean_low = (low_weights @ self.sums) / (low_weights @ self.counts)
+
+        max_scores = _read_max_scores(self.question_cols, max_scores_df)
+        result = _essay_table(self.question_cols, self.n_students, mean_score, self.max_score,
+                              self.min_score, std_score, mean_high, mean_low, max_scores, rubric)
+        analysis = reliability_from_moments(self.n_students, sums, self.cross)
+        return attach_reliability_analysis(result, analysis, "Cronbach's alpha", rubric)
+
+    def group_moments(self, binary: bool = False) -> dict:
+        """
+        Số lượng, trung bình và phương sai mẫu theo từng câu của cả lớp và của nhóm cao / thấp
+
+        Parameters:
+        -----------
+        binary : bool
+            True: tính trên biến đúng / sai (điểm > 0, ô trống là sai, mọi SV đều được
+            tính) như trắc nghiệm; False: tính trên điểm, bỏ qua ô trống như tự luận
+
+        Returns:
+        --------
+        dict
+            {"all" | "high" | "low": (n, mean, var)}, mỗi phần tử là mảng theo câu. SV
+            đồng hạng ở ranh giới nhóm được tính theo tỷ lệ như trong bảng P/D
+        """
+        self._check_ready()
+        high_weights, low_weights, _ = self._group_weights()
+        if binary:
+            # Biến 0/1: tổng bình phương bằng tổng
+            counts = np.broadcast_to(self.students[:, None], self.correct.shape)
+            sums = sumsq = self.correct
+        else:
+            counts, sums, sumsq = self.counts, self.sums, self.sumsq
+
+        def moments(weights):
+            n = weights @ counts
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = (weights @ sums) / n
+                var = (weights @ sumsq - n * mean ** 2) / (n - 1)
+            return n, mean, np.maximum(var, 0.0)
+
+        return {
+            "all": moments(np.ones(len(self.totals))),
+            "high": moments(high_weights),
+            "low": moments(low_weights),
+        }
+
+    def _group_weights(self, ratio: float = 0.27):
+        """Tỷ lệ SV của từng mức tổng điểm thuộc nhóm cao / thấp (27% mỗi nhóm)"""
+        group_size = math.floor(self.n_students * ratio)
+
+        def tail_weights(students):
+            # students: số SV theo mức điểm, sắp từ đầu của nhóm cần lấy
+            taken_before = np.concatenate(([0], np.cumsum(students)[:-1]))
+            taken = np.clip(group_size - taken_before, 0, students)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(students > 0, taken / students, 0.0)
+
+        low_weights = tail_weights(self.students)
+        high_weights = tail_weights(self.students[::-1])[::-1]
+        return high_weights, low_weights, group_size
+
+    def _check_questions(self, question_cols):
+        question_cols = list(question_cols)
+        if self.question_cols is None:
+            self.__init__(question_cols)
+        elif question_cols != self.question_cols:
+            raise ValueError("Danh sách câu hỏi không khớp với dữ liệu đã tích luỹ")
+
+    def _check_ready(self):
+        if self.question_cols is None:
+            raise ValueError("Chưa có dữ liệu nào được đưa vào bộ tích luỹ")
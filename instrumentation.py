@@ -0,0 +1,139 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from result_cache import cached_result, shared_results
+
+# Mỗi lần chạy được ghi một dòng JSON ở mức INFO
+logger = logging.getLogger("exam_quality.profile")
+
+# Tên cột khi hiển thị bảng chẩn đoán
+_DISPLAY_COLUMNS = {
+    "stage": "Bước",
+    "ms": "Thời gian (ms)",
+    "peak_mb": "Bộ nhớ đỉnh (MB)",
+    "cached": "Từ bộ nhớ đệm",
+    "background": "Chạy nền",
+}
+
+# tracemalloc bật / tắt cho cả tiến trình: đếm số profiler đang đo bộ nhớ (các phiên
+# Streamlit chạy chung một tiến trình), bật khi profiler đầu tiên mở, tắt khi cái cuối đóng
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def _acquire_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        # Chỉ tắt nếu chính module này đã bật (không tắt tracemalloc do mã khác bật)
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+class StageProfiler:
+    """
+    Ghi thời gian và bộ nhớ đỉnh của từng bước xử lý trong một lần chạy
+
+    Thời gian luôn được đo (time.perf_counter). Bộ nhớ đỉnh chỉ đo khi track_memory=True,
+    bằng tracemalloc (gồm cả bộ nhớ của mảng numpy / pandas); tracemalloc làm chậm việc
+    cấp phát nhiều đối tượng nhỏ (đọc file Excel) nên chỉ nên bật khi cần đo. Bộ nhớ đỉnh
+    là của cả tiến trình trong thời gian của bước, nên các bước không được lồng nhau.
+
+    Bộ nhớ đỉnh đo theo tiến trình, không theo phiên: khi nhiều phiên Streamlit cùng đo
+    trong một tiến trình, đỉnh của một bước gồm cả cấp phát của phiên khác chạy song song
+    và reset_peak() của phiên này làm lệch đỉnh của phiên kia. tracemalloc được bật khi
+    profiler đo bộ nhớ đầu tiên được tạo và chỉ tắt khi profiler cuối cùng đóng (close(),
+    khối `with` hoặc khi profiler bị thu hồi); profiler không đo bộ nhớ không đụng tới nó.
+    """
+
+    def __init__(self, run_label: str = "", track_memory: bool = False):
+        self.run_label = run_label
+        self.track_memory = track_memory
+        self.started = datetime.now()
+        self.stages = []
+        self._release = None
+        if track_memory:
+            _acquire_tracing()
+            self._release = weakref.finalize(self, _release_tracing)
+
+    def close(self):
+        """Thôi đo bộ nhớ (gọi nhiều lần không sao)"""
+        if self._release is not None:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def stage(self, name: str, **details):
+        """Đo một bước: `with profiler.stage("Thống kê"): ...`"""
+        tracing = self.track_memory and tracemalloc.is_tracing()
+        if tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = max(tracemalloc.get_traced_memory()[1] - base, 0) if tracing else None
+            self.record(name, seconds, peak, **details)
+
+    def cached(self, name: str, key, compute):
+        """Đo một bước có dùng bộ nhớ đệm kết quả (result_cache.cached_result)"""
+        with self.stage(name, cached=key in shared_results):
+            return cached_result(key, compute)
+
+    def record(self, name: str, seconds: float = None, peak_bytes: int = None, **details):
+        """Thêm kết quả đo của một bước (seconds=None nếu bước chưa xong)"""
+        self.stages.append({
+            "stage": name,
+            "ms": round(seconds * 1000, 2) if seconds is not None else None,
+            "peak_mb": round(peak_bytes / 2 ** 20, 2) if peak_bytes is not None else None,
+            **details,
+        })
+
+    @property
+    def total_ms(self) -> float:
+        """Tổng thời gian các bước chạy trực tiếp (không tính các bước chạy nền)"""
+        return round(sum(s["ms"] or 0 for s in self.stages if not s.get("background")), 2)
+
+    def to_dict(self) -> dict:
+        return {
+            "run": self.run_label,
+            "started": self.started.isoformat(timespec="seconds"),
+            "track_memory": self.track_memory,
+            "total_ms": self.total_ms,
+            "stages": self.stages,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, default=str)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Bảng các bước để hiển thị"""
+        df = pd.DataFrame(self.stages)
+        return df.rename(columns=_DISPLAY_COLUMNS)
+
+    def log(self):
+        logger.info(self.to_json())
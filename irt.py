@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from scipy.special import expit, log_expit, logsumexp
+from score_matrix import as_score_matrix, PackedResponses
+
+IRT_MODELS = ["Rasch (1PL)", "2PL"]
+
+# Tiên nghiệm yếu của tham số (tránh phân kỳ với câu mọi SV cùng đúng / cùng sai)
+_INTERCEPT_PRIOR_VAR = 25.0
+_SLOPE_PRIOR_VAR = 4.0
+
+
+@dataclass
+class IRTResult:
+    """
+    Kết quả ước lượng IRT
+
+    Attributes:
+    -----------
+    items : pd.DataFrame
+        Tham số từng câu: độ khó b, độ phân biệt a
+    abilities : pd.DataFrame
+        Năng lực θ (EAP) và sai số chuẩn của từng SV
+    diagnostics : dict
+        Thông tin hội tụ: số vòng lặp, đã hội tụ chưa, log-likelihood, AIC, BIC...
+    """
+    items: pd.DataFrame
+    abilities: pd.DataFrame
+    diagnostics: dict = field(default_factory=dict)
+
+
+def fit_irt(responses, model: str = "2PL", n_quadrature: int = 41, max_iter: int = 500,
+            tol: float = 1e-4, question_cols=None, stt=None) -> IRTResult:
+    """
+    Ước lượng mô hình Rasch (1PL) hoặc 2PL bằng hợp lý cực đại biên (MML) với thuật toán EM
+
+    Năng lực SV được lấy tích phân trên lưới cầu phương (θ ~ N(0, 1)). Mỗi vòng lặp:
+    - bước E: log-likelihood của mọi SV tại mọi điểm cầu phương bằng một phép nhân ma
+      trận (SV x câu) @ (câu x điểm), suy ra phân phối hậu nghiệm của θ,
+    - bước M: một bước Newton đồng thời cho mọi câu trên số SV kỳ vọng (đúng / tổng)
+      tại từng điểm cầu phương; mô hình Rasch dùng chung một độ phân biệt cho mọi câu.
+    Mô hình dạng z = a·θ + c (b = -c / a), có tiên nghiệm yếu trên a, c.
+
+    Parameters:
+    -----------
+    responses : np.ndarray | PackedResponses
+        Ma trận đúng / sai (SV x câu); NaN được tính là sai
+    model : str
+        "Rasch (1PL)" hoặc "2PL"
+    n_quadrature : int
+        Số điểm cầu phương trên [-4, 4]
+    max_iter : int
+        Số vòng lặp EM tối đa
+    tol : float
+        Dừng khi thay đổi lớn nhất của tham số nhỏ hơn ngưỡng này
+    question_cols, stt : list, optional
+        Tên câu hỏi / STT để ghi vào bảng kết quả
+
+    Returns:
+    --------
+    IRTResult
+    """
+    if model not in IRT_MODELS:
+        raise ValueError(f"Mô hình IRT không hợp lệ: {model}")
+    X = responses.unpack() if isinstance(responses, PackedResponses) else np.asarray(responses)
+    X = (np.nan_to_num(X.astype(np.float64)) > 0).astype(np.float64)
+    # Bản float32 (0/1 biểu diễn chính xác) cho phép nhân lớn nhất ở bước E
+    X_e = X.astype(np.float32)
+    n_students, n_items = X.shape
+    if n_students < 2 or n_items < 1:
+        raise ValueError("Cần ít nhất 2 SV và 1 câu hỏi để ước lượng IRT")
+
+    theta = np.linspace(-4, 4, n_quadrature)
+    log_prior = -0.5 * theta ** 2
+    log_prior -= logsumexp(log_prior)
+
+    # Giá trị khởi đầu từ tỷ lệ đúng
+    p = np.clip(X.mean(axis=0), 0.01, 0.99)
+    a = np.ones(n_items)
+    c = np.log(p / (1 - p)) * 1.7
+    rasch = model == "Rasch (1PL)"
+
+    history = []
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        # Bước E
+        posterior, loglik = _e_step(X_e, a, c, theta, log_prior)
+        history.append(loglik)
+        n_q = posterior.sum(axis=0)            # số SV kỳ vọng tại mỗi điểm (Q)
+        r_q = X.T @ posterior                  # số SV đúng kỳ vọng (câu x Q)
+
+        # Bước M
+        a_new, c_new = _m_step(a, c, theta, n_q, r_q, rasch)
+        change = max(np.abs(a_new - a).max(), np.abs(c_new - c).max())
+        a, c = a_new, c_new
+        if change < tol:
+            converged = True
+            break
+
+    posterior, loglik = _e_step(X_e, a, c, theta, log_prior)
+    eap = posterior @ theta
+    se = np.sqrt(np.maximum(posterior @ theta ** 2 - eap ** 2, 0.0))
+    b = -c / a
+
+    n_params = n_items + 1 if rasch else 2 * n_items
+    diagnostics = {
+        "Mô hình": model,
+        "Số vòng lặp EM": iteration,
+        "Hội tụ": converged,
+        "Thay đổi tham số cuối": float(change),
+        "Log-likelihood": round(float(loglik), 3),
+        "AIC": round(float(-2 * loglik + 2 * n_params), 3),
+        "BIC": round(float(-2 * loglik + n_params * np.log(n_students)), 3),
+        "Số điểm cầu phương": n_quadrature,
+        # EM đúng luôn làm log-likelihood không giảm; vi phạm cho thấy bước Newton quá dài
+        "Log-likelihood không giảm": bool(np.all(np.diff(history) >= -1e-6 * np.abs(history[:-1]))),
+        "Lịch sử log-likelihood": [round(float(v), 3) for v in history],
+    }
+
+    question_cols = list(question_cols) if question_cols is not None else [f"Câu {j + 1}" for j in range(n_items)]
+    items = pd.DataFrame({
+        "Câu hỏi": question_cols,
+        "Độ khó IRT (b)": np.round(b, 3),
+        "Độ phân biệt IRT (a)": np.round(a, 3),
+    })
+    abilities = pd.DataFrame({
+        "STT": stt if stt is not None else np.arange(1, n_students + 1),
+        "Năng lực (θ)": np.round(eap, 3),
+        "Sai số chuẩn": np.round(se, 3),
+    })
+    return IRTResult(items, abilities, diagnostics)
+
+
+def calculate_irt_stats(df, model: str = "2PL", **kwargs) -> IRTResult:
+    """Ước lượng IRT từ sheet điểm trắc nghiệm (DataFrame hoặc ScoreMatrix)"""
+    matrix = as_score_matrix(df, binary=True)
+    correct = PackedResponses.from_scores(matrix.scores)
+    return fit_irt(correct, model, question_cols=matrix.question_cols, stt=matrix.stt, **kwargs)
+
+
+def attach_irt(result_df: pd.DataFrame, irt_result: IRTResult) -> pd.DataFrame:
+    """Bản sao bảng kết quả trắc nghiệm kèm cột tham số IRT (ghép theo thứ tự câu)"""
+    merged = result_df.copy()
+    merged["Độ khó IRT (b)"] = irt_result.items["Độ khó IRT (b)"].to_numpy()
+    merged["Độ phân biệt IRT (a)"] = irt_result.items["Độ phân biệt IRT (a)"].to_numpy()
+    return merged
+
+
+def _e_step(X, a, c, theta, log_prior):
+    """Phân phối hậu nghiệm của θ cho từng SV (SV x Q) và log-likelihood biên"""
+    z = a[:, None] * theta[None, :] + c[:, None]                 # câu x Q
+    # log P(x | θ) = Σ x·z - Σ log(1 + e^z)
+    log_lik = X @ z.astype(X.dtype) + (log_expit(-z).sum(axis=0) + log_prior)   # SV x Q
+    # Chuẩn hoá theo hàng (log-sum-exp) ngay trên mảng tạm
+    row_max = log_lik.max(axis=1, keepdims=True)
+    posterior = np.exp(log_lik - row_max)
+    total = posterior.sum(axis=1, keepdims=True)
+    posterior /= total
+    return posterior, float((np.log(total) + row_max).sum())
+
+
+def _m_step(a, c, theta, n_q, r_q, rasch: bool):
+    """Một bước Newton cho mọi câu trên số SV kỳ vọng, có tiên nghiệm yếu"""
+    z = a[:, None] * theta[None, :] + c[:, None]
+    P = expit(z)
+    resid = r_q - n_q * P                                        # câu x Q
+    info = n_q * P * (1 - P)
+
+    g_c = resid.sum(axis=1) - c / _INTERCEPT_PRIOR_VAR
+    h_cc = info.sum(axis=1) + 1 / _INTERCEPT_PRIOR_VAR
+    g_a = resid @ theta - (a - 1) / _SLOPE_PRIOR_VAR
+    h_aa = info @ theta ** 2 + 1 / _SLOPE_PRIOR_VAR
+    h_ac = info @ theta
+
+    if rasch:
+        # Độ phân biệt chung: gộp gradient / thông tin của a trên mọi câu
+        g_a_common = g_a.sum()
+        h_common = h_aa.sum() - (h_ac ** 2 / h_cc).sum()
+        step_a = (g_a_common - (h_ac * g_c / h_cc).sum()) / h_common
+        step_c = (g_c - h_ac * step_a) / h_cc
+        step_a = np.full_like(a, step_a)
+    else:
+        det = h_aa * h_cc - h_ac ** 2
+        step_a = (h_cc * g_a - h_ac * g_c) / det
+        step_c = (h_aa * g_c - h_ac * g_a) / det
+
+    # Giới hạn độ dài bước để ổn định ở những vòng đầu
+    step_a = np.clip(step_a, -1.0, 1.0)
+    step_c = np.clip(step_c, -2.0, 2.0)
+    return np.maximum(a + step_a, 0.05), c + step_c
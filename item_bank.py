@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+
+def default_bank_path() -> str:
+    """Đường dẫn ngân hàng câu hỏi mặc định (có thể đổi bằng biến môi trường EXAM_ITEM_BANK)"""
+    return os.environ.get("EXAM_ITEM_BANK") or os.path.join(
+        os.path.expanduser("~"), ".local", "share", "exam_quality", "item_bank.sqlite3"
+    )
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    exam_id INTEGER PRIMARY KEY,
+    course TEXT NOT NULL,
+    term TEXT NOT NULL,
+    exam_type TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    exam_name TEXT,
+    n_items INTEGER NOT NULL,
+    conclusion TEXT,
+    recorded_at TEXT NOT NULL,
+    UNIQUE (course, term, exam_type, file_hash)
+);
+CREATE TABLE IF NOT EXISTS items (
+    exam_id INTEGER NOT NULL REFERENCES exams (exam_id) ON DELETE CASCADE,
+    course TEXT NOT NULL,
+    term TEXT NOT NULL,
+    exam_type TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    item_type TEXT,
+    n_students INTEGER,
+    n_correct INTEGER,
+    mean_score REAL,
+    max_score REAL,
+    high_correct REAL,
+    low_correct REAL,
+    high_mean REAL,
+    low_mean REAL,
+    difficulty REAL,
+    difficulty_level TEXT,
+    discrimination REAL,
+    discrimination_level TEXT,
+    item_total_corr REAL,
+    PRIMARY KEY (exam_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_item ON items (item_id, course, term);
+CREATE INDEX IF NOT EXISTS idx_items_course_term ON items (course, term);
+CREATE INDEX IF NOT EXISTS idx_exams_course_term ON exams (course, term);
+"""
+
+# Cột trong bảng items -> các tên cột tương ứng trong bảng kết quả (trắc nghiệm / tự luận / hỗn hợp)
+_ITEM_COLUMNS = {
+    "item_id": ("Câu hỏi", "Câu"),
+    "item_type": ("Loại câu",),
+    "n_students": ("Tổng số SV",),
+    "n_correct": ("Số SV trả lời đúng",),
+    "mean_score": ("Điểm TB",),
+    "max_score": ("Điểm tối đa",),
+    "high_correct": ("Số SV đúng - Nhóm cao",),
+    "low_correct": ("Số SV đúng - Nhóm thấp",),
+    "high_mean": ("Điểm TB - Nhóm cao",),
+    "low_mean": ("Điểm TB - Nhóm thấp",),
+    "difficulty": ("Độ khó (P)",),
+    "difficulty_level": ("Mức độ",),
+    "discrimination": ("Độ phân biệt", "Độ phân biệt (D)"),
+    "discrimination_level": ("Mức độ phân biệt",),
+    "item_total_corr": ("Tương quan câu - tổng (hiệu chỉnh)",),
+}
+
+# Tên cột hiển thị của kết quả truy vấn
+_DISPLAY_NAMES = {
+    "course": "Học phần",
+    "term": "Học kỳ",
+    "exam_type": "Loại đề",
+    "exam_name": "Tên đề",
+    "item_id": "Câu hỏi",
+    "item_type": "Loại câu",
+    "n_students": "Tổng số SV",
+    "n_correct": "Số SV trả lời đúng",
+    "mean_score": "Điểm TB",
+    "max_score": "Điểm tối đa",
+    "high_correct": "Số SV đúng - Nhóm cao",
+    "low_correct": "Số SV đúng - Nhóm thấp",
+    "high_mean": "Điểm TB - Nhóm cao",
+    "low_mean": "Điểm TB - Nhóm thấp",
+    "difficulty": "Độ khó (P)",
+    "difficulty_level": "Mức độ",
+    "discrimination": "Độ phân biệt (D)",
+    "discrimination_level": "Mức độ phân biệt",
+    "item_total_corr": "Tương quan câu - tổng (hiệu chỉnh)",
+    "n_items": "Số câu",
+    "conclusion": "Kết luận",
+    "recorded_at": "Thời điểm lưu",
+}
+
+
+class ItemBank:
+    """
+    Ngân hàng câu hỏi lưu thống kê của mọi lần phân tích trong một file SQLite
+
+    Mỗi đề (học phần, học kỳ, loại đề, mã băm file) là một dòng trong bảng exams, mỗi
+    câu hỏi là một dòng trong bảng items (P, D, số SV đúng theo nhóm với câu trắc
+    nghiệm, điểm TB theo nhóm với câu tự luận, ở các cột riêng). Bảng items có chỉ mục
+    theo (mã câu, học phần, học kỳ) và (học phần, học kỳ) nên tra lịch sử một câu qua
+    nhiều năm chỉ mất vài mili giây. Mã câu là tên câu trong bảng kết quả ("Câu 1",
+    "TN_Câu 1"...), lịch sử được so theo mã câu trong cùng học phần.
+
+    Mỗi lần ghi mở một kết nối riêng, nên dùng được từ nhiều luồng (Streamlit) và nhiều
+    tiến trình (CLI) cùng lúc; file dùng chế độ WAL để việc đọc không bị chặn khi ghi.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or default_bank_path()
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+
+    def record_exam(self, result_df: pd.DataFrame, exam_type: str, course: str, term: str, file_hash: str,
+                    exam_name: str = None, conclusion: str = None) -> int:
+        """
+        Lưu bảng kết quả của một đề trong đúng một giao dịch
+
+        Lưu lại cùng một đề (cùng học phần, học kỳ, loại đề, mã băm file) sẽ thay thế
+        bản đã lưu trước đó.
+
+        Parameters:
+        -----------
+        result_df : pd.DataFrame
+            Bảng kết quả từng câu (calculate_question_stats, calculate_essay_stats,
+            calculate_mix_stats)
+        exam_type : str
+            "Trắc nghiệm", "Tự luận" hoặc "Hỗn hợp"
+        course, term : str
+            Mã học phần và học kỳ / năm học
+        file_hash : str
+            Mã băm nội dung file dữ liệu
+        exam_name : str, optional
+            Tên đề / tên file để hiển thị
+        conclusion : str, optional
+            Kết luận của evaluate_exam_difficulty_mix
+
+        Returns:
+        --------
+        int
+            Mã đề (exam_id) trong ngân hàng
+        """
+        if not course or not term:
+            raise ValueError("Cần mã học phần và học kỳ để lưu vào ngân hàng câu hỏi")
+        rows = _item_rows(result_df)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM exams WHERE course = ? AND term = ? AND exam_type = ? AND file_hash = ?",
+                    (course, term, exam_type, file_hash)
+                )
+                exam_id = conn.execute(
+                    "INSERT INTO exams (course, term, exam_type, file_hash, exam_name, n_items, conclusion, recorded_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (course, term, exam_type, file_hash, exam_name, len(rows), conclusion,
+                     time.strftime("%Y-%m-%d %H:%M:%S"))
+                ).lastrowid
+                columns = ", ".join(_ITEM_COLUMNS)
+                placeholders = ", ".join("?" * (len(_ITEM_COLUMNS) + 4))
+                conn.executemany(
+                    f"INSERT INTO items (exam_id, course, term, exam_type, {columns}) VALUES ({placeholders})",
+                    [(exam_id, course, term, exam_type) + row for row in rows]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return exam_id
+
+    def item_history(self, course: str = None, item_ids=None, term: str = None,
+                     exam_type: str = None) -> pd.DataFrame:
+        """
+        Lịch sử thống kê của các câu hỏi qua các học kỳ
+
+        Parameters:
+        -----------
+        course : str, optional
+            Chỉ lấy câu của học phần này
+        item_ids : list[str], optional
+            Chỉ lấy các mã câu này
+        term : str, optional
+            Chỉ lấy học kỳ này
+        exam_type : str, optional
+            Chỉ lấy câu của các đề loại này ("Trắc nghiệm", "Tự luận", "Hỗn hợp")
+
+        Returns:
+        --------
+        pd.DataFrame
+            Mỗi dòng là một câu trong một đề, sắp theo học phần, mã câu, học kỳ
+        """
+        conditions, params, join = [], [], ""
+        if course is not None:
+            conditions.append("i.course = ?")
+            params.append(course)
+        if term is not None:
+            conditions.append("i.term = ?")
+            params.append(term)
+        if exam_type is not None:
+            conditions.append("i.exam_type = ?")
+            params.append(exam_type)
+        if item_ids is not None:
+            # Danh sách mã câu đưa vào bảng tạm rồi JOIN: không giới hạn số mã câu như IN (?, ...)
+            join = " JOIN temp.wanted_items w ON w.item_id = i.item_id"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (
+            f"SELECT i.course, i.term, i.exam_type, e.exam_name, {', '.join('i.' + c for c in _ITEM_COLUMNS)},"
+            f" e.recorded_at FROM items i JOIN exams e ON e.exam_id = i.exam_id{join} {where}"
+            f" ORDER BY i.course, i.item_id, i.term, e.recorded_at"
+        )
+        with self._connect() as conn:
+            if item_ids is not None:
+                conn.execute("CREATE TEMP TABLE wanted_items (item_id TEXT PRIMARY KEY)")
+                conn.executemany("INSERT OR IGNORE INTO wanted_items VALUES (?)", ((str(i),) for i in item_ids))
+            return _read_frame(conn, query, params)
+
+    def exams(self, course: str = None) -> pd.DataFrame:
+        """Danh sách các đề đã lưu (mới nhất trước), có thể lọc theo học phần"""
+        where, params = ("WHERE course = ?", [course]) if course is not None else ("", [])
+        return self._query(
+            f"SELECT course, term, exam_type, exam_name, n_items, conclusion, recorded_at FROM exams {where}"
+            f" ORDER BY recorded_at DESC, exam_id DESC",
+            params
+        )
+
+    def _query(self, query: str, params) -> pd.DataFrame:
+        with self._connect() as conn:
+            return _read_frame(conn, query, params)
+
+    @contextmanager
+    def _connect(self):
+        """Kết nối ở chế độ tự quản lý giao dịch (BEGIN / COMMIT tường minh)"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            yield conn
+        finally:
+            conn.close()
+
+
+def _read_frame(conn, query: str, params) -> pd.DataFrame:
+    """Kết quả truy vấn thành DataFrame với tên cột hiển thị"""
+    cursor = conn.execute(query, params)
+    columns = [d[0] for d in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=columns).rename(columns=_DISPLAY_NAMES)
+
+
+def _item_rows(result_df: pd.DataFrame) -> list:
+    """Các dòng (theo thứ tự cột của _ITEM_COLUMNS) từ bảng kết quả; cột không có là NULL"""
+    columns = []
+    for candidates in _ITEM_COLUMNS.values():
+        col = next((c for c in candidates if c in result_df.columns), None)
+        if col is None:
+            columns.append([None] * len(result_df))
+        else:
+            values = result_df[col].astype(object)
+            columns.append(values.where(values.notna(), None).tolist())
+    if all(v is None for v in columns[0]):
+        raise ValueError("Bảng kết quả không có cột tên câu hỏi ('Câu hỏi' hoặc 'Câu')")
+    columns[0] = [str(v) for v in columns[0]]
+    return list(zip(*columns))
@@ -1,9 +1,15 @@
+import logging
 import pandas as pd
 from processor_essay import calculate_essay_stats
 from processor_multiple_choice import calculate_question_stats
+from reliability import attach_reliability
+from processor_common import calculate_student_groups
+from score_matrix import ScoreMatrix, as_score_matrix
 
+logger = logging.getLogger("exam_quality.mixed")
 
-def calculate_mix_stats(df_mc, df_e, df_max_score):
+
+def calculate_mix_stats(df_mc, df_e, df_max_score, n_bootstrap: int = 0, random_state=0, rubric=None):
     """
     Tính toán thống kê kết hợp cho bài thi có cả trắc nghiệm và tự luận
     
@@ -15,6 +21,12 @@ def calculate_mix_stats(df_mc, df_e, df_max_score):
         DataFrame chứa dữ liệu điểm tự luận
     df_max_score : pd.DataFrame
         DataFrame chứa điểm tối đa cho từng câu tự luận
+    n_bootstrap : int
+        Số lần lặp bootstrap; nếu > 0, thêm khoảng tin cậy cho P và D
+    random_state : int
+        Hạt giống ngẫu nhiên của bootstrap
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại P, D và độ tin cậy dùng chung cho cả hai phần (mặc định default_rubric())
         
     Returns:
     --------
@@ -23,7 +35,7 @@ def calculate_mix_stats(df_mc, df_e, df_max_score):
     """
     
     # Tính thống kê cho câu trắc nghiệm
-    stats_mc = calculate_question_stats(df_mc)
+    stats_mc = calculate_question_stats(df_mc, n_bootstrap=n_bootstrap, random_state=random_state, rubric=rubric)
     # Thêm cột loại câu hỏi
     stats_mc['Loại câu'] = 'Trắc nghiệm'
     
@@ -32,7 +44,8 @@ def calculate_mix_stats(df_mc, df_e, df_max_score):
         stats_mc = stats_mc.rename(columns={'Độ phân biệt': 'Độ phân biệt (D)'})
     
     # Tính thống kê cho câu tự luận  
-    stats_essay = calculate_essay_stats(df_e, df_max_score)
+    stats_essay = calculate_essay_stats(df_e, df_max_score, n_bootstrap=n_bootstrap,
+                                        random_state=random_state, rubric=rubric)
     # Thêm cột loại câu hỏi
     stats_essay['Loại câu'] = 'Tự luận'
     
@@ -50,12 +63,17 @@ def calculate_mix_stats(df_mc, df_e, df_max_score):
     stats_combined = pd.concat([stats_mc, stats_essay], ignore_index=True)
     
     # Sắp xếp các cột theo thứ tự mong muốn
-    column_order = ['Câu', 'Loại câu', 'Độ khó (P)', 
-                    'Mức độ', 'Độ phân biệt (D)', 'Mức độ phân biệt']
+    column_order = ['Câu', 'Loại câu', 'Độ khó (P)', 'P (CI dưới)', 'P (CI trên)',
+                    'Mức độ', 'Độ phân biệt (D)', 'D (CI dưới)', 'D (CI trên)', 'Mức độ phân biệt']
     
     # Chỉ giữ lại các cột có trong dữ liệu
     available_columns = [col for col in column_order if col in stats_combined.columns]
-    stats_combined = stats_combined[available_columns]
+    stats_combined = stats_combined[available_columns].copy()
+    
+    # Độ tin cậy toàn đề (Cronbach's alpha) trên ma trận điểm ghép TN + TL của cùng SV
+    combined = _combined_score_matrix(df_mc, df_e)
+    if combined.n_students > 0 and len(combined.question_cols) == len(stats_combined):
+        stats_combined = attach_reliability(stats_combined, combined.scores, "Cronbach's alpha", rubric)
     
     # Thêm thống kê tổng quan
     summary_stats = {
@@ -68,15 +86,31 @@ def calculate_mix_stats(df_mc, df_e, df_max_score):
         'Độ phân biệt TB tự luận': stats_essay['Độ phân biệt (D)'].mean() if 'Độ phân biệt (D)' in stats_essay.columns else None
     }
     
-    # In thống kê tổng quan
-    print("\n=== THỐNG KÊ TỔNG QUAN BÀI THI KẾT HỢP ===")
-    for key, value in summary_stats.items():
-        if value is not None:
-            if isinstance(value, float):
-                print(f"{key}: {value:.3f}")
-            else:
-                print(f"{key}: {value}")
+    # Thống kê tổng quan ghi ở mức DEBUG (hàm thư viện không in ra stdout)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Thống kê tổng quan bài thi kết hợp: %s", ", ".join(
+            f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}"
+            for key, value in summary_stats.items() if value is not None
+        ))
     
-    print("\n=== CHI TIẾT TỪNG CÂU HỎI ===")
-    
-    return stats_combined
\ No newline at end of file
+    return stats_combined
+
+
+def calculate_mix_student_groups(df_mc, df_e) -> pd.DataFrame:
+    """Tổng điểm (TN + TL), thứ hạng và nhóm của từng SV có mặt ở cả hai sheet"""
+    return calculate_student_groups(_combined_score_matrix(df_mc, df_e))
+
+
+def _combined_score_matrix(df_mc, df_e) -> ScoreMatrix:
+    """Ghép ma trận điểm trắc nghiệm và tự luận theo STT (chỉ các SV có ở cả hai sheet)"""
+    mc = as_score_matrix(df_mc, binary=True)
+    essay = as_score_matrix(df_e)
+    mc_frame = pd.DataFrame(mc.dense(), index=[str(x) for x in mc.stt],
+                            columns=['TN_' + str(col) for col in mc.question_cols])
+    essay_frame = pd.DataFrame(essay.dense(), index=[str(x) for x in essay.stt],
+                               columns=['TL_' + str(col) for col in essay.question_cols])
+    mc_frame = mc_frame[~mc_frame.index.duplicated()]
+    essay_frame = essay_frame[~essay_frame.index.duplicated()]
+
+    combined = mc_frame.join(essay_frame, how="inner")
+    return ScoreMatrix(list(combined.columns), combined.to_numpy(dtype=float), combined.index.to_numpy())
\ No newline at end of file
@@ -1,41 +1,101 @@
 import pandas as pd
+import numpy as np
+import math
+from score_matrix import as_score_matrix, row_totals
+from rubric import Rubric, default_rubric
 
-def classify_difficulty(P: float) -> str:
-    """Phân loại mức độ khó dựa trên chỉ số P"""
-    if P >= 80:
-        return "Dễ"
-    elif 60 <= P < 80:
-        return "Trung bình"
-    elif 40 <= P < 60:
-        return "Khó"
-    else:
-        return "Rất khó"
+def classify_difficulty(P: float, rubric: Rubric = None) -> str:
+    """Phân loại mức độ khó dựa trên chỉ số P (theo bộ tiêu chí, mặc định default_rubric())"""
+    return (rubric or default_rubric()).difficulty.label(P)
 
-def classify_discrimination(D: float) -> str:
-    """Phân loại mức độ phân biệt dựa trên chỉ số D"""
-    if D >= 0.4:
-        return "Rất tốt"
-    elif 0.3 <= D < 0.4:
-        return "Tốt"
-    elif 0.2 <= D < 0.3:
-        return "Chấp nhận được"
-    elif 0 <= D < 0.2:
-        return "Kém"
-    else:
-        return "Không đạt / âm"
+def classify_discrimination(D: float, rubric: Rubric = None) -> str:
+    """Phân loại mức độ phân biệt dựa trên chỉ số D (theo bộ tiêu chí, mặc định default_rubric())"""
+    return (rubric or default_rubric()).discrimination.label(D)
+
+def select_high_low_groups(total_scores, ratio: float = 0.27):
+    """
+    Chọn nhóm cao / thấp (mặc định 27% mỗi nhóm) theo tổng điểm
+    
+    Chỉ tìm hai đuôi của phân phối bằng chọn lọc từng phần (argpartition, O(n)),
+    không xếp hạng hay sắp xếp lại toàn bộ danh sách sinh viên. Khi có nhiều SV
+    cùng điểm ở ranh giới nhóm, SV được chọn là tuỳ ý như khi sắp xếp.
+    
+    Parameters:
+    -----------
+    total_scores : array-like
+        Tổng điểm của từng sinh viên
+    ratio : float
+        Tỷ lệ sinh viên của mỗi nhóm
+        
+    Returns:
+    --------
+    tuple[np.ndarray, np.ndarray]
+        Chỉ số (vị trí) của các SV thuộc nhóm cao và nhóm thấp, đã sắp tăng dần
+    """
+    totals = np.asarray(total_scores, dtype=float)
+    n = totals.shape[0]
+    group_size = math.floor(n * ratio)
+    if group_size == 0:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty
+
+    high_idx = np.argpartition(totals, n - group_size)[n - group_size:]
+    low_idx = np.argpartition(totals, group_size - 1)[:group_size]
+    return np.sort(high_idx), np.sort(low_idx)
+
+def calculate_student_groups(df) -> pd.DataFrame:
+    """
+    Tổng điểm, thứ hạng và nhóm (Cao / Trung bình / Thấp) của từng sinh viên
+    
+    Parameters:
+    -----------
+    df : pd.DataFrame | ScoreMatrix
+        Sheet điểm của sinh viên (chỉ các dòng có STT hợp lệ được giữ lại)
+        
+    Returns:
+    --------
+    pd.DataFrame
+        Các cột STT, Tổng điểm, Thứ hạng, Nhóm theo thứ tự trong sheet
+    """
+    matrix = as_score_matrix(df)
+    total_scores = row_totals(matrix.scores)
+    high_idx, low_idx = select_high_low_groups(total_scores)
+
+    groups = np.full(len(total_scores), "Trung bình", dtype=object)
+    groups[high_idx] = "Cao"
+    groups[low_idx] = "Thấp"
+    return pd.DataFrame({
+        "STT": matrix.stt,
+        "Tổng điểm": total_scores,
+        "Thứ hạng": pd.Series(total_scores).rank(ascending=False, method="dense").astype(int).to_numpy(),
+        "Nhóm": groups,
+    })
 
 def evaluate_exam_difficulty_mix(
     stats_df: pd.DataFrame,
-    target_mix = {"Dễ": 0.50, "Trung bình": 0.30, "Khó": 0.20},
-    tolerance: float = 0.05,
+    target_mix = None,
+    tolerance: float = None,
     check_discrimination: bool = False,
-    min_good_D_share: float = 0.60,   # ít nhất 60% câu có D >= 0.2
-    max_negative_D_share: float = 0.10 # không quá 10% câu có D < 0
+    min_good_D_share: float = None,   # tỷ lệ tối thiểu câu có D >= ngưỡng D tốt (mặc định 60%, D >= 0.2)
+    max_negative_D_share: float = None, # tỷ lệ tối đa câu có D < 0 (mặc định 10%)
+    rubric: Rubric = None
 ):
-    """Đánh giá cơ cấu độ khó của đề thi"""
+    """
+    Đánh giá cơ cấu độ khó của đề thi
+    
+    Các tham số để None lấy theo bộ tiêu chí `rubric` (mặc định default_rubric()).
+    Nếu bảng kết quả có độ tin cậy toàn đề (stats_df.attrs["reliability"], do các hàm
+    calculate_*_stats tính), thông tin này được thêm vào dict thống kê trả về.
+    """
+    rubric = rubric or default_rubric()
+    target_mix = rubric.target_mix if target_mix is None else target_mix
+    tolerance = rubric.tolerance if tolerance is None else tolerance
+    min_good_D_share = rubric.min_good_D_share if min_good_D_share is None else min_good_D_share
+    max_negative_D_share = rubric.max_negative_D_share if max_negative_D_share is None else max_negative_D_share
+    groups = list(target_mix)
     df = stats_df.copy()
 
-    # Chuẩn hoá nhóm độ khó: gộp "Rất khó" vào "Khó"
+    # Chuẩn hoá nhóm độ khó theo bộ tiêu chí: mặc định gộp "Rất khó" vào "Khó"
     # Kiểm tra tên cột có thể là "Mức độ" hoặc "Phân loại độ khó"
     difficulty_col = None
     if "Mức độ" in df.columns:
@@ -47,19 +107,19 @@ def evaluate_exam_difficulty_mix(
         print(f"Các cột có sẵn trong DataFrame: {df.columns.tolist()}")
         raise ValueError("Không tìm thấy cột độ khó (Mức độ hoặc Phân loại độ khó)")
     
-    df["Mức độ (chuẩn)"] = df[difficulty_col].replace({"Rất khó": "Khó"})
+    df["Mức độ (chuẩn)"] = rubric.mix_group(df[difficulty_col])
 
     # Đếm và tính tỷ lệ thực tế
     total_items = len(df)
-    counts = df["Mức độ (chuẩn)"].value_counts().reindex(["Dễ","Trung bình","Khó"], fill_value=0)
+    counts = df["Mức độ (chuẩn)"].value_counts().reindex(groups, fill_value=0)
     percents = (counts / total_items).round(4)
 
     # Tạo bảng so sánh
     summary = pd.DataFrame({
-        "Nhóm": ["Dễ","Trung bình","Khó"],
+        "Nhóm": groups,
         "Số câu": counts.values,
         "Tỷ lệ thực tế": percents.values,
-        "Tỷ lệ mục tiêu": [target_mix["Dễ"], target_mix["Trung bình"], target_mix["Khó"]],
+        "Tỷ lệ mục tiêu": [target_mix[group] for group in groups],
     })
     summary["Khoảng chấp nhận"] = summary["Tỷ lệ mục tiêu"].apply(
         lambda x: f"[{round(x - tolerance, 3)}, {round(x + tolerance, 3)}]"
@@ -84,14 +144,22 @@ def evaluate_exam_difficulty_mix(
             break
     
     if check_discrimination and disc_col:
-        good_D_share = (df[disc_col] >= 0.2).mean()
+        good_D_share = (df[disc_col] >= rubric.good_D).mean()
         negative_D_share = (df[disc_col] < 0).mean()
         pass_disc = (good_D_share >= min_good_D_share) and (negative_D_share <= max_negative_D_share)
         disc_result = {
-            "Tỷ lệ D >= 0.2": round(good_D_share, 4),
+            f"Tỷ lệ D >= {rubric.good_D:g}": round(good_D_share, 4),
             "Tỷ lệ D < 0": round(negative_D_share, 4),
             "Đạt tiêu chí phân biệt?": pass_disc
         }
+    disc_checked = check_discrimination and disc_result is not None
+
+    # Độ tin cậy toàn đề (KR-20 / Cronbach's alpha) nếu bảng kết quả có kèm theo
+    reliability = stats_df.attrs.get("reliability")
+    if reliability:
+        disc_result = dict(disc_result or {})
+        disc_result[f"Độ tin cậy ({reliability['Hệ số tin cậy']})"] = reliability["Giá trị"]
+        disc_result["Mức độ tin cậy"] = reliability["Mức độ tin cậy"]
 
     # Kết luận chi tiết
     conclusions = []
@@ -103,14 +171,14 @@ def evaluate_exam_difficulty_mix(
         conclusions.append("❌ Không đạt chuẩn cơ cấu độ khó")
     
     # Kết luận về độ phân biệt (nếu có kiểm tra)
-    if check_discrimination and disc_result is not None:
+    if disc_checked:
         if pass_disc:
             conclusions.append("✅ Đạt tiêu chí độ phân biệt")
         else:
             conclusions.append("❌ Không đạt tiêu chí độ phân biệt")
     
     # Kết luận tổng thể
-    if check_discrimination and disc_result is not None:
+    if disc_checked:
         overall_pass = pass_mix and pass_disc
         if overall_pass:
             final_conclusion = "Đạt chuẩn tổng thể"
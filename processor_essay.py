@@ -1,18 +1,31 @@
 import pandas as pd
 import numpy as np
-import math
-from processor_common import classify_difficulty
+from processor_common import select_high_low_groups
+from score_matrix import ScoreMatrix, as_score_matrix, row_totals
+from bootstrap_ci import bootstrap_item_intervals, attach_intervals
+from reliability import attach_reliability
+from rubric import Rubric, default_rubric
 
-def calculate_essay_stats(df: pd.DataFrame, max_scores_df: pd.DataFrame = None) -> pd.DataFrame:
+def calculate_essay_stats(df: pd.DataFrame, max_scores_df: pd.DataFrame = None, n_bootstrap: int = 0,
+                          confidence: float = 0.95, random_state=0, rubric: Rubric = None) -> pd.DataFrame:
     """
     Tính toán độ khó và độ phân biệt cho câu hỏi tự luận
     
     Parameters:
     -----------
-    df : pd.DataFrame
-        DataFrame chứa dữ liệu điểm của sinh viên (sheet 1)
+    df : pd.DataFrame | ScoreMatrix
+        DataFrame chứa dữ liệu điểm của sinh viên (sheet 1), hoặc ScoreMatrix
+        đọc tuần tự bằng score_matrix.read_score_matrix
     max_scores_df : pd.DataFrame
         DataFrame chứa điểm tối đa của từng câu (sheet 2)
+    n_bootstrap : int
+        Số lần lặp bootstrap; nếu > 0, thêm khoảng tin cậy cho P và D
+    confidence : float
+        Mức tin cậy của khoảng bootstrap
+    random_state : int
+        Hạt giống ngẫu nhiên của bootstrap (để kết quả lặp lại được)
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại P, D và độ tin cậy (mặc định default_rubric())
         
     Returns:
     --------
@@ -20,101 +33,117 @@ def calculate_essay_stats(df: pd.DataFrame, max_scores_df: pd.DataFrame = None)
         DataFrame chứa kết quả phân tích độ khó và độ phân biệt
     """
     
-    # Kiểm tra STT
-    if 'STT' not in df.columns:
-        df = df.copy()
-        df['STT'] = range(1, len(df) + 1)
-    
-    # Lọc hợp lệ
-    df_clean = df[df['STT'].apply(lambda x: str(x).isdigit())].copy()
-    df_clean.reset_index(drop=True, inplace=True)
-    
-    # Các cột câu hỏi
-    question_cols = [col for col in df_clean.columns if col.startswith("Câu")]
+    # Ma trận điểm (SV x câu) của các dòng có STT hợp lệ
+    matrix = as_score_matrix(df)
+    question_cols, scores = matrix.question_cols, matrix.scores
     
     # Lấy điểm tối đa từ sheet 2
+    max_scores = _read_max_scores(question_cols, max_scores_df)
+    
+    # Tính tổng điểm mỗi SV và chia nhóm cao / thấp (27% mỗi nhóm)
+    total_scores = row_totals(scores)
+    high_idx, low_idx = select_high_low_groups(total_scores)
+
+    result = _essay_stats_from_matrix(question_cols, scores, high_idx, low_idx, max_scores, rubric)
+
+    # Độ tin cậy Cronbach's alpha, tương quan câu - tổng hiệu chỉnh và alpha nếu bỏ câu
+    result = attach_reliability(result, scores, "Cronbach's alpha", rubric)
+
+    # Khoảng tin cậy bootstrap cho P và D (tuỳ chọn), trên điểm đã chia cho điểm tối đa
+    if n_bootstrap > 0:
+        valid = ~np.isnan(scores)
+        max_possible = result["Điểm tối đa"].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normalized = np.where(valid, scores, 0.0) / np.where(max_possible > 0, max_possible, np.nan)
+        intervals = bootstrap_item_intervals(normalized, total_scores, valid=valid, n_bootstrap=n_bootstrap,
+                                             confidence=confidence, random_state=random_state)
+        result = attach_intervals(result, intervals, "Độ khó (P)", "Độ phân biệt (D)")
+
+    return result
+
+
+def _read_max_scores(question_cols, max_scores_df: pd.DataFrame = None) -> dict:
+    """Lấy điểm tối đa của từng câu từ sheet 2 (nếu có)"""
     max_scores = {}
+    if isinstance(max_scores_df, ScoreMatrix):
+        max_scores_df = max_scores_df.head(1).to_dataframe()
     if max_scores_df is not None:
         # Giả sử sheet 2 có cấu trúc: hàng 1 là tên câu, hàng 2 là điểm tối đa
         for col in question_cols:
             if col in max_scores_df.columns:
                 # Lấy giá trị ở hàng đầu tiên (index 0) của cột tương ứng
                 max_scores[col] = float(max_scores_df[col].iloc[0]) if not max_scores_df[col].empty else None
-    
-    # Tính tổng điểm mỗi SV
-    df_clean["Tổng điểm"] = df_clean[question_cols].sum(axis=1)
-    
-    # Xếp hạng
-    df_clean["Thứ hạng"] = df_clean["Tổng điểm"].rank(ascending=False, method="dense").astype(int)
-    
-    # Chia nhóm cao / thấp (27% mỗi nhóm)
-    n = len(df_clean)
-    group_size = math.floor(n * 0.27)
-    df_clean = df_clean.sort_values(by="Thứ hạng").reset_index(drop=True)
-    df_clean.loc[:group_size-1, "Nhóm"] = "Cao"
-    df_clean.loc[n-group_size:, "Nhóm"] = "Thấp"
-    df_clean["Nhóm"].fillna("Trung bình", inplace=True)
-    
-    # Nhóm cao & thấp
-    high_group = df_clean[df_clean["Nhóm"] == "Cao"]
-    low_group = df_clean[df_clean["Nhóm"] == "Thấp"]
-    
-    results = []
-    total_students = df_clean.shape[0]
-    
-    for i, col in enumerate(question_cols):
-        # Tính điểm trung bình
-        mean_score = df_clean[col].mean()
-        actual_max_score = df_clean[col].max()
-        min_score = df_clean[col].min()
-        std_score = df_clean[col].std()
-        
-        # Lấy điểm tối đa từ sheet 2 hoặc từ dữ liệu thực tế
-        max_possible_score = max_scores.get(col, actual_max_score) if max_scores else actual_max_score
-        
+    return max_scores
+
+
+def _essay_stats_from_matrix(question_cols, scores: np.ndarray, high_idx: np.ndarray,
+                             low_idx: np.ndarray, max_scores: dict, rubric: Rubric = None) -> pd.DataFrame:
+    """Tính các đại lượng thống kê cho toàn bộ câu tự luận từ ma trận điểm (SV x câu)"""
+    total_students = scores.shape[0]
+
+    # Bỏ qua ô trống (NaN) giống như pandas: đếm, cộng trên các ô có giá trị
+    valid = ~np.isnan(scores)
+    filled = np.where(valid, scores, 0.0)
+
+    # Gom nhóm một lần: hàng 0 = toàn bộ, hàng 1 = nhóm cao, hàng 2 = nhóm thấp
+    membership = np.zeros((3, total_students))
+    membership[0] = 1.0
+    membership[1, high_idx] = 1.0
+    membership[2, low_idx] = 1.0
+    counts = membership @ valid
+    sums = membership @ filled
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+        mean_score, mean_high, mean_low = means
+        std_score = np.sqrt(
+            np.where(valid, (scores - mean_score) ** 2, 0.0).sum(axis=0) / (counts[0] - 1)
+        )
+        std_score = np.where(counts[0] > 1, std_score, np.nan)
+
+    # Ma trận có thể là float32 (read_score_matrix); kết quả luôn là float64
+    actual_max_score = (np.fmax.reduce(scores, axis=0).astype(np.float64) if total_students
+                        else np.full(len(question_cols), np.nan))
+    min_score = (np.fmin.reduce(scores, axis=0).astype(np.float64) if total_students
+                 else np.full(len(question_cols), np.nan))
+
+    return _essay_table(question_cols, total_students, mean_score, actual_max_score, min_score,
+                        std_score, mean_high, mean_low, max_scores, rubric)
+
+
+def _essay_table(question_cols, total_students, mean_score, actual_max_score, min_score,
+                 std_score, mean_high, mean_low, max_scores: dict, rubric: Rubric = None) -> pd.DataFrame:
+    """Dựng bảng kết quả tự luận từ các mảng thống kê theo câu; P, D được phân loại cả mảng một lần"""
+    rubric = rubric or default_rubric()
+    # Lấy điểm tối đa từ sheet 2 hoặc từ dữ liệu thực tế
+    max_possible_score = np.array([
+        max_scores.get(col, actual) if max_scores else actual
+        for col, actual in zip(question_cols, actual_max_score)
+    ], dtype=float)
+    has_max = max_possible_score > 0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
         # Độ khó mới: P = (Điểm TB / Điểm tối đa) × 100
-        if max_possible_score > 0:
-            P = round((mean_score / max_possible_score) * 100, 2)
-        else:
-            P = 0
-        
-        # Điểm TB nhóm cao và thấp
-        mean_high = high_group[col].mean()
-        mean_low = low_group[col].mean()
-        
+        P = np.where(has_max, np.round(mean_score / max_possible_score * 100, 2), 0)
+
         # Độ phân biệt mới: D = (TB nhóm cao - TB nhóm thấp) / Điểm tối đa
-        if max_possible_score > 0:
-            D = round((mean_high - mean_low) / max_possible_score, 2)
-        else:
-            D = 0
-        
-        # Phân loại độ phân biệt theo tiêu chí mới
-        if D >= 0.4:
-            D_level = "Rất tốt"
-        elif 0.3 <= D < 0.4:
-            D_level = "Tốt"
-        elif 0.2 <= D < 0.3:
-            D_level = "Trung bình"
-        elif D >= 0:
-            D_level = "Kém"
-        else:
-            D_level = "Không đạt"
-        
-        results.append({
-            "STT": i + 1,
-            "Câu hỏi": col,
-            "Tổng số SV": total_students,
-            "Điểm TB": round(mean_score, 2),
-            "Điểm tối đa": max_possible_score,
-            "Điểm cao nhất (thực tế)": actual_max_score,
-            "Điểm thấp nhất": min_score,
-            "Độ lệch chuẩn": round(std_score, 2),
-            "Độ khó (P)": P,
-            "Mức độ": classify_difficulty(P),
-            "Điểm TB - Nhóm cao": round(mean_high, 2),
-            "Điểm TB - Nhóm thấp": round(mean_low, 2),
-            "Độ phân biệt (D)": D,
-            "Mức độ phân biệt": D_level
-        })
-    
-    return pd.DataFrame(results)
\ No newline at end of file
+        D = np.where(has_max, np.round((mean_high - mean_low) / max_possible_score, 2), 0)
+
+    # Phân loại độ phân biệt theo cùng bộ tiêu chí với trắc nghiệm
+    D_level = rubric.discrimination(D)
+
+    return pd.DataFrame({
+        "STT": np.arange(1, len(question_cols) + 1),
+        "Câu hỏi": list(question_cols),
+        "Tổng số SV": total_students,
+        "Điểm TB": np.round(mean_score, 2),
+        "Điểm tối đa": max_possible_score,
+        "Điểm cao nhất (thực tế)": actual_max_score,
+        "Điểm thấp nhất": min_score,
+        "Độ lệch chuẩn": np.round(std_score, 2),
+        "Độ khó (P)": P,
+        "Mức độ": rubric.difficulty(P),
+        "Điểm TB - Nhóm cao": np.round(mean_high, 2),
+        "Điểm TB - Nhóm thấp": np.round(mean_low, 2),
+        "Độ phân biệt (D)": D,
+        "Mức độ phân biệt": D_level
+    })
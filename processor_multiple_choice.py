@@ -1,79 +1,99 @@
 import pandas as pd
-import math
-from processor_common import classify_difficulty, classify_discrimination
+import numpy as np
+from processor_common import select_high_low_groups
+from score_matrix import as_score_matrix, row_totals, PackedResponses
+from bootstrap_ci import bootstrap_item_intervals, attach_intervals
+from reliability import attach_reliability
+from rubric import Rubric, default_rubric
 
-def calculate_question_stats(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_question_stats(df: pd.DataFrame, n_bootstrap: int = 0, confidence: float = 0.95,
+                             random_state=0, rubric: Rubric = None) -> pd.DataFrame:
     """
     Tính toán độ khó và độ phân biệt cho câu hỏi trắc nghiệm
     
     Parameters:
     -----------
-    df : pd.DataFrame
-        DataFrame chứa dữ liệu điểm của sinh viên
+    df : pd.DataFrame | ScoreMatrix
+        DataFrame chứa dữ liệu điểm của sinh viên, hoặc ScoreMatrix đọc tuần tự
+        bằng score_matrix.read_score_matrix
+    n_bootstrap : int
+        Số lần lặp bootstrap; nếu > 0, thêm khoảng tin cậy cho P và D
+    confidence : float
+        Mức tin cậy của khoảng bootstrap
+    random_state : int
+        Hạt giống ngẫu nhiên của bootstrap (để kết quả lặp lại được)
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại P, D và độ tin cậy (mặc định default_rubric())
         
     Returns:
     --------
     pd.DataFrame
         DataFrame chứa kết quả phân tích độ khó và độ phân biệt
     """
-    # Kiểm tra STT
-    if 'STT' not in df.columns:
-        df = df.copy()
-        df['STT'] = range(1, len(df) + 1)
+    # Ma trận điểm (SV x câu) của các dòng có STT hợp lệ (nén bit nếu điểm chỉ gồm 0 / 1)
+    matrix = as_score_matrix(df, binary=True)
+    question_cols, scores = matrix.question_cols, matrix.scores
 
-    # Lọc hợp lệ
-    df_clean = df[df['STT'].apply(lambda x: str(x).isdigit())].copy()
-    df_clean.reset_index(drop=True, inplace=True)
+    # Tính tổng điểm mỗi SV và chia nhóm cao / thấp (27% mỗi nhóm)
+    total_scores = row_totals(scores)
+    high_idx, low_idx = select_high_low_groups(total_scores)
 
-    # Các cột câu hỏi
-    question_cols = [col for col in df_clean.columns if col.startswith("Câu")]
+    # Ma trận đúng / sai nén bit (1/64 bộ nhớ của ma trận điểm float64)
+    correct = PackedResponses.from_scores(scores)
+    result = _question_stats_from_matrix(question_cols, correct, high_idx, low_idx, rubric)
 
-    # Tính tổng điểm mỗi SV
-    df_clean["Tổng điểm"] = df_clean[question_cols].sum(axis=1)
+    # Độ tin cậy KR-20, tương quan câu - tổng hiệu chỉnh và KR-20 nếu bỏ câu
+    result = attach_reliability(result, correct, "KR-20", rubric)
 
-    # Xếp hạng
-    df_clean["Thứ hạng"] = df_clean["Tổng điểm"].rank(ascending=False, method="dense").astype(int)
+    # Khoảng tin cậy bootstrap cho P và D (tuỳ chọn)
+    if n_bootstrap > 0:
+        intervals = bootstrap_item_intervals(correct.unpack(), total_scores, n_bootstrap=n_bootstrap,
+                                             confidence=confidence, random_state=random_state)
+        result = attach_intervals(result, intervals, "Độ khó (P)", "Độ phân biệt")
 
-    # Chia nhóm cao / thấp (27% mỗi nhóm)
-    n = len(df_clean)
-    group_size = math.floor(n * 0.27)
-    df_clean = df_clean.sort_values(by="Thứ hạng").reset_index(drop=True)
-    df_clean.loc[:group_size-1, "Nhóm"] = "Cao"
-    df_clean.loc[n-group_size:, "Nhóm"] = "Thấp"
-    df_clean["Nhóm"].fillna("Trung bình", inplace=True)
+    return result
 
-    # Nhóm cao & thấp
-    high_group = df_clean[df_clean["Nhóm"] == "Cao"]
-    low_group = df_clean[df_clean["Nhóm"] == "Thấp"]
-    g = min(len(high_group), len(low_group))  # Số SV mỗi nhóm
 
-    results = []
-    total_students = df_clean.shape[0]
+def _question_stats_from_matrix(question_cols, correct: PackedResponses,
+                                high_idx: np.ndarray, low_idx: np.ndarray, rubric: Rubric = None) -> pd.DataFrame:
+    """Tính P, D cho toàn bộ câu hỏi từ ma trận đúng/sai nén bit (SV x câu)"""
+    total_students = correct.n_students
 
-    for i, col in enumerate(question_cols):
-        # Độ khó P: % sinh viên trả lời đúng
-        num_correct = (df_clean[col] > 0).sum()
-        P = round((num_correct / total_students) * 100, 2)
+    # Số SV đúng trên toàn bộ và trong từng nhóm: đếm bit trực tiếp trên dữ liệu nén
+    num_correct = correct.count()
+    gc = correct.count(high_idx)
+    gt = correct.count(low_idx)
+    g = min(len(high_idx), len(low_idx))  # Số SV mỗi nhóm
 
-        # Số SV đúng trong nhóm cao và thấp
-        gc = (high_group[col] > 0).sum()
-        gt = (low_group[col] > 0).sum()
+    return _question_table(question_cols, total_students, num_correct, gc, gt, g, rubric)
 
-        # Độ phân biệt D
-        D = round((gc - gt) / g, 2) if g > 0 else None
-        D_level = classify_discrimination(D) if D is not None else "Không xác định"
 
-        results.append({
-            "STT": i + 1,
-            "Câu hỏi": col,
-            "Tổng số SV": total_students,
-            "Số SV trả lời đúng": num_correct,
-            "Độ khó (P)": P,
-            "Mức độ": classify_difficulty(P),
-            "Số SV đúng - Nhóm cao": gc,
-            "Số SV đúng - Nhóm thấp": gt,
-            "Độ phân biệt": D,
-            "Mức độ phân biệt": D_level
-        })
+def _question_table(question_cols, total_students, num_correct, gc, gt, g, rubric: Rubric = None) -> pd.DataFrame:
+    """Dựng bảng kết quả trắc nghiệm từ các mảng đếm theo câu; P, D được phân loại cả mảng một lần"""
+    rubric = rubric or default_rubric()
+    # Độ khó P: % sinh viên trả lời đúng
+    if total_students > 0:
+        P = np.round(num_correct / total_students * 100, 2)
+    else:
+        P = np.full(len(question_cols), np.nan)
 
-    return pd.DataFrame(results)
\ No newline at end of file
+    # Độ phân biệt D
+    if g > 0:
+        D = np.round((gc - gt) / g, 2)
+        D_values = list(D)
+    else:
+        D_values = [None] * len(question_cols)
+    D_levels = rubric.discrimination(np.array(D_values, dtype=float))
+
+    return pd.DataFrame({
+        "STT": np.arange(1, len(question_cols) + 1),
+        "Câu hỏi": list(question_cols),
+        "Tổng số SV": total_students,
+        "Số SV trả lời đúng": num_correct,
+        "Độ khó (P)": P,
+        "Mức độ": rubric.difficulty(P),
+        "Số SV đúng - Nhóm cao": gc,
+        "Số SV đúng - Nhóm thấp": gt,
+        "Độ phân biệt": D_values,
+        "Mức độ phân biệt": D_levels
+    })
@@ -0,0 +1,135 @@
+import numpy as np
+from score_matrix import iter_row_blocks
+from rubric import default_rubric
+
+
+def classify_reliability(alpha: float, rubric=None) -> str:
+    """Phân loại độ tin cậy của đề thi dựa trên hệ số KR-20 / Cronbach's alpha (theo `rubric`)"""
+    return (rubric or default_rubric()).reliability.label(alpha)
+
+
+def reliability_analysis(scores: np.ndarray) -> dict:
+    """
+    Độ tin cậy toàn đề và theo từng câu từ một ma trận hiệp phương sai duy nhất
+
+    Với ma trận hiệp phương sai C của các câu (k x k), tổng điểm T có phương sai sum(C),
+    hiệp phương sai câu i với T là tổng hàng i của C. Từ đó suy ra trực tiếp:
+    - hệ số tin cậy: alpha = k/(k-1) * (1 - trace(C) / sum(C)); với dữ liệu 0/1 đây
+      chính là KR-20,
+    - tương quan câu - tổng hiệu chỉnh (câu i với tổng các câu còn lại),
+    - hệ số tin cậy nếu bỏ câu i,
+    không cần tính tương quan riêng cho từng câu.
+
+    Parameters:
+    -----------
+    scores : np.ndarray | PackedResponses
+        Ma trận điểm (SV x câu); ô trống được tính là 0 như khi cộng tổng điểm. Ma trận
+        được duyệt theo khối dòng nên không tạo bản sao float64 của toàn bộ ma trận
+
+    Returns:
+    --------
+    dict
+        "alpha" (toàn đề), "item_rest_corr" và "alpha_if_deleted" (mảng theo câu)
+    """
+    n, k = scores.shape
+    if n < 2 or k < 2:
+        return _empty_analysis(k)
+    return _analysis_from_covariance(_item_covariance(scores))
+
+
+def reliability_from_moments(n: int, sums: np.ndarray, cross: np.ndarray) -> dict:
+    """
+    Như reliability_analysis nhưng từ các đại lượng cộng dồn được: số SV `n`, tổng điểm
+    từng câu `sums` và ma trận tích chéo `cross` = sum(x xᵀ) (ô trống tính là 0)
+
+    Dùng cho bộ tích luỹ theo đợt (incremental_stats): các đại lượng này gộp được bằng
+    phép cộng nên không cần giữ lại ma trận điểm.
+    """
+    k = len(sums)
+    if n < 2 or k < 2:
+        return _empty_analysis(k)
+    cov = (cross - np.outer(sums, sums) / n) / (n - 1)
+    return _analysis_from_covariance(cov)
+
+
+def _empty_analysis(k: int) -> dict:
+    nan_items = np.full(k, np.nan)
+    return {"alpha": np.nan, "item_rest_corr": nan_items, "alpha_if_deleted": nan_items}
+
+
+def _analysis_from_covariance(cov: np.ndarray) -> dict:
+    """Hệ số tin cậy toàn đề và theo từng câu từ ma trận hiệp phương sai các câu"""
+    k = cov.shape[0]
+    item_var = np.diag(cov)
+    item_total_cov = cov.sum(axis=1)
+    total_var = item_total_cov.sum()
+    sum_item_var = item_var.sum()
+
+    # Phần còn lại khi bỏ câu i: Var(T - X_i) và Cov(X_i, T - X_i)
+    rest_var = total_var - 2 * item_total_cov + item_var
+    rest_cov = item_total_cov - item_var
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        alpha = k / (k - 1) * (1 - sum_item_var / total_var) if total_var > 0 else np.nan
+        item_rest_corr = rest_cov / np.sqrt(item_var * rest_var)
+        if k > 2:
+            alpha_if_deleted = (k - 1) / (k - 2) * (1 - (sum_item_var - item_var) / rest_var)
+        else:
+            alpha_if_deleted = np.full(k, np.nan)
+
+    item_rest_corr = np.where(np.isfinite(item_rest_corr), item_rest_corr, np.nan)
+    alpha_if_deleted = np.where(np.isfinite(alpha_if_deleted), alpha_if_deleted, np.nan)
+    return {"alpha": alpha, "item_rest_corr": item_rest_corr, "alpha_if_deleted": alpha_if_deleted}
+
+
+def _item_covariance(scores) -> np.ndarray:
+    """Ma trận hiệp phương sai các câu, tính hai lượt theo khối dòng (trung bình, rồi tích chéo)"""
+    n, k = scores.shape
+    sums = np.zeros(k)
+    for block in iter_row_blocks(scores):
+        sums += np.nansum(block, axis=0, dtype=np.float64)
+    mean = sums / n
+
+    cross = np.zeros((k, k))
+    for block in iter_row_blocks(scores):
+        centered = np.nan_to_num(np.asarray(block, dtype=np.float64)) - mean
+        cross += centered.T @ centered
+    return cross / (n - 1)
+
+
+def attach_reliability(result_df, scores: np.ndarray, method: str, rubric=None):
+    """
+    Thêm cột tương quan câu - tổng hiệu chỉnh, hệ số tin cậy nếu bỏ câu vào bảng kết quả
+    và lưu độ tin cậy toàn đề vào result_df.attrs["reliability"]
+
+    Parameters:
+    -----------
+    result_df : pd.DataFrame
+        Bảng kết quả theo câu (cùng thứ tự với các cột của `scores`)
+    scores : np.ndarray | PackedResponses
+        Ma trận điểm (SV x câu)
+    method : str
+        Tên hệ số hiển thị ("KR-20" hoặc "Cronbach's alpha")
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại mức độ tin cậy (mặc định default_rubric())
+    """
+    return attach_reliability_analysis(result_df, reliability_analysis(scores), method, rubric)
+
+
+def attach_reliability_analysis(result_df, analysis: dict, method: str, rubric=None):
+    """Như attach_reliability, với kết quả đã tính (reliability_analysis / reliability_from_moments)"""
+    result_df["Tương quan câu - tổng (hiệu chỉnh)"] = np.round(analysis["item_rest_corr"], 2)
+    result_df["Hệ số tin cậy nếu bỏ câu"] = np.round(analysis["alpha_if_deleted"], 3)
+    result_df.attrs["reliability"] = reliability_summary(analysis["alpha"], method, len(analysis["item_rest_corr"]),
+                                                         rubric)
+    return result_df
+
+
+def reliability_summary(alpha: float, method: str, n_items: int, rubric=None) -> dict:
+    """Thông tin độ tin cậy toàn đề dùng cho phần đánh giá tổng quan"""
+    return {
+        "Hệ số tin cậy": method,
+        "Giá trị": round(float(alpha), 3) if not np.isnan(alpha) else None,
+        "Số câu": int(n_items),
+        "Mức độ tin cậy": classify_reliability(alpha, rubric),
+    }
@@ -0,0 +1,101 @@
+import math
+from io import BytesIO
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from rubric import default_rubric
+
+# Bảng màu nền từ tốt nhất đến kém nhất, trải đều lên các nhãn của bộ tiêu chí
+_LEVEL_COLORS = ("C6EFCE", "E2EFDA", "FFEB9C", "FCD5B4", "FFC7CE")
+
+
+def level_fills(rubric=None) -> dict:
+    """Màu nền của cột "Mức độ" / "Mức độ phân biệt" theo nhãn của bộ tiêu chí (nhãn đầu là tốt nhất)"""
+    rubric = rubric or default_rubric()
+
+    def spread(labels):
+        last, steps = len(_LEVEL_COLORS) - 1, max(len(labels) - 1, 1)
+        # Làm tròn lên: nhãn đầu luôn xanh, nhãn cuối luôn đỏ
+        return {label: _LEVEL_COLORS[min(-(-i * last // steps), last)] for i, label in enumerate(labels)}
+
+    return {
+        "Mức độ": spread(rubric.difficulty.labels),
+        "Mức độ phân biệt": spread(rubric.discrimination.labels),
+    }
+
+
+def convert_to_excel(result_df, summary_df, conclusion, disc_info, students_df=None, rubric=None) -> bytes:
+    """
+    Xuất kết quả phân tích ra file Excel bằng workbook ghi tuần tự (write-only)
+    
+    Chỉ dùng lại các bảng đã tính: bảng kết quả từng câu, bảng cơ cấu độ khó, kết luận,
+    thống kê độ phân biệt / độ tin cậy và (nếu có) tổng điểm, thứ hạng, nhóm của từng SV.
+    Các dòng được ghi thẳng ra file nên bộ nhớ không tăng theo số SV. Cột "Mức độ" và
+    "Mức độ phân biệt" được tô màu bằng định dạng có điều kiện theo nhãn của `rubric`
+    (mặc định default_rubric()).
+    
+    Returns:
+    --------
+    bytes
+        Nội dung file .xlsx
+    """
+    wb = Workbook(write_only=True)
+
+    # Sheet 1: kết quả từng câu
+    ws = wb.create_sheet("Kết quả từng câu")
+    ws.freeze_panes = "A2"
+    _append_frame(ws, result_df)
+    for col_name, fills in level_fills(rubric).items():
+        if col_name in result_df.columns and len(result_df):
+            letter = get_column_letter(result_df.columns.get_loc(col_name) + 1)
+            cell_range = f"{letter}2:{letter}{len(result_df) + 1}"
+            for level, color in fills.items():
+                ws.conditional_formatting.add(cell_range, CellIsRule(
+                    operator="equal", formula=[f'"{level}"'],
+                    fill=PatternFill(start_color=color, end_color=color, fill_type="solid")
+                ))
+
+    # Sheet 2: đánh giá tổng quan
+    ws = wb.create_sheet("Đánh giá tổng quan")
+    _append_frame(ws, summary_df)
+    ws.append([])
+    if disc_info:
+        ws.append([_bold(ws, "Thống kê độ phân biệt và độ tin cậy")])
+        for key, value in disc_info.items():
+            ws.append([key, _cell_value(value)])
+        ws.append([])
+    ws.append([_bold(ws, "Kết luận"), conclusion])
+
+    # Sheet 3: tổng điểm, thứ hạng, nhóm của từng sinh viên
+    if students_df is not None:
+        ws = wb.create_sheet("Sinh viên")
+        ws.freeze_panes = "A2"
+        _append_frame(ws, students_df)
+
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def _append_frame(ws, df):
+    """Ghi DataFrame (dòng tiêu đề in đậm + dữ liệu) vào sheet write-only"""
+    ws.append([_bold(ws, str(col)) for col in df.columns])
+    for values in df.itertuples(index=False, name=None):
+        ws.append([_cell_value(val) for val in values])
+
+
+def _bold(ws, value):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.font = Font(bold=True)
+    return cell
+
+
+def _cell_value(value):
+    """Giá trị ghi được vào ô Excel: NaN / None thành ô trống"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, "item"):
+        return value.item()
+    return value
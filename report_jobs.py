@@ -0,0 +1,53 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from result_cache import LRUCache
+
+# Luồng nền tạo báo cáo, dùng chung cho mọi phiên của tiến trình Streamlit
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report")
+
+# Các tác vụ tạo báo cáo theo khoá đầu vào (loại báo cáo, mã băm file, loại đề, tham số...)
+_jobs = LRUCache(maxsize=64)
+# Thời gian tạo (giây) của các báo cáo đã xong, theo cùng khoá
+_durations = LRUCache(maxsize=64)
+_submit_lock = threading.Lock()
+
+
+def submit_report(key, render):
+    """
+    Tạo báo cáo ở luồng nền, mỗi khoá đầu vào chỉ tạo một lần
+    
+    Nếu đã có tác vụ (đang chạy hoặc đã xong) cho cùng khoá thì trả lại tác vụ đó; tác vụ
+    lỗi sẽ được chạy lại ở lần gọi sau.
+    
+    Parameters:
+    -----------
+    key : hashable
+        Khoá đầu vào của báo cáo
+    render : callable
+        Hàm không tham số trả về nội dung file (bytes)
+        
+    Returns:
+    --------
+    concurrent.futures.Future
+        Tác vụ tạo báo cáo; .done() cho biết đã xong, .result() trả về nội dung file
+    """
+    with _submit_lock:
+        job = _jobs.get(key)
+        if job is None or (job.done() and job.exception() is not None):
+            job = _executor.submit(_timed, key, render)
+            _jobs.put(key, job)
+        return job
+
+
+def report_seconds(key):
+    """Thời gian tạo (giây) của báo cáo theo khoá, None nếu chưa tạo xong"""
+    return _durations.get(key)
+
+
+def _timed(key, render):
+    """Chạy hàm tạo báo cáo và ghi lại thời gian tạo"""
+    start = time.perf_counter()
+    data = render()
+    _durations.put(key, time.perf_counter() - start)
+    return data
@@ -0,0 +1,262 @@
+import re
+from io import BytesIO
+from xml.sax.saxutils import escape
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from lxml import etree
+from rubric import default_rubric
+
+# Ký tự điều khiển không hợp lệ trong XML (trừ tab / xuống dòng)
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def add_dataframe_table(doc, df, style='Table Grid'):
+    """
+    Thêm bảng Word chứa toàn bộ DataFrame (dòng tiêu đề + dữ liệu)
+    
+    Dòng tiêu đề được tạo như bình thường; toàn bộ các dòng dữ liệu được sinh thành
+    XML trong một lượt, phân tích một lần và gắn vào bảng bằng một thao tác duy nhất,
+    thay vì gọi add_row() và truy cập .cells cho từng dòng (python-docx duyệt lại XML
+    của bảng ở mỗi lần gọi nên chi phí tăng theo bình phương số dòng).
+    """
+    table = doc.add_table(rows=1, cols=len(df.columns))
+    table.style = style
+
+    # Header
+    header_cells = table.rows[0].cells
+    for i, col in enumerate(df.columns):
+        header_cells[i].text = str(col)
+
+    # Data: dùng lại thuộc tính ô (độ rộng cột) của dòng tiêu đề cho mọi ô dữ liệu
+    tc_props = [
+        etree.tostring(cell._tc.tcPr, encoding="unicode") if cell._tc.tcPr is not None else ""
+        for cell in header_cells
+    ]
+    rows_xml = []
+    for values in df.itertuples(index=False, name=None):
+        cells_xml = "".join(
+            f"<w:tc>{props}<w:p><w:r>{_run_text_xml(val)}</w:r></w:p></w:tc>"
+            for props, val in zip(tc_props, values)
+        )
+        rows_xml.append(f"<w:tr>{cells_xml}</w:tr>")
+
+    if rows_xml:
+        parsed = parse_xml(f"<w:tbl {nsdecls('w')}>{''.join(rows_xml)}</w:tbl>")
+        table._tbl.extend(parsed.findall(qn("w:tr")))
+    return table
+
+
+def _run_text_xml(value) -> str:
+    """XML nội dung của một run cho giá trị ô (giống cell.text = str(value))"""
+    text = _INVALID_XML_CHARS.sub("", str(value))
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            parts.append("<w:br/>")
+        for j, chunk in enumerate(line.split("\t")):
+            if j:
+                parts.append("<w:tab/>")
+            if chunk:
+                parts.append(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>')
+    return "".join(parts)
+
+
+def convert_mc_to_word(result_df, summary_df, conclusion, disc_info, distractor_df=None):
+    """Tạo báo cáo Word cho đề trắc nghiệm (kèm phân tích phương án nhiễu nếu có), trả về nội dung file .docx"""
+    doc = Document()
+
+    # Tiêu đề
+    title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ ĐỘ KHÓ ĐỀ THI TRẮC NGHIỆM', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Kết quả từng câu
+    doc.add_heading('1. Kết quả tính độ khó từng câu', level=1)
+
+    # Thêm bảng kết quả
+    add_dataframe_table(doc, result_df)
+
+    doc.add_page_break()
+
+    # Đánh giá tổng quan
+    doc.add_heading('2. Đánh giá tổng quan đề thi', level=1)
+
+    # Cơ cấu độ khó
+    doc.add_heading('2.1. Cơ cấu độ khó so với mục tiêu', level=2)
+
+    # Thêm bảng summary
+    add_dataframe_table(doc, summary_df)
+
+    doc.add_paragraph()
+
+    # Thống kê độ phân biệt
+    if disc_info:
+        doc.add_heading('2.2. Thống kê độ phân biệt và độ tin cậy', level=2)
+        for key, value in disc_info.items():
+            doc.add_paragraph(f'{key}: {value}')
+
+    doc.add_paragraph()
+
+    # Phân tích phương án nhiễu (khi dữ liệu là phương án A/B/C/D + đáp án)
+    if distractor_df is not None:
+        doc.add_heading('2.3. Phân tích phương án nhiễu', level=2)
+        doc.add_paragraph(
+            'Số SV chọn từng phương án theo nhóm cao / giữa / thấp (27% mỗi nhóm cao, thấp). '
+            'Độ phân biệt phương án = (nhóm cao - nhóm thấp) / số SV mỗi nhóm: '
+            'đáp án đúng nên dương, phương án nhiễu tốt nên âm.'
+        )
+        attract_high = distractor_df[distractor_df['Đánh giá'] == 'Nhiễu thu hút nhóm cao']
+        if len(attract_high):
+            doc.add_paragraph(
+                'Phương án nhiễu thu hút nhóm cao (cần xem lại): '
+                + ', '.join(f"{q} ({o})" for q, o in zip(attract_high['Câu hỏi'], attract_high['Phương án']))
+            )
+        add_dataframe_table(doc, distractor_df)
+        doc.add_paragraph()
+
+    # Kết luận
+    doc.add_heading('3. Kết luận', level=1)
+    conclusion_para = doc.add_paragraph(conclusion)
+    conclusion_para.runs[0].bold = True
+
+    # Lưu vào BytesIO
+    output = BytesIO()
+    doc.save(output)
+    output.seek(0)
+    return output.getvalue()
+
+
+def convert_essay_to_word(result_df, summary_df, conclusion, disc_info, max_scores_df=None, rubric=None):
+    """Tạo báo cáo Word cho đề tự luận, trả về nội dung file .docx"""
+    rubric = rubric or default_rubric()
+    doc = Document()
+
+    # Tiêu đề
+    title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ ĐỘ KHÓ ĐỀ THI TỰ LUẬN', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Kết quả từng câu
+    doc.add_heading('1. Kết quả tính độ khó từng câu', level=1)
+
+    # Thêm bảng kết quả
+    add_dataframe_table(doc, result_df)
+
+    # Điểm tối đa nếu có
+    if max_scores_df is not None:
+        doc.add_paragraph()
+        doc.add_heading('1.1. Điểm tối đa từng câu', level=2)
+        add_dataframe_table(doc, max_scores_df)
+
+    doc.add_page_break()
+
+    # Đánh giá tổng quan
+    doc.add_heading('2. Đánh giá tổng quan đề thi', level=1)
+
+    # Cơ cấu độ khó
+    doc.add_heading('2.1. Cơ cấu độ khó so với mục tiêu', level=2)
+
+    # Thêm bảng summary
+    add_dataframe_table(doc, summary_df)
+
+    doc.add_paragraph()
+
+    # Thống kê độ phân biệt
+    if disc_info:
+        doc.add_heading('2.2. Thống kê độ phân biệt và độ tin cậy', level=2)
+        for key, value in disc_info.items():
+            doc.add_paragraph(f'{key}: {value}')
+
+    doc.add_paragraph()
+
+    # Giải thích cách tính
+    doc.add_heading('2.3. Giải thích cách tính', level=2)
+    doc.add_paragraph('Độ khó (P):')
+    doc.add_paragraph('• Công thức: P = (Điểm TB của tất cả SV / Điểm tối đa) × 100', style='List Bullet')
+    doc.add_paragraph('• Điểm tối đa lấy từ sheet 2 hoặc điểm cao nhất thực tế', style='List Bullet')
+
+    doc.add_paragraph('Độ phân biệt (D):')
+    doc.add_paragraph('• Công thức: D = (Điểm TB nhóm cao - Điểm TB nhóm thấp) / Điểm tối đa',
+                      style='List Bullet')
+    for line in rubric.discrimination.describe("D"):
+        doc.add_paragraph(f'• {line}', style='List Bullet')
+
+    doc.add_paragraph()
+
+    # Kết luận
+    doc.add_heading('3. Kết luận', level=1)
+    conclusion_para = doc.add_paragraph(conclusion)
+    conclusion_para.runs[0].bold = True
+
+    # Lưu vào BytesIO
+    output = BytesIO()
+    doc.save(output)
+    output.seek(0)
+    return output.getvalue()
+
+
+def convert_mix_to_word(all_results, summary_df, conclusion, disc_info):
+    """Tạo báo cáo Word cho đề hỗn hợp, trả về nội dung file .docx"""
+    doc = Document()
+
+    # Tiêu đề
+    title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ ĐỀ HỖN HỢP', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Kết quả từng câu
+    doc.add_heading('1. Kết quả từng câu hỏi', level=1)
+    add_dataframe_table(doc, all_results)
+
+    doc.add_page_break()
+
+    # Đánh giá tổng quan
+    doc.add_heading('2. Đánh giá tổng quan đề thi', level=1)
+
+    # Cơ cấu độ khó
+    doc.add_heading('2.1. Cơ cấu độ khó so với mục tiêu', level=2)
+
+    # Thêm bảng summary
+    add_dataframe_table(doc, summary_df)
+
+    doc.add_paragraph()
+
+    # Thống kê độ phân biệt
+    if disc_info:
+        doc.add_heading('2.2. Thống kê độ phân biệt và độ tin cậy', level=2)
+        for key, value in disc_info.items():
+            doc.add_paragraph(f'{key}: {value}')
+
+    doc.add_paragraph()
+
+    # Thống kê theo loại câu
+    doc.add_heading('2.3. Thống kê theo loại câu hỏi', level=2)
+
+    mc_rows = all_results[all_results['Loại câu'] == 'Trắc nghiệm']
+    essay_rows = all_results[all_results['Loại câu'] == 'Tự luận']
+
+    doc.add_paragraph('Trắc nghiệm:')
+    if not mc_rows.empty and 'Độ khó (P)' in mc_rows.columns:
+        doc.add_paragraph(f'• Số câu: {len(mc_rows)}', style='List Bullet')
+        doc.add_paragraph(f'• Độ khó TB: {mc_rows["Độ khó (P)"].mean():.2f}', style='List Bullet')
+        if 'Độ phân biệt (D)' in mc_rows.columns:
+            doc.add_paragraph(f'• Độ phân biệt TB: {mc_rows["Độ phân biệt (D)"].mean():.3f}', style='List Bullet')
+
+    doc.add_paragraph('Tự luận:')
+    if not essay_rows.empty and 'Độ khó (P)' in essay_rows.columns:
+        doc.add_paragraph(f'• Số câu: {len(essay_rows)}', style='List Bullet')
+        doc.add_paragraph(f'• Độ khó TB: {essay_rows["Độ khó (P)"].mean():.2f}', style='List Bullet')
+        if 'Độ phân biệt (D)' in essay_rows.columns:
+            doc.add_paragraph(f'• Độ phân biệt TB: {essay_rows["Độ phân biệt (D)"].mean():.3f}', style='List Bullet')
+
+    doc.add_paragraph()
+
+    # Kết luận
+    doc.add_heading('3. Kết luận', level=1)
+    conclusion_para = doc.add_paragraph(conclusion)
+    conclusion_para.runs[0].bold = True
+
+    # Lưu file
+    output = BytesIO()
+    doc.save(output)
+    output.seek(0)
+    return output.getvalue()
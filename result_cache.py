@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bộ nhớ đệm có giới hạn số phần tử, loại bỏ phần tử ít được dùng gần đây nhất (LRU)
+    
+    An toàn khi dùng đồng thời từ nhiều luồng, nên một thể hiện ở cấp module được
+    chia sẻ giữa mọi phiên trình duyệt của cùng một tiến trình Streamlit. Giá trị
+    trả về được dùng chung, nơi gọi không được sửa trực tiếp.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Lấy giá trị theo khoá và đánh dấu là vừa được dùng"""
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        """Lưu giá trị, loại bỏ phần tử cũ nhất nếu vượt quá giới hạn"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Trả về giá trị đã lưu hoặc gọi compute() rồi lưu lại kết quả"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        # Tính toán ngoài khoá để không chặn các phiên khác
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+# Bộ nhớ đệm kết quả dùng chung: khoá gồm (loại kết quả, mã băm file, loại đề, tham số...)
+shared_results = LRUCache(maxsize=128)
+
+
+def cached_result(key, compute):
+    """Lấy kết quả từ bộ nhớ đệm dùng chung hoặc tính mới"""
+    return shared_results.get_or_compute(key, compute)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+
+import numpy as np
+
+MISSING_LABEL = "Không xác định"
+
+
+@dataclass(frozen=True)
+class Classifier:
+    """
+    Bộ phân loại theo ngưỡng, áp dụng cho cả mảng giá trị một lần (np.digitize)
+
+    `thresholds` giảm dần; giá trị >= thresholds[i] (và nhỏ hơn ngưỡng trước đó) nhận
+    labels[i], giá trị nhỏ hơn mọi ngưỡng nhận labels[-1], NaN / None nhận `missing`.
+    """
+    thresholds: tuple
+    labels: tuple
+    missing: str = MISSING_LABEL
+
+    def __post_init__(self):
+        if len(self.labels) != len(self.thresholds) + 1:
+            raise ValueError("Số nhãn phải bằng số ngưỡng + 1")
+        if any(a <= b for a, b in zip(self.thresholds, self.thresholds[1:])):
+            raise ValueError(f"Các ngưỡng phải giảm dần: {list(self.thresholds)}")
+
+    @cached_property
+    def _bins(self):
+        # np.digitize cần ngưỡng tăng dần; nhãn được đảo tương ứng, thêm nhãn NaN ở cuối
+        return (np.array(self.thresholds[::-1], dtype=float),
+                np.array(list(self.labels[::-1]) + [self.missing], dtype=object))
+
+    def __call__(self, values) -> np.ndarray:
+        """Nhãn của từng giá trị (mảng object cùng kích thước)"""
+        bins, labels = self._bins
+        values = np.asarray(values, dtype=float)
+        index = np.digitize(values, bins)
+        index[np.isnan(values)] = len(labels) - 1
+        return labels[index]
+
+    def label(self, value) -> str:
+        """Nhãn của một giá trị"""
+        return self([np.nan if value is None else value])[0]
+
+    def describe(self, symbol: str) -> list:
+        """Diễn giải các khoảng, ví dụ ["D ≥ 0.4: Rất tốt", "0.3 ≤ D < 0.4: Tốt", ...]"""
+        lines = [f"{symbol} ≥ {self.thresholds[0]:g}: {self.labels[0]}"] if self.thresholds else []
+        for upper, lower, label in zip(self.thresholds, self.thresholds[1:], self.labels[1:]):
+            lines.append(f"{lower:g} ≤ {symbol} < {upper:g}: {label}")
+        if self.thresholds:
+            lines.append(f"{symbol} < {self.thresholds[-1]:g}: {self.labels[-1]}")
+        return lines
+
+
+@dataclass(frozen=True)
+class Rubric:
+    """
+    Bộ tiêu chí đánh giá: ngưỡng phân loại P, D, độ tin cậy toàn đề và chuẩn cơ cấu đề
+
+    Dùng chung cho mọi bộ xử lý (trắc nghiệm, tự luận, hỗn hợp, tích luỹ theo lô) và
+    evaluate_exam_difficulty_mix. `mix_groups` gộp các mức độ khó vào nhóm của
+    `target_mix` (mặc định "Rất khó" tính là "Khó"); `reliability` phân loại hệ số
+    KR-20 / Cronbach's alpha.
+    """
+    name: str = "Mặc định"
+    difficulty: Classifier = Classifier((80, 60, 40), ("Dễ", "Trung bình", "Khó", "Rất khó"))
+    discrimination: Classifier = Classifier(
+        (0.4, 0.3, 0.2, 0), ("Rất tốt", "Tốt", "Chấp nhận được", "Kém", "Không đạt / âm")
+    )
+    reliability: Classifier = Classifier(
+        (0.9, 0.8, 0.7, 0.6), ("Rất tốt", "Tốt", "Chấp nhận được", "Cần xem xét", "Kém")
+    )
+    mix_groups: dict = field(default_factory=lambda: {"Rất khó": "Khó"})
+    target_mix: dict = field(default_factory=lambda: {"Dễ": 0.50, "Trung bình": 0.30, "Khó": 0.20})
+    tolerance: float = 0.05
+    good_D: float = 0.2
+    min_good_D_share: float = 0.60
+    max_negative_D_share: float = 0.10
+
+    def __post_init__(self):
+        grouped = {self.mix_groups.get(label, label) for label in self.difficulty.labels}
+        unknown = set(self.target_mix) - grouped
+        if unknown:
+            raise ValueError(f"Nhóm trong target_mix không khớp với nhãn độ khó: {sorted(unknown)}")
+
+    def mix_group(self, levels) -> np.ndarray:
+        """Nhóm cơ cấu (theo target_mix) của các nhãn độ khó"""
+        return np.array([self.mix_groups.get(level, level) for level in levels], dtype=object)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "difficulty": {"thresholds": list(self.difficulty.thresholds), "labels": list(self.difficulty.labels)},
+            "discrimination": {"thresholds": list(self.discrimination.thresholds),
+                               "labels": list(self.discrimination.labels)},
+            "reliability": {"thresholds": list(self.reliability.thresholds), "labels": list(self.reliability.labels)},
+            "mix_groups": dict(self.mix_groups),
+            "target_mix": dict(self.target_mix),
+            "tolerance": self.tolerance,
+            "good_D": self.good_D,
+            "min_good_D_share": self.min_good_D_share,
+            "max_negative_D_share": self.max_negative_D_share,
+        }
+
+    @cached_property
+    def key(self) -> str:
+        """Mã băm nội dung bộ tiêu chí, dùng trong khoá bộ nhớ đệm kết quả"""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:16]
+
+    def __hash__(self):
+        return hash(self.key)
+
+
+DEFAULT_RUBRIC = Rubric()
+
+
+def rubric_from_dict(config: dict) -> Rubric:
+    """
+    Dựng bộ tiêu chí từ cấu hình; mục không khai báo lấy theo bộ mặc định
+
+    Ví dụ cấu hình (JSON) của một khoa:
+        {"name": "Khoa CNTT",
+         "difficulty": {"thresholds": [75, 55, 35], "labels": ["Dễ", "Trung bình", "Khó", "Rất khó"]},
+         "target_mix": {"Dễ": 0.4, "Trung bình": 0.4, "Khó": 0.2}}
+    """
+    base = DEFAULT_RUBRIC.to_dict()
+    unknown = set(config) - set(base)
+    if unknown:
+        raise ValueError(f"Mục cấu hình không hợp lệ: {sorted(unknown)}")
+    merged = {**base, **config}
+
+    def classifier(entry):
+        return Classifier(tuple(float(t) for t in entry["thresholds"]), tuple(entry["labels"]))
+
+    return Rubric(
+        name=merged["name"],
+        difficulty=classifier(merged["difficulty"]),
+        discrimination=classifier(merged["discrimination"]),
+        reliability=classifier(merged["reliability"]),
+        mix_groups=dict(merged["mix_groups"]),
+        target_mix={k: float(v) for k, v in merged["target_mix"].items()},
+        tolerance=float(merged["tolerance"]),
+        good_D=float(merged["good_D"]),
+        min_good_D_share=float(merged["min_good_D_share"]),
+        max_negative_D_share=float(merged["max_negative_D_share"]),
+    )
+
+
+def load_rubric(path: str) -> Rubric:
+    """Đọc bộ tiêu chí từ file JSON"""
+    with open(path, encoding="utf-8") as f:
+        return rubric_from_dict(json.load(f))
+
+
+@lru_cache(maxsize=1)
+def _rubric_from_env(path: str) -> Rubric:
+    return load_rubric(path) if path else DEFAULT_RUBRIC
+
+
+def default_rubric() -> Rubric:
+    """Bộ tiêu chí đang dùng: file trong biến môi trường EXAM_RUBRIC, nếu không có là bộ mặc định"""
+    return _rubric_from_env(os.environ.get("EXAM_RUBRIC", ""))
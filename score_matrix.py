@@ -0,0 +1,314 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+# Số dòng đọc vào mỗi khối khi đọc tuần tự (bội số của 8 để nén bit theo khối)
+_CHUNK_ROWS = 4096
+
+# Số bit 1 của từng giá trị byte (popcount theo bảng tra)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@dataclass
+class ScoreMatrix:
+    """
+    Dạng biểu diễn gọn của bảng điểm sau khi lọc STT hợp lệ
+
+    Ma trận điểm được giữ ở dạng gọn nhất không làm mất thông tin: float32 nếu biểu
+    diễn chính xác mọi điểm (compact_scores), và với bảng điểm trắc nghiệm chỉ gồm 0 / 1
+    thì nén bit (PackedResponses, ô trống tính là sai), nhỏ hơn 64 lần so với float64.
+
+    Attributes:
+    -----------
+    question_cols : list
+        Tên các cột câu hỏi ("Câu ...") theo thứ tự trong sheet
+    scores : np.ndarray | PackedResponses
+        Ma trận điểm (SV x câu), ô trống là NaN; hoặc ma trận đúng / sai nén bit
+    stt : np.ndarray
+        STT của từng sinh viên tương ứng với các hàng của `scores`
+    """
+    question_cols: list
+    scores: np.ndarray
+    stt: np.ndarray
+
+    @property
+    def n_students(self) -> int:
+        return self.scores.shape[0]
+
+    def dense(self) -> np.ndarray:
+        """Ma trận điểm float64 đầy đủ (giải nén nếu đang nén bit: ô trống thành 0)"""
+        if isinstance(self.scores, PackedResponses):
+            return self.scores.unpack().astype(np.float64)
+        return np.asarray(self.scores, dtype=np.float64)
+
+    def head(self, n: int = 5) -> "ScoreMatrix":
+        """n SV đầu tiên (xem trước bảng điểm lớn mà không giải nén / sao chép cả ma trận)"""
+        if isinstance(self.scores, PackedResponses):
+            scores = self.scores.unpack(0, n)
+        else:
+            scores = self.scores[:n]
+        return ScoreMatrix(self.question_cols, scores, self.stt[:n])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Chuyển về DataFrame dạng sheet điểm (STT + các cột câu hỏi)"""
+        df = pd.DataFrame(self.dense(), columns=self.question_cols)
+        df.insert(0, "STT", self.stt)
+        return df
+
+
+@dataclass
+class PackedResponses:
+    """
+    Ma trận đúng / sai (SV x câu) nén bit: mỗi byte chứa kết quả của 8 SV trong một câu
+
+    Chiếm 1/64 bộ nhớ so với ma trận điểm float64. Số SV trả lời đúng (toàn bộ hoặc
+    trong một nhóm SV) được đếm trực tiếp trên dữ liệu nén bằng popcount.
+
+    Attributes:
+    -----------
+    bits : np.ndarray
+        Mảng uint8 kích thước (ceil(SV / 8), câu), nén theo chiều SV
+    n_students : int
+        Số SV (số hàng trước khi nén)
+    """
+    bits: np.ndarray
+    n_students: int
+
+    @classmethod
+    def from_scores(cls, scores: np.ndarray) -> "PackedResponses":
+        """Nén ma trận điểm thành đúng / sai (điểm > 0) theo từng khối dòng (đã nén thì trả lại nguyên)"""
+        if isinstance(scores, PackedResponses):
+            return scores
+        n, k = scores.shape
+        if n == 0:
+            return cls(np.empty((0, k), dtype=np.uint8), 0)
+        blocks = [np.packbits(scores[start:start + _CHUNK_ROWS] > 0, axis=0)
+                  for start in range(0, n, _CHUNK_ROWS)]
+        return cls(np.concatenate(blocks) if len(blocks) > 1 else blocks[0], n)
+
+    @property
+    def shape(self) -> tuple:
+        return self.n_students, self.bits.shape[1]
+
+    def count(self, rows: np.ndarray = None) -> np.ndarray:
+        """Số SV trả lời đúng của từng câu, trên toàn bộ hoặc chỉ các SV có chỉ số `rows`"""
+        bits = self.bits
+        if rows is not None:
+            mask = np.zeros(self.n_students, dtype=bool)
+            mask[rows] = True
+            bits = bits & np.packbits(mask)[:, None]
+        return _POPCOUNT[bits].sum(axis=0, dtype=np.int64)
+
+    def unpack(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """Giải nén các dòng [start, stop) thành ma trận bool (start là bội số của 8)"""
+        stop = self.n_students if stop is None else min(stop, self.n_students)
+        block = self.bits[start // 8:(stop + 7) // 8]
+        return np.unpackbits(block, axis=0, count=stop - start).astype(bool)
+
+
+def iter_row_blocks(values, rows: int = _CHUNK_ROWS):
+    """Duyệt ma trận (SV x câu) theo từng khối dòng; PackedResponses được giải nén từng khối"""
+    n = values.shape[0]
+    for start in range(0, n, rows):
+        if isinstance(values, PackedResponses):
+            yield values.unpack(start, start + rows)
+        else:
+            yield values[start:start + rows]
+
+
+def row_totals(scores: np.ndarray) -> np.ndarray:
+    """Tổng điểm (float64) của từng SV, bỏ qua ô trống, tính theo khối dòng"""
+    totals = [np.nansum(block, axis=1, dtype=np.float64) for block in iter_row_blocks(scores)]
+    return np.concatenate(totals) if totals else np.zeros(0)
+
+
+def compact_scores(scores: np.ndarray) -> np.ndarray:
+    """Chuyển ma trận điểm sang float32 nếu không làm thay đổi giá trị nào (điểm 0.25, 0.5...)"""
+    if scores.dtype == np.float32:
+        return scores
+    compact = scores.astype(np.float32)
+    with np.errstate(invalid="ignore"):
+        exact = np.array_equal(compact, scores, equal_nan=True)
+    return compact if exact else scores
+
+
+def compact_matrix(scores: np.ndarray, binary: bool = False):
+    """
+    Dạng lưu gọn của ma trận điểm: nén bit nếu `binary` và mọi điểm là 0 / 1 / ô trống
+    (bảng điểm trắc nghiệm), nếu không thì compact_scores
+    """
+    if isinstance(scores, PackedResponses):
+        return scores
+    if binary and all(np.isin(block[~np.isnan(block)], (0, 1)).all() for block in iter_row_blocks(scores)):
+        return PackedResponses.from_scores(scores)
+    return compact_scores(scores)
+
+
+def as_score_matrix(df, binary: bool = False) -> ScoreMatrix:
+    """
+    Chuẩn hoá dữ liệu đầu vào của các hàm thống kê về ScoreMatrix (dạng lưu gọn)
+
+    Nhận DataFrame (sheet điểm như đọc bằng pandas) hoặc ScoreMatrix đã có sẵn.
+    Với DataFrame: chỉ giữ các dòng có STT là số, lấy các cột bắt đầu bằng "Câu".
+    `binary=True` cho bảng điểm trắc nghiệm (ô trống là sai): điểm chỉ gồm 0 / 1 được
+    nén bit.
+    """
+    if isinstance(df, ScoreMatrix):
+        if not binary or isinstance(df.scores, PackedResponses):
+            return df
+        return ScoreMatrix(df.question_cols, compact_matrix(df.scores, binary), df.stt)
+
+    # Kiểm tra STT
+    if 'STT' in df.columns:
+        stt = df['STT']
+    else:
+        stt = pd.Series(range(1, len(df) + 1), index=df.index)
+
+    # Lọc hợp lệ (chỉ tạo mặt nạ, không sao chép bảng sinh viên)
+    valid_rows = stt.apply(lambda x: str(x).isdigit()).to_numpy(dtype=bool)
+
+    # Các cột câu hỏi
+    question_cols = [col for col in df.columns if col.startswith("Câu")]
+
+    # Ma trận điểm (SV x câu) - chuyển đổi một lần duy nhất rồi giữ ở dạng gọn
+    scores = df.loc[valid_rows, question_cols].to_numpy(dtype=float)
+    return ScoreMatrix(question_cols, compact_matrix(scores, binary), stt.to_numpy()[valid_rows])
+
+
+def read_score_matrix(source, sheet_name=0, dtype=None) -> ScoreMatrix:
+    """
+    Đọc tuần tự một sheet điểm ở chế độ read-only của openpyxl
+
+    Các dòng được duyệt lần lượt, STT được kiểm tra và các cột "Câu" được ép kiểu số
+    ngay khi đọc, nên bộ nhớ tối đa tỉ lệ với ma trận điểm thay vì toàn bộ đối tượng
+    ô của workbook. Kết quả tương đương `as_score_matrix(pd.read_excel(source, sheet_name))`.
+
+    Parameters:
+    -----------
+    source : str | path | file-like
+        File .xlsx
+    sheet_name : int | str
+        Vị trí hoặc tên sheet
+    dtype : numpy dtype, optional
+        Kiểu số của ma trận điểm. Mặc định dùng float32 nếu biểu diễn chính xác mọi
+        điểm (từng khối được thu gọn ngay khi đọc), nếu không thì float64
+
+    Returns:
+    --------
+    ScoreMatrix
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        return _read_sheet_matrix(ws, dtype)
+    finally:
+        wb.close()
+
+
+def read_workbook_sheets(source) -> dict:
+    """
+    Đọc mọi sheet của workbook trong một lần mở read-only, sheet điểm đọc thành ScoreMatrix
+
+    Sheet có cột STT và các cột "Câu" chỉ chứa số / ô trống được đọc tuần tự như
+    read_score_matrix, không dựng DataFrame của cả bảng SV. Các sheet còn lại (điểm tối
+    đa, đáp án, sheet ghi phương án A/B/C/D) được dựng thành DataFrame như pd.read_excel.
+
+    Parameters:
+    -----------
+    source : str | path | file-like
+        File .xlsx
+
+    Returns:
+    --------
+    dict
+        {tên sheet: ScoreMatrix | pd.DataFrame} theo đúng thứ tự sheet
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for ws in wb.worksheets:
+            header = next(ws.iter_rows(values_only=True), None) or ()
+            matrix = None
+            if "STT" in header and any(isinstance(name, str) and name.startswith("Câu") for name in header):
+                try:
+                    matrix = _read_sheet_matrix(ws)
+                except (TypeError, ValueError):
+                    # Có ô không phải số (phương án A/B/C/D, dòng đáp án...): đọc như DataFrame
+                    matrix = None
+            # Không còn dòng STT hợp lệ nào (vd. sheet điểm tối đa): giữ nguyên nội dung sheet
+            if matrix is None or matrix.n_students == 0:
+                sheets[ws.title] = _read_sheet_frame(ws)
+            else:
+                sheets[ws.title] = matrix
+        return sheets
+    finally:
+        wb.close()
+
+
+def _read_sheet_matrix(ws, dtype=None) -> ScoreMatrix:
+    """Đọc tuần tự một worksheet read-only thành ScoreMatrix (ô "Câu" không phải số gây ValueError)"""
+    # Thu gọn từng khối sau khi đọc nếu không chỉ định kiểu
+    finish = compact_scores if dtype is None else (lambda block: block)
+    dtype = np.float64 if dtype is None else dtype
+
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return ScoreMatrix([], np.empty((0, 0), dtype=dtype), np.array([], dtype=object))
+
+    question_idx = [i for i, name in enumerate(header)
+                    if isinstance(name, str) and name.startswith("Câu")]
+    question_cols = [header[i] for i in question_idx]
+    stt_idx = header.index("STT") if "STT" in header else None
+
+    chunks, stt_values = [], []
+    block = np.empty((_CHUNK_ROWS, len(question_idx)), dtype=dtype)
+    filled = 0
+    row_number = 0
+    for row in rows:
+        # Bỏ qua dòng trống hoàn toàn (pandas cũng không đọc các dòng này ở cuối sheet)
+        if all(value is None for value in row):
+            continue
+        row_number += 1
+
+        stt = row[stt_idx] if stt_idx is not None and stt_idx < len(row) else row_number
+        if not str(stt).isdigit():
+            continue
+
+        block[filled] = [_to_number(row[i]) if i < len(row) else np.nan for i in question_idx]
+        stt_values.append(stt)
+        filled += 1
+        if filled == _CHUNK_ROWS:
+            chunks.append(finish(block))
+            block = np.empty_like(block)
+            filled = 0
+    chunks.append(finish(block[:filled].copy()))
+
+    # Ghép khối: nếu có khối phải giữ float64 thì toàn bộ ma trận là float64
+    scores = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+    return ScoreMatrix(question_cols, scores, np.array(stt_values, dtype=object))
+
+
+def _read_sheet_frame(ws) -> pd.DataFrame:
+    """Dựng DataFrame của một worksheet read-only (dòng đầu là tiêu đề) bằng bộ phân tích của pd.read_excel"""
+    from pandas.io.parsers import TextParser
+
+    # Ô trống là "" như pandas; bỏ các dòng trống ở cuối sheet
+    data = [["" if value is None else value for value in row] for row in ws.iter_rows(values_only=True)]
+    while data and all(value == "" for value in data[-1]):
+        data.pop()
+    if not data:
+        return pd.DataFrame()
+    with TextParser(data, header=0) as parser:
+        return parser.read()
+
+
+def _to_number(value) -> float:
+    """Ép giá trị ô về số thực, ô trống thành NaN"""
+    if value is None or value == "":
+        return np.nan
+    return float(value)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from scipy.special import chdtrc, fdtrc
+from incremental_stats import ItemStatsAccumulator
+
+
+def compare_sections(section_frames: dict, exam_type: str = "Trắc nghiệm", max_scores_df: pd.DataFrame = None,
+                     alpha: float = 0.05, max_workers: int = None, rubric=None) -> dict:
+    """
+    Phân tích nhiều lớp (mỗi sheet một lớp) của cùng một đề và so sánh P, D giữa các lớp
+
+    Mỗi lớp được xử lý song song và chỉ duyệt bảng điểm một lần để dựng bộ tích luỹ
+    thống kê đủ (ItemStatsAccumulator); bảng P/D của lớp và các đại lượng cho kiểm định
+    đều được chốt từ bộ tích luỹ này. Bảng toàn khoá được chốt từ các bộ tích luỹ đã gộp
+    (ItemStatsAccumulator.merge), không tính lại trên bảng điểm ghép. SV đồng hạng ở ranh
+    giới nhóm cao / thấp được tính theo tỷ lệ (xem ItemStatsAccumulator).
+
+    Kiểm định khác biệt giữa các lớp cho từng câu:
+    - P: trắc nghiệm dùng kiểm định khi bình phương tính đồng nhất (số SV đúng / sai
+      theo lớp), tự luận dùng ANOVA một yếu tố trên điểm của câu,
+    - D: kiểm định tính đồng nhất Cochran Q trên D của từng lớp với phương sai
+      (var nhóm cao / n nhóm cao + var nhóm thấp / n nhóm thấp),
+    p-value được hiệu chỉnh Holm trên toàn bộ câu hỏi trước khi so với `alpha`.
+
+    Parameters:
+    -----------
+    section_frames : dict
+        {tên lớp: DataFrame sheet điểm hoặc ScoreMatrix}, cùng danh sách câu hỏi
+    exam_type : str
+        "Trắc nghiệm" hoặc "Tự luận"
+    max_scores_df : pd.DataFrame, optional
+        Sheet điểm tối đa (tự luận), dùng chung cho mọi lớp
+    alpha : float
+        Mức ý nghĩa
+    max_workers : int, optional
+        Số luồng xử lý các lớp (mặc định theo ThreadPoolExecutor)
+    rubric : Rubric, optional
+        Bộ tiêu chí phân loại P, D và độ tin cậy (mặc định default_rubric())
+
+    Returns:
+    --------
+    dict
+        "sections" ({tên lớp: bảng P/D}), "combined" (bảng toàn khoá) và
+        "comparison" (P, D theo lớp, p-value và câu có khác biệt)
+    """
+    if exam_type not in ("Trắc nghiệm", "Tự luận"):
+        raise ValueError(f"Chế độ so sánh lớp chỉ hỗ trợ đề trắc nghiệm hoặc tự luận, không hỗ trợ: {exam_type}")
+    if len(section_frames) < 2:
+        raise ValueError("Cần ít nhất 2 sheet lớp để so sánh")
+
+    def analyze(frame):
+        return _analyze_section(frame, exam_type, max_scores_df, rubric)
+
+    names = list(section_frames)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        outputs = list(pool.map(analyze, section_frames.values()))
+
+    question_cols = outputs[0]["accumulator"].question_cols
+    combined_acc = ItemStatsAccumulator(question_cols)
+    for name, output in zip(names, outputs):
+        if output["accumulator"].question_cols != question_cols:
+            raise ValueError(f"Sheet '{name}' không cùng danh sách câu hỏi với sheet '{names[0]}'")
+        combined_acc.merge(output["accumulator"])
+
+    if exam_type == "Trắc nghiệm":
+        combined = combined_acc.to_question_stats(rubric)
+        scale = np.ones(len(question_cols))
+    else:
+        combined = combined_acc.to_essay_stats(max_scores_df, rubric)
+        scale = combined["Điểm tối đa"].to_numpy(dtype=float)
+
+    comparison = _comparison_table(question_cols, names, [o["moments"] for o in outputs],
+                                   scale, exam_type, alpha)
+    return {
+        "sections": {name: output["table"] for name, output in zip(names, outputs)},
+        "combined": combined,
+        "comparison": comparison,
+    }
+
+
+def _analyze_section(frame, exam_type: str, max_scores_df: pd.DataFrame, rubric=None) -> dict:
+    """Bảng P/D, bộ tích luỹ và các mô-men (SL, TB, phương sai) theo nhóm của một lớp, từ một lượt duyệt"""
+    accumulator = ItemStatsAccumulator().update(frame)
+    if exam_type == "Trắc nghiệm":
+        table = accumulator.to_question_stats(rubric)
+        # Trắc nghiệm: ô trống là sai, mọi SV đều được tính
+        moments = accumulator.group_moments(binary=True)
+    else:
+        table = accumulator.to_essay_stats(max_scores_df, rubric)
+        moments = accumulator.group_moments()
+    return {"table": table, "accumulator": accumulator, "moments": moments}
+
+
+def _comparison_table(question_cols, names, moments, scale, exam_type: str, alpha: float) -> pd.DataFrame:
+    """Bảng so sánh P, D giữa các lớp cho từng câu"""
+    n, mean, var = (np.array(x) for x in zip(*(m["all"] for m in moments)))  # (lớp x câu)
+    n_high, mean_high, var_high = (np.array(x) for x in zip(*(m["high"] for m in moments)))
+    n_low, mean_low, var_low = (np.array(x) for x in zip(*(m["low"] for m in moments)))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        P = mean / scale * 100
+        D = (mean_high - mean_low) / scale
+        D_var = (var_high / n_high + var_low / n_low) / scale ** 2
+
+        p_value_P = _proportion_test(n, mean) if exam_type == "Trắc nghiệm" else _anova_test(n, mean, var)
+        p_value_D = _heterogeneity_test(D, D_var)
+
+    adjusted_P = _holm(p_value_P)
+    adjusted_D = _holm(p_value_D)
+    flag_P = adjusted_P < alpha
+    flag_D = adjusted_D < alpha
+
+    table = pd.DataFrame({"Câu hỏi": list(question_cols)})
+    for i, name in enumerate(names):
+        table[f"P - {name}"] = np.round(P[i], 2)
+    table["p-value (P)"] = np.round(p_value_P, 4)
+    for i, name in enumerate(names):
+        table[f"D - {name}"] = np.round(D[i], 2)
+    table["p-value (D)"] = np.round(p_value_D, 4)
+    table["Khác biệt giữa các lớp"] = [
+        ", ".join(label for label, flag in (("P", fp), ("D", fd)) if flag)
+        for fp, fd in zip(flag_P, flag_D)
+    ]
+    return table
+
+
+def _proportion_test(n, mean):
+    """Kiểm định khi bình phương tính đồng nhất tỷ lệ đúng giữa các lớp, cho mọi câu"""
+    correct = n * mean
+    observed = np.stack([correct, n - correct])           # (đúng/sai x lớp x câu)
+    expected = observed.sum(axis=1, keepdims=True) * n / n.sum(axis=0)
+    chi2 = np.where(expected > 0, (observed - expected) ** 2 / expected, 0.0).sum(axis=(0, 1))
+    df = np.maximum((n > 0).sum(axis=0) - 1, 1)
+    # Câu mà mọi SV cùng đúng hoặc cùng sai: không có khác biệt
+    return np.where(observed.sum(axis=1).min(axis=0) > 0, chdtrc(df, chi2), 1.0)
+
+
+def _anova_test(n, mean, var):
+    """ANOVA một yếu tố trên điểm của từng câu, từ số lượng / trung bình / phương sai theo lớp"""
+    total = n.sum(axis=0)
+    grand_mean = (n * mean).sum(axis=0) / total
+    between = (n * (mean - grand_mean) ** 2).sum(axis=0)
+    within = np.nansum((n - 1) * var, axis=0)
+    df_between = (n > 0).sum(axis=0) - 1
+    df_within = total - (n > 0).sum(axis=0)
+    F = (between / df_between) / (within / df_within)
+    return np.where(within > 0, fdtrc(df_between, df_within, F), np.where(between > 0, 0.0, 1.0))
+
+
+def _heterogeneity_test(estimates, variances):
+    """Kiểm định Cochran Q: các lớp có cùng giá trị (D) hay không, với trọng số 1/phương sai"""
+    usable = np.isfinite(estimates) & np.isfinite(variances) & (variances > 0)
+    weights = np.where(usable, 1 / np.where(usable, variances, 1.0), 0.0)
+    pooled = (weights * np.where(usable, estimates, 0.0)).sum(axis=0) / weights.sum(axis=0)
+    Q = (weights * np.where(usable, estimates - pooled, 0.0) ** 2).sum(axis=0)
+    df = usable.sum(axis=0) - 1
+    return np.where(df > 0, chdtrc(np.maximum(df, 1), Q), np.nan)
+
+
+def _holm(p_values):
+    """Hiệu chỉnh Holm cho nhiều kiểm định (bỏ qua NaN)"""
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    finite = np.flatnonzero(np.isfinite(p_values))
+    if finite.size == 0:
+        return adjusted
+    order = finite[np.argsort(p_values[finite])]
+    m = order.size
+    steps = np.maximum.accumulate(p_values[order] * (m - np.arange(m)))
+    adjusted[order] = np.minimum(steps, 1.0)
+    return adjusted
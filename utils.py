@@ -1,9 +1,6 @@
+from processor_common import classify_difficulty as _classify_difficulty
+
+
 def classify_difficulty(p: float) -> str:
-    if p >= 80:
-        return "Dễ"
-    elif 60 <= p < 80:
-        return "Trung bình"
-    elif 20 <= p < 60:
-        return "Khó"
-    else:
-        return "Rất khó"
+    """Giữ cho mã cũ; ngưỡng lấy theo bộ tiêu chí đang dùng (rubric.default_rubric())"""
+    return _classify_difficulty(p)
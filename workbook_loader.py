@@ -0,0 +1,82 @@
+import hashlib
+import os
+from io import BytesIO
+import pandas as pd
+from result_cache import LRUCache
+from columnar_cache import ColumnarCache, open_disk_cache
+from score_matrix import read_workbook_sheets
+
+# Bộ nhớ đệm trên đĩa dùng chung giữa các lần chạy / tiến trình (giao diện và CLI); chỉ bật
+# khi đặt EXAM_CACHE_DIR, mặc định None: dữ liệu SV chỉ nằm trong bộ nhớ (workbook_cache)
+default_disk_cache = open_disk_cache()
+
+# Bộ nhớ đệm workbook đã đọc: mã băm nội dung -> {tên sheet: DataFrame | ScoreMatrix}
+workbook_cache = LRUCache(maxsize=8)
+
+# File từ kích thước này trở lên được đọc tuần tự (read-only): sheet điểm thành ScoreMatrix.
+# Đổi ngưỡng bằng biến môi trường EXAM_STREAMING_MB (0 = luôn đọc tuần tự)
+STREAMING_MIN_BYTES = int(float(os.environ.get("EXAM_STREAMING_MB", "8")) * 1024 * 1024)
+
+
+def file_digest(data: bytes) -> str:
+    """Tính mã băm SHA-256 của nội dung file tải lên"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_workbook_sheets(data: bytes, disk_cache: ColumnarCache = default_disk_cache, streaming: bool = None):
+    """
+    Đọc file Excel đúng một lần thành toàn bộ các sheet
+    
+    Workbook chỉ được openpyxl phân tích một lần cho mỗi nội dung file; các lần gọi
+    sau với cùng nội dung (kể cả từ phiên trình duyệt khác) trả lại chính các
+    DataFrame đã đọc. Khi bật bộ nhớ đệm trên đĩa (EXAM_CACHE_DIR), kết quả phân tích
+    còn được lưu theo cột trên đĩa, nên lần chạy sau (khởi động lại ứng dụng, chạy lại
+    CLI với tham số khác) chỉ cần nạp lại bằng memory mapping. Các DataFrame này được
+    dùng chung cho phần hiển thị, xử lý và báo cáo nên không được sửa trực tiếp.
+
+    File lớn (từ STREAMING_MIN_BYTES) được đọc tuần tự bằng score_matrix.read_workbook_sheets:
+    sheet điểm được ép kiểu số ngay khi đọc thành ScoreMatrix (float32 nếu chính xác) và
+    chuyển thẳng cho các hàm thống kê, không dựng DataFrame của cả bảng SV. Kết quả này
+    không ghi vào bộ nhớ đệm trên đĩa (bộ nhớ đệm theo cột chỉ lưu DataFrame).
+    
+    Parameters:
+    -----------
+    data : bytes
+        Nội dung file .xlsx
+    disk_cache : ColumnarCache | None
+        Bộ nhớ đệm trên đĩa (mặc định theo EXAM_CACHE_DIR); None để chỉ dùng bộ nhớ đệm
+        trong bộ nhớ
+    streaming : bool, optional
+        True / False để bắt buộc bật / tắt đọc tuần tự; mặc định None: bật khi file có
+        kích thước từ STREAMING_MIN_BYTES (EXAM_STREAMING_MB, mặc định 8 MB)
+        
+    Returns:
+    --------
+    tuple[str, dict]
+        Mã băm nội dung và dict {tên sheet: DataFrame | ScoreMatrix} theo đúng thứ tự sheet
+    """
+    digest = file_digest(data)
+    if streaming is None:
+        streaming = len(data) >= STREAMING_MIN_BYTES
+    if streaming:
+        sheets = workbook_cache.get_or_compute((digest, "streaming"), lambda: read_workbook_sheets(BytesIO(data)))
+    else:
+        sheets = workbook_cache.get_or_compute(digest, lambda: _load_or_parse(digest, data, disk_cache))
+    return digest, sheets
+
+
+def _load_or_parse(digest: str, data: bytes, disk_cache: ColumnarCache) -> dict:
+    """Nạp workbook từ bộ nhớ đệm trên đĩa, nếu chưa có thì phân tích rồi lưu lại"""
+    if disk_cache is None:
+        return _parse_all_sheets(data)
+    sheets = disk_cache.load(digest)
+    if sheets is None:
+        sheets = _parse_all_sheets(data)
+        disk_cache.save(digest, sheets)
+    return sheets
+
+
+def _parse_all_sheets(data: bytes) -> dict:
+    """Phân tích toàn bộ sheet của workbook bằng một lần mở file"""
+    with pd.ExcelFile(BytesIO(data)) as excel_file:
+        return {name: excel_file.parse(name) for name in excel_file.sheet_names}